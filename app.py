@@ -1,150 +1,170 @@
-import dash
-from dash import html, dcc, Input, Output
-import pandas as pd
-import plotly.graph_objs as go
 from datetime import datetime, timedelta
 import os
 
-from config import DATA_PATH, RULE_REPORT_PATH, ML_REPORT_PATH
+import pandas as pd
 
-if not os.path.exists(DATA_PATH):
-    raise FileNotFoundError(f"❌ Raw data file not found: {DATA_PATH}")
+import config
+from detectors.pattern_results import PatternResults
+from preprocessor import load_market_data, market_days, OHLCV
+
+
+def load_pattern_reports():
+    """Rule-based and ML patterns of the last pipeline run (empty frames if there is none)."""
+    # === Columnar results from the last pipeline run (valid patterns carry ML fields) ===
+    patterns_rules_df = pd.DataFrame()
+    patterns_ml_df = pd.DataFrame()
+    if os.path.exists(config.RESULTS_PATH):
+        patterns_rules_df = PatternResults.load(config.RESULTS_PATH).valid_frame()
+        patterns_ml_df = patterns_rules_df
+
+    # === Safely Load Rule-Based Patterns ===
+    if patterns_rules_df.empty and os.path.exists(config.RULE_REPORT_PATH) and os.path.getsize(config.RULE_REPORT_PATH) > 0:
+        try:
+            patterns_rules_df = pd.read_csv(
+                config.RULE_REPORT_PATH, parse_dates=["start_time", "end_time"], low_memory=False
+            )
+        except pd.errors.EmptyDataError:
+            print(f"⚠️ Warning: {config.RULE_REPORT_PATH} exists but is empty.")
+
+    # === Safely Load ML-Based Patterns ===
+    if patterns_ml_df.empty and os.path.exists(config.ML_REPORT_PATH) and os.path.getsize(config.ML_REPORT_PATH) > 0:
+        try:
+            patterns_ml_df = pd.read_csv(
+                config.ML_REPORT_PATH, parse_dates=["start_time", "end_time"], low_memory=False
+            )
+        except pd.errors.EmptyDataError:
+            print(f"⚠️ Warning: {config.ML_REPORT_PATH} exists but is empty.")
+    return patterns_rules_df, patterns_ml_df
 
-df = pd.read_csv(DATA_PATH, parse_dates=["timestamp"])
-df.set_index("timestamp", inplace=True)
 
-# === Safely Load Rule-Based Patterns ===
-patterns_rules_df = pd.DataFrame()
-if os.path.exists(RULE_REPORT_PATH) and os.path.getsize(RULE_REPORT_PATH) > 0:
-    try:
-        patterns_rules_df = pd.read_csv(
-            RULE_REPORT_PATH, parse_dates=["start_time", "end_time"], low_memory=False
-        )
-    except pd.errors.EmptyDataError:
-        print(f"⚠️ Warning: {RULE_REPORT_PATH} exists but is empty.")
-
-# === Safely Load ML-Based Patterns ===
-patterns_ml_df = pd.DataFrame()
-if os.path.exists(ML_REPORT_PATH) and os.path.getsize(ML_REPORT_PATH) > 0:
-    try:
-        patterns_ml_df = pd.read_csv(
-            ML_REPORT_PATH, parse_dates=["start_time", "end_time"], low_memory=False
-        )
-    except pd.errors.EmptyDataError:
-        print(f"⚠️ Warning: {ML_REPORT_PATH} exists but is empty.")
+def create_app():
+    """The dashboard; dash and plotly are only imported here, the data and reports only read here."""
+    import dash
+    from dash import html, dcc, Input, Output
+    import plotly.graph_objs as go
+
+    data_path, symbol = config.DATA_PATH, config.MARKET_SYMBOL
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"❌ Raw data file not found: {data_path}")
+
+    # candles are read one day at a time by the chart callback
+    days = market_days(data_path, symbol)
+    min_date, max_date = days[0].date(), days[-1].date()
 
-# === Dash Web App Setup ===
-app = dash.Dash(__name__)
-app.title = "Crypto Binance Cup & Handle Visualizer"
+    patterns_rules_df, patterns_ml_df = load_pattern_reports()
 
-app.layout = html.Div([
-    html.H2("BTC Cup & Handle Pattern Visualizer"),
+    # === Dash Web App Setup ===
+    app = dash.Dash(__name__)
+    app.title = "Crypto Binance Cup & Handle Visualizer"
+
+    app.layout = html.Div([
+        html.H2("BTC Cup & Handle Pattern Visualizer"),
     
-    dcc.DatePickerSingle(
-        id='date-picker',
-        date=str(df.index.date.min()),
-        min_date_allowed=df.index.date.min(),
-        max_date_allowed=df.index.date.max(),
-        display_format='YYYY-MM-DD'
-    ),
+        dcc.DatePickerSingle(
+            id='date-picker',
+            date=str(min_date),
+            min_date_allowed=min_date,
+            max_date_allowed=max_date,
+            display_format='YYYY-MM-DD'
+        ),
     
-    html.Div([
-        html.Button("⬅️ Previous Day", id="prev-day", n_clicks=0),
-        html.Button("Next Day ➡️", id="next-day", n_clicks=0),
-    ], style={"margin": "10px 0"}),
-
-    dcc.Graph(id='chart', config={"displayModeBar": True}),
-])
-
-# === Date Callback ===
-@app.callback(
-    Output("date-picker", "date"),
-    Input("prev-day", "n_clicks"),
-    Input("next-day", "n_clicks"),
-    Input("date-picker", "date"),
-)
-def update_date(prev_clicks, next_clicks, selected_date):
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        return selected_date
-
-    button_id = ctx.triggered[0]["prop_id"].split(".")[0]
-    date = datetime.strptime(selected_date, "%Y-%m-%d")
-
-    if button_id == "prev-day":
-        date -= timedelta(days=1)
-    elif button_id == "next-day":
-        date += timedelta(days=1)
-
-    min_date = df.index.date.min()
-    max_date = df.index.date.max()
-    date = max(min_date, min(date.date(), max_date))
-
-    return str(date)
-
-# === Chart Update Callback ===
-@app.callback(
-    Output("chart", "figure"),
-    Input("date-picker", "date")
-)
-def update_chart(date):
-    date = pd.to_datetime(date)
-    start = date
-    end = date + timedelta(days=1)
-
-    df_day = df[(df.index >= start) & (df.index < end)]
-
-    fig = go.Figure(data=[
-        go.Candlestick(
-            x=df_day.index,
-            open=df_day["open"],
-            high=df_day["high"],
-            low=df_day["low"],
-            close=df_day["close"],
-            name="Price"
-        )
+        html.Div([
+            html.Button("⬅️ Previous Day", id="prev-day", n_clicks=0),
+            html.Button("Next Day ➡️", id="next-day", n_clicks=0),
+        ], style={"margin": "10px 0"}),
+
+        dcc.Graph(id='chart', config={"displayModeBar": True}),
     ])
 
-    # Rule-based overlays (red)
-    if not patterns_rules_df.empty:
-        day_rules = patterns_rules_df[
-            (patterns_rules_df["start_time"] >= start) &
-            (patterns_rules_df["end_time"] < end) &
-            (patterns_rules_df["valid"] == True)
-        ]
-        for _, row in day_rules.iterrows():
-            fig.add_vrect(
-                x0=row["start_time"], x1=row["end_time"],
-                fillcolor="red", opacity=0.25, line_width=0,
-                annotation_text="Rule-based", annotation_position="top left"
-            )
+    # === Date Callback ===
+    @app.callback(
+        Output("date-picker", "date"),
+        Input("prev-day", "n_clicks"),
+        Input("next-day", "n_clicks"),
+        Input("date-picker", "date"),
+    )
+    def update_date(prev_clicks, next_clicks, selected_date):
+        ctx = dash.callback_context
+        if not ctx.triggered:
+            return selected_date
 
-    # ML-based overlays (green)
-    if not patterns_ml_df.empty:
-        day_ml = patterns_ml_df[
-            (patterns_ml_df["start_time"] >= start) &
-            (patterns_ml_df["end_time"] < end) &
-            (patterns_ml_df.get("ml_valid", True) == True)
-        ]
-        for _, row in day_ml.iterrows():
-            fig.add_vrect(
-                x0=row["start_time"], x1=row["end_time"],
-                fillcolor="green", opacity=0.25, line_width=0,
-                annotation_text="ML-based", annotation_position="top right"
-            )
+        button_id = ctx.triggered[0]["prop_id"].split(".")[0]
+        date = datetime.strptime(selected_date, "%Y-%m-%d")
+
+        if button_id == "prev-day":
+            date -= timedelta(days=1)
+        elif button_id == "next-day":
+            date += timedelta(days=1)
 
-    fig.update_layout(
-        title=f"Price Chart with Pattern Overlays – {date.date()}",
-        xaxis_title="Time",
-        yaxis_title="Price",
-        height=800,
-        template="plotly_white"
+        date = max(min_date, min(date.date(), max_date))
+
+        return str(date)
+
+    # === Chart Update Callback ===
+    @app.callback(
+        Output("chart", "figure"),
+        Input("date-picker", "date")
     )
+    def update_chart(date):
+        date = pd.to_datetime(date)
+        start = date
+        end = date + timedelta(days=1)
+
+        df_day = load_market_data(data_path, columns=OHLCV, start=start, end=end, symbol=symbol)
+
+        fig = go.Figure(data=[
+            go.Candlestick(
+                x=df_day.index,
+                open=df_day["open"],
+                high=df_day["high"],
+                low=df_day["low"],
+                close=df_day["close"],
+                name="Price"
+            )
+        ])
+
+        # Rule-based overlays (red)
+        if not patterns_rules_df.empty:
+            day_rules = patterns_rules_df[
+                (patterns_rules_df["start_time"] >= start) &
+                (patterns_rules_df["end_time"] < end) &
+                (patterns_rules_df["valid"] == True)
+            ]
+            for _, row in day_rules.iterrows():
+                fig.add_vrect(
+                    x0=row["start_time"], x1=row["end_time"],
+                    fillcolor="red", opacity=0.25, line_width=0,
+                    annotation_text="Rule-based", annotation_position="top left"
+                )
+
+        # ML-based overlays (green)
+        if not patterns_ml_df.empty:
+            day_ml = patterns_ml_df[
+                (patterns_ml_df["start_time"] >= start) &
+                (patterns_ml_df["end_time"] < end) &
+                (patterns_ml_df.get("ml_valid", True) == True)
+            ]
+            for _, row in day_ml.iterrows():
+                fig.add_vrect(
+                    x0=row["start_time"], x1=row["end_time"],
+                    fillcolor="green", opacity=0.25, line_width=0,
+                    annotation_text="ML-based", annotation_position="top right"
+                )
+
+        fig.update_layout(
+            title=f"Price Chart with Pattern Overlays – {date.date()}",
+            xaxis_title="Time",
+            yaxis_title="Price",
+            height=800,
+            template="plotly_white"
+        )
+
+        return fig
 
-    return fig
+    return app
 
 def run_server():
-    app.run(debug=True)
+    create_app().run(debug=True)
 
 if __name__ == "__main__":
     run_server()
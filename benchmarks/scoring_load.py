@@ -0,0 +1,95 @@
+"""
+Load test of the scoring service: --producers threads each POST --requests
+requests of 1..--rows feature rows to /score, then the client's throughput
+and p50 / p99 latency are printed next to the service's own /metrics.
+
+Without --url the service is started in this process on a free localhost
+port, with --max-batch / --max-delay-ms (--max-batch 1 turns micro-batching
+off, for comparison).
+
+    python benchmarks/scoring_load.py --producers 32 --requests 200
+    python benchmarks/scoring_load.py --url http://127.0.0.1:8765
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml import FEATURE_COLUMNS  # noqa: E402
+
+# typical feature values, to draw rows around
+CENTER = [0.9, 2000.0, 150.0, 20.0, 0.3, 0.01, 0.0, 500.0]
+SPREAD = [0.05, 500.0, 60.0, 10.0, 0.15, 0.01, 5.0, 300.0]
+
+
+def start_local_service(max_batch, max_delay_ms):
+    from werkzeug.serving import make_server
+    from scoring_service import create_scoring_app
+
+    # one access-log line per request would dominate the measurement
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, create_scoring_app(max_batch=max_batch, max_delay_ms=max_delay_ms),
+                         threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def producer(url, requests_count, max_rows, seed, latencies, errors):
+    rng = np.random.default_rng(seed)
+    session = requests.Session()
+    for _ in range(requests_count):
+        rows = rng.normal(CENTER, SPREAD, size=(int(rng.integers(1, max_rows + 1)), len(FEATURE_COLUMNS)))
+        payload = {"rows": [dict(zip(FEATURE_COLUMNS, row)) for row in rows.tolist()]}
+        start = time.perf_counter()
+        response = session.post(f"{url}/score", json=payload, timeout=30)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200 or len(response.json()["results"]) != len(rows):
+            errors.append(response.status_code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Running service to test (default: start one in this process)")
+    parser.add_argument("--producers", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100, help="Requests per producer")
+    parser.add_argument("--rows", type=int, default=8, help="Most feature rows per request")
+    parser.add_argument("--max-batch", type=int, default=512)
+    parser.add_argument("--max-delay-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    server, url = (None, args.url) if args.url else start_local_service(args.max_batch, args.max_delay_ms)
+    requests.get(f"{url}/health", timeout=30).raise_for_status()
+    before = requests.get(f"{url}/metrics", timeout=30).json()
+
+    latencies, errors = [], []
+    threads = [threading.Thread(target=producer, args=(url, args.requests, args.rows, seed, latencies, errors))
+               for seed in range(args.producers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    after = requests.get(f"{url}/metrics", timeout=30).json()
+
+    ms = np.array(latencies) * 1e3
+    rows = after["rows"] - before["rows"]
+    batches = after["batches"] - before["batches"]
+    print(f"{len(latencies)} requests from {args.producers} producers in {elapsed:.2f} s, {len(errors)} failed")
+    print(f"client : {len(latencies) / elapsed:8.0f} req/s {rows / elapsed:9.0f} rows/s   "
+          f"p50 {np.percentile(ms, 50):6.2f} ms   p99 {np.percentile(ms, 99):6.2f} ms")
+    print(f"service: {rows} rows in {batches} batches ({rows / max(batches, 1):.1f} rows/batch)   "
+          f"p50 {after['p50_ms']:6.2f} ms   p99 {after['p99_ms']:6.2f} ms   (queue + scoring)")
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Startup time of every entry point: a fresh interpreter imports the module
+(what `python main.py --train-ml` etc. pay before doing any work), best and
+median of --repeat runs, plus the heavy packages the import dragged in.
+
+    python benchmarks/startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ["main", "app", "scoring_service", "ml.live_model_trainer", "preprocessor.prepare_data", "visual_utils.plot_static_report"]
+HEAVY = ["plotly", "kaleido", "dash", "talib", "scipy", "sklearn"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    seconds = [run["seconds"] for run in runs]
+    return min(seconds), statistics.median(seconds), runs[-1]["heavy"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    args = parser.parse_args()
+
+    print(f"{'entry point':<34}{'best s':>8}{'median s':>10}  heavy imports")
+    for module in args.modules:
+        best, median, heavy = measure(module, args.repeat)
+        print(f"{module:<34}{best:>8.3f}{median:>10.3f}  {', '.join(heavy) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
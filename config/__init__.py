@@ -1,2 +1,7 @@
-from .config_loader import DATA_PATH, RULE_REPORT_PATH
-from .config_loader import ML_REPORT_PATH, MODEL_PATH, CONFIDENCE_THRESHOLD, MIN_VALID_PATTERNS, RAW_DATA_PATH, OUTPUT_DIR, FEATURE_PATH
\ No newline at end of file
+from . import config_loader
+from .config_loader import load_config, settings, override, parse_overrides, config_path, SETTINGS
+
+
+def __getattr__(name):
+    # DATA_PATH, MODEL_PATH, ... are looked up on use, after any override()
+    return getattr(config_loader, name)
@@ -1,21 +1,128 @@
 import json
 import os
 
-CONFIG_PATH = os.path.join("data", "configuration", "config.json")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# config.json of this checkout, found wherever the process starts; PATTERN_CONFIG or override(path=...) point elsewhere
+CONFIG_PATH = os.path.join(PROJECT_ROOT, "data", "configuration", "config.json")
+# PATTERN_<KEY>=<value> overrides a config.json key; values are read as JSON where they parse, else as strings
+ENV_PREFIX = "PATTERN_"
 
-def load_config():
-    with open(CONFIG_PATH, "r") as f:
+_REQUIRED = object()
+
+
+def _project_path(path):
+    # relative paths in the config are relative to the checkout, not the working directory
+    return path if path is None else os.path.join(PROJECT_ROOT, path)
+
+
+# constant -> (config.json key, default if the key is missing, conversion)
+SETTINGS = {
+    "MODEL_PATH": ("MODEL_PATH", _REQUIRED, _project_path),
+    # append-only feature store: <FEATURE_PATH>/<symbol>/part-*.parquet
+    "FEATURE_PATH": ("FEATURE_PATH", _REQUIRED, _project_path),
+    # labeled feature rows (CSV) an empty feature store starts from; null = start empty
+    "SEED_FEATURE_PATH": ("SEED_FEATURE_PATH", None, _project_path),
+    "RAW_DATA_PATH": ("RAW_DATA_PATH", _REQUIRED, _project_path),
+    "CONFIDENCE_THRESHOLD": ("CONFIDENCE_THRESHOLD", _REQUIRED, None),
+    "MIN_VALID_PATTERNS": ("MIN_VALID_PATTERNS", _REQUIRED, None),
+    "RULE_REPORT_PATH": ("RULE_REPORT_PATH", _REQUIRED, _project_path),
+    "ML_REPORT_PATH": ("ML_REPORT_PATH", _REQUIRED, _project_path),
+    "RESULTS_PATH": ("RESULTS_PATH", _REQUIRED, _project_path),
+    "DATA_PATH": ("DATA_PATH", _REQUIRED, _project_path),
+    "OUTPUT_DIR": ("OUTPUT_DIR", _REQUIRED, _project_path),
+    # symbol read from a partitioned RAW_DATA_PATH / DATA_PATH (<path>/<symbol>/<day>.parquet)
+    "MARKET_SYMBOL": ("MARKET_SYMBOL", None, None),
+    # daily kline zips: <KLINES_BASE_URL>/<symbol>/1m/<symbol>-1m-<day>.zip, fetched by DOWNLOAD_WORKERS threads
+    "KLINES_BASE_URL": ("KLINES_BASE_URL", "https://data.binance.vision/data/futures/um/daily/klines", None),
+    "DOWNLOAD_WORKERS": ("DOWNLOAD_WORKERS", 8, None),
+    # ceiling for the float64 candle frame a worker loads, checked before reading; null = no limit
+    "MEMORY_BUDGET_MB": ("MEMORY_BUDGET_MB", None, None),
+    # 0 = one detection worker per CPU core, 1 = serial
+    "DETECTION_WORKERS": ("DETECTION_WORKERS", 1, None),
+    # coarse-to-fine resampling factors in minutes, e.g. [15, 5]; empty = full 1m scan
+    "DETECTION_PYRAMID": ("DETECTION_PYRAMID", (), tuple),
+    # DetectorConfig overrides (detectors.DetectorConfig field -> value) and the --sweep grid (field -> values)
+    "DETECTOR_SETTINGS": ("DETECTOR", {}, None),
+    "SWEEP_GRID": ("SWEEP_GRID", {}, None),
+    "SWEEP_REPORT_PATH": ("SWEEP_REPORT_PATH", "data/market-data/patterns/doc/sweep_counts.csv", _project_path),
+    # auto-label thresholds (ml.LabelRules field -> value)
+    "AUTO_LABEL_RULES": ("AUTO_LABEL", {}, None),
+    # scoring service (scoring_service.py): micro-batches close at SCORING_MAX_BATCH rows or SCORING_MAX_DELAY_MS
+    "SCORING_HOST": ("SCORING_HOST", "127.0.0.1", None),
+    "SCORING_PORT": ("SCORING_PORT", 8765, None),
+    "SCORING_MAX_BATCH": ("SCORING_MAX_BATCH", 512, None),
+    "SCORING_MAX_DELAY_MS": ("SCORING_MAX_DELAY_MS", 5, None),
+    # memory-mapped ATR / candle size cache next to the raw data; null disables it
+    "INDICATOR_CACHE_DIR": ("INDICATOR_CACHE_DIR", None, _project_path),
+    # least recently used cache files are removed beyond this size; null = no limit
+    "INDICATOR_CACHE_MB": ("INDICATOR_CACHE_MB", 1024, None),
+}
+
+_settings = None
+_overrides = {}
+_config_path = None
+
+
+def config_path():
+    return _config_path or os.environ.get(ENV_PREFIX + "CONFIG") or CONFIG_PATH
+
+
+def load_config(path=None):
+    with open(path or config_path(), "r") as f:
         return json.load(f)
 
-_config = load_config()
-
-# Assign constants for easy access
-MODEL_PATH = _config["MODEL_PATH"]
-FEATURE_PATH = _config["FEATURE_PATH"]
-RAW_DATA_PATH = _config["RAW_DATA_PATH"]
-CONFIDENCE_THRESHOLD = _config["CONFIDENCE_THRESHOLD"]
-MIN_VALID_PATTERNS = _config["MIN_VALID_PATTERNS"]
-RULE_REPORT_PATH = _config["RULE_REPORT_PATH"]
-ML_REPORT_PATH = _config["ML_REPORT_PATH"]
-DATA_PATH = _config["DATA_PATH"]
-OUTPUT_DIR = _config["OUTPUT_DIR"]
+
+def parse_value(raw):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def parse_overrides(pairs):
+    """KEY=VALUE strings (e.g. from --set) as a dict of config.json keys to values."""
+    values = {}
+    for pair in pairs or ():
+        key, sep, raw = pair.partition("=")
+        if not sep:
+            raise ValueError(f"Expected KEY=VALUE, got {pair!r}")
+        values[key.strip()] = parse_value(raw)
+    return values
+
+
+def settings():
+    """config.json with PATTERN_<KEY> environment variables and override() on top, read on first use."""
+    global _settings
+    if _settings is None:
+        values = load_config()
+        for key in set(values) | {key for key, _, _ in SETTINGS.values()}:
+            raw = os.environ.get(ENV_PREFIX + key)
+            if raw is not None:
+                values[key] = parse_value(raw)
+        values.update(_overrides)
+        _settings = values
+    return _settings
+
+
+def override(path=None, **values):
+    """Use another config file and / or replace config.json keys for every later lookup."""
+    global _settings, _config_path
+    if path:
+        _config_path = path
+    _overrides.update(values)
+    _settings = None
+
+
+def __getattr__(name):
+    # constants are resolved on access, so nothing is read until a setting is used
+    if name not in SETTINGS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    key, default, convert = SETTINGS[name]
+    values = settings()
+    if key in values:
+        value = values[key]
+    elif default is _REQUIRED:
+        raise KeyError(f"{key} is missing from {config_path()}")
+    else:
+        value = default
+    return convert(value) if convert else value
@@ -1,2 +1,8 @@
-from .ml_pattern_detector import detect_patterns_with_ml
-from .pattern_detector import detect_cup_handle_patterns_loose, detect_cup_handle_patterns, calculate_atr
\ No newline at end of file
+from .ml_pattern_detector import detect_patterns_with_ml, apply_ml_scores
+from .pattern_detector import detect_cup_handle_patterns_loose, detect_cup_handle_patterns, calculate_atr
+from .candidate_engine import DetectorConfig, DEFAULT_CONFIG
+from .pattern_results import PatternResults
+from .incremental import IncrementalCupHandleDetector
+from .sweep import sweep_detector_configs, config_grid
+from .pyramid import pyramid_breakouts, pyramid_recall
+from .profiles import detect_with_profiles, rule_profile, register_profile, RULE_PROFILES
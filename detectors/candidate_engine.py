@@ -0,0 +1,487 @@
+import copy
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from enum import IntEnum
+from time import perf_counter
+
+from utils.indicator_cache import cached_indicator
+from utils.range_extrema import RangeExtremaIndex
+from utils.rolling_fit import RollingParabolaFit, RollingLinearTrend
+
+FIRST_BREAKOUT = 300
+LOOKAHEAD = 60
+DEFAULT_CHUNK_SIZE = 1024
+
+
+class Rejection(IntEnum):
+    VALID = 0
+    LOW_R2 = 1
+    SHALLOW = 2
+    RIM_CLOSE = 3
+    RIM_HIGH = 4
+    VOLUME_RISING = 5
+    HANDLE_HIGH = 6
+    HANDLE_BELOW_CUP = 7
+    RETRACE = 8
+    HANDLE_DURATION = 9
+    NO_ATR_BREAKOUT = 10
+    NO_VOLUME_SPIKE = 11
+
+
+# How the strict and loose detectors differ:
+#   atr            "rolling" (calculate_atr) or "talib" (Wilder's talib.ATR)
+#   rim_highs      also reject on rim highs mismatch and compare the handle against rim highs
+#   handle_prices  "high_low" (handle highs/lows) or "close" (handle closes)
+#   retrace        "rim" ((rim - handle_low) / depth) or "handle" ((handle_high - handle_low) / depth)
+#   max_valid      stop after this many valid patterns
+RuleSet = namedtuple("RuleSet", ["name", "atr", "rim_highs", "handle_prices", "retrace", "max_valid", "reasons"])
+
+STRICT_RULES = RuleSet(
+    name="strict", atr="rolling", rim_highs=True, handle_prices="high_low", retrace="rim", max_valid=2,
+    reasons={
+        Rejection.LOW_R2: "V-shape / low R²",
+        Rejection.SHALLOW: "Cup too shallow",
+        Rejection.RIM_CLOSE: "Rim close mismatch > 10%",
+        Rejection.RIM_HIGH: "Rim highs mismatch > 10%",
+        Rejection.VOLUME_RISING: "Cup volume increasing",
+        Rejection.HANDLE_HIGH: "Handle high exceeds rim highs",
+        Rejection.HANDLE_BELOW_CUP: "Handle breaks below cup",
+        Rejection.RETRACE: "Handle retracement > 40%",
+        Rejection.HANDLE_DURATION: "Handle duration invalid",
+        Rejection.NO_ATR_BREAKOUT: "No strong price breakout (ATR rule failed)",
+        Rejection.NO_VOLUME_SPIKE: "No breakout volume spike",
+    },
+)
+
+LOOSE_RULES = RuleSet(
+    name="loose", atr="talib", rim_highs=False, handle_prices="close", retrace="handle", max_valid=30,
+    reasons={
+        Rejection.LOW_R2: "Cup not U-shaped or low R²",
+        Rejection.SHALLOW: "Cup too shallow",
+        Rejection.RIM_CLOSE: "Rim mismatch > 10%",
+        Rejection.VOLUME_RISING: "Cup volume increasing",
+        Rejection.HANDLE_HIGH: "Handle high above rim",
+        Rejection.HANDLE_BELOW_CUP: "Handle breaks below cup",
+        Rejection.RETRACE: "Handle retracement > 40%",
+        Rejection.HANDLE_DURATION: "Handle duration invalid",
+        Rejection.NO_ATR_BREAKOUT: "No strong price breakout",
+        Rejection.NO_VOLUME_SPIKE: "No breakout volume spike",
+    },
+)
+
+# Tunable thresholds and window sizes shared by both rule sets:
+#   min_cup_len / max_cup_len   cup lengths tried for every breakout (inclusive)
+#   handle_offset               candles between the cup end and the breakout
+#   min_handle / max_handle     accepted handle durations
+#   min_r2                      parabola fit quality for a U-shaped cup
+#   min_depth_candles           cup depth in average candle sizes
+#   rim_tolerance               max relative rim mismatch
+#   max_retrace                 max handle retracement of the cup depth
+#   atr_period / atr_multiplier breakout must clear the handle high by this many ATRs
+#   volume_window / volume_spike breakout volume vs the mean of the preceding candles
+DetectorConfig = namedtuple("DetectorConfig", [
+    "min_cup_len", "max_cup_len", "handle_offset", "min_handle", "max_handle", "min_r2",
+    "min_depth_candles", "rim_tolerance", "max_retrace", "atr_period", "atr_multiplier",
+    "volume_window", "volume_spike",
+], defaults=[30, 300, 50, 5, 50, 0.85, 2.0, 0.10, 0.4, 14, 1.5, 14, 1.5])
+
+DEFAULT_CONFIG = DetectorConfig()
+CUP_LENGTHS = np.arange(DEFAULT_CONFIG.min_cup_len, DEFAULT_CONFIG.max_cup_len + 1)
+HANDLE_OFFSET = DEFAULT_CONFIG.handle_offset
+
+
+def lookback(config):
+    """Candles a breakout looks back over: the longest cup plus the handle."""
+    return max(config.max_cup_len + config.handle_offset, config.volume_window, config.atr_period)
+
+# One evaluated block: rows are breakout indices, columns are cup lengths.
+# reason is Rejection codes (VALID for accepted candidates), in_range is False
+# where the cup would start before the first candle.
+CandidateBlock = namedtuple("CandidateBlock", [
+    "breakouts", "cup_lengths", "cup_starts", "in_range", "reason",
+    "r2", "depth", "volume_slope", "handle_high", "handle_low", "retrace", "atr",
+])
+
+# The in-range candidates of one block flattened in (breakout, cup length)
+# order, with positions shifted by offset. Per-candidate r2 / depth only where
+# they are the rejection reason; the full metrics only for valid candidates
+# (valid_at indexes the flat rows, valid holds one array per metric).
+FlatBlock = namedtuple("FlatBlock", [
+    "cup_start", "breakout", "cup_len", "reason", "r2", "depth", "valid_at", "valid",
+])
+VALID_METRICS = ("r2", "depth", "retrace", "volume_slope", "handle_high", "handle_low", "atr")
+
+
+def flatten_block(block, offset=0):
+    rows, cols = np.nonzero(block.in_range)
+    reason = block.reason[rows, cols]
+    valid_at = np.flatnonzero(reason == Rejection.VALID)
+    valid_rows, valid_cols = rows[valid_at], cols[valid_at]
+    return FlatBlock(
+        cup_start=block.cup_starts[rows, cols] + offset,
+        breakout=block.breakouts[rows] + offset,
+        cup_len=block.cup_lengths[cols],
+        reason=reason,
+        r2=np.where(reason == Rejection.LOW_R2, block.r2[rows, cols], np.nan).astype(np.float32),
+        depth=np.where(reason == Rejection.SHALLOW, block.depth[rows, cols], np.nan).astype(np.float32),
+        valid_at=valid_at,
+        valid={name: getattr(block, name)[valid_rows, valid_cols] for name in VALID_METRICS},
+    )
+
+
+def calculate_atr(df, period=14):
+    high_low = df["high"] - df["low"]
+    high_close = np.abs(df["high"] - df["close"].shift())
+    low_close = np.abs(df["low"] - df["close"].shift())
+    tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+    atr = tr.rolling(window=period).mean()
+    return atr
+
+
+def _talib_atr(df, period=14):
+    import talib
+    return talib.ATR(df["high"].to_numpy(dtype=np.float64), df["low"].to_numpy(dtype=np.float64),
+                     df["close"].to_numpy(dtype=np.float64), timeperiod=period)
+
+
+def rules_atr(df, rules, period=14):
+    """ATR series the rule set compares breakouts against, as a float64 array (cached when enabled)."""
+    if rules.atr == "talib":
+        return cached_indicator(df, "atr_talib", _talib_atr, period=period)
+    return cached_indicator(df, "atr_rolling", calculate_atr, period=period)
+
+
+def _mean_candle_size(df):
+    return np.mean(np.abs(df["high"].to_numpy(dtype=np.float64) - df["low"].to_numpy(dtype=np.float64)))
+
+
+def average_candle_size(df):
+    """Mean high - low range of df, the unit of the cup depth rule (cached when enabled)."""
+    return float(cached_indicator(df, "avg_candle_size", _mean_candle_size)[()])
+
+
+class _Candidates:
+    """Surviving candidates of one block as parallel flat arrays."""
+
+    def __init__(self, **arrays):
+        self.__dict__.update(arrays)
+
+    def __len__(self):
+        return len(self.row)
+
+    def take(self, keep):
+        return _Candidates(**{name: values[keep] for name, values in self.__dict__.items()})
+
+    def fit(self, engine):
+        if "r2" not in self.__dict__:
+            if engine.shared is not None:
+                self.r2, self.depth, self.curvature = engine.shared.fit(engine, self)
+            else:
+                fits = engine._fitter.fit(self.cup_start, self.cup_len)
+                self.r2, self.depth, self.curvature = fits.r2, fits.depth, fits.coeffs[..., 0]
+        return self
+
+
+class SharedMetrics:
+    """
+    The rule-independent candidate metrics of one block (parabola fit, cup
+    volume slope), filled in as the rule sets evaluated on the block ask
+    for them, so a candidate is fitted at most once whichever rule set gets
+    to it first. Indexed by (breakout row, cup length column): every engine
+    sharing it must use the same breakouts, cup lengths and handle offset.
+    """
+
+    def __init__(self, shape):
+        self.fitted = np.zeros(shape, dtype=bool)
+        self.sloped = np.zeros(shape, dtype=bool)
+        self.r2, self.depth, self.curvature, self.volume_slope = (np.full(shape, np.nan) for _ in range(4))
+
+    def fit(self, engine, c):
+        todo = ~self.fitted[c.row, c.col]
+        if todo.any():
+            rows, cols = c.row[todo], c.col[todo]
+            fits = engine._fitter.fit(c.cup_start[todo], c.cup_len[todo])
+            self.r2[rows, cols], self.depth[rows, cols] = fits.r2, fits.depth
+            self.curvature[rows, cols] = fits.coeffs[..., 0]
+            self.fitted[rows, cols] = True
+        return self.r2[c.row, c.col], self.depth[c.row, c.col], self.curvature[c.row, c.col]
+
+    def slope(self, engine, c):
+        todo = ~self.sloped[c.row, c.col]
+        if todo.any():
+            rows, cols = c.row[todo], c.col[todo]
+            self.volume_slope[rows, cols] = engine.volume_trend.slope(c.cup_start[todo], c.cup_len[todo])
+            self.sloped[rows, cols] = True
+        return self.volume_slope[c.row, c.col]
+
+
+# --- per breakout index: the handle window [i - handle_offset, i) is the same for every cup length
+def _handle_duration_invalid(engine, b):
+    config = engine.config
+    return np.full(len(b.i), config.handle_offset < config.min_handle or config.handle_offset > config.max_handle)
+
+
+def _no_atr_breakout(engine, b):
+    close_i = engine.closes[b.i]
+    multiplier = engine.config.atr_multiplier
+    if engine.rules.atr == "talib":
+        return close_i <= b.handle_high + multiplier * b.atr
+    return ~((close_i - b.handle_high) > multiplier * b.atr)
+
+
+def _no_volume_spike(engine, b):
+    window = engine.config.volume_window
+    return engine.volumes[b.i] < engine.config.volume_spike * engine.extrema.mean("volume", b.i - window, b.i)
+
+
+# --- per candidate
+def _rim_close_mismatch(engine, c):
+    left, right = engine.closes[c.cup_start], engine.closes[c.cup_end - 1]
+    return np.abs(left - right) / ((left + right) / 2) > engine.config.rim_tolerance
+
+
+def _rim_high_mismatch(engine, c):
+    left, right = engine.highs[c.cup_start], engine.highs[c.cup_end - 1]
+    return np.abs(left - right) / ((left + right) / 2) > engine.config.rim_tolerance
+
+
+def _handle_above_rim(engine, c):
+    rims = engine.highs if engine.rules.rim_highs else engine.closes
+    return c.handle_high > np.maximum(rims[c.cup_start], rims[c.cup_end - 1])
+
+
+def _handle_below_cup(engine, c):
+    return c.handle_low < engine.extrema.min("close", c.cup_start, c.cup_end)
+
+
+def _cup_volume_rising(engine, c):
+    if engine.shared is not None:
+        c.volume_slope = engine.shared.slope(engine, c)
+    else:
+        c.volume_slope = engine.volume_trend.slope(c.cup_start, c.cup_len)
+    return c.volume_slope > 0
+
+
+def _cup_not_u_shaped(engine, c):
+    c.fit(engine)
+    return (c.r2 < engine.config.min_r2) | (c.curvature <= 0)
+
+
+def _cup_too_shallow(engine, c):
+    return c.fit(engine).depth < engine.config.min_depth_candles * engine.avg_candle_size
+
+
+def _handle_retrace_too_deep(engine, c):
+    depth = c.fit(engine).depth
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if engine.rules.retrace == "rim":
+            rim = np.maximum(engine.closes[c.cup_start], engine.closes[c.cup_end - 1])
+            c.retrace = np.where(depth != 0, (rim - c.handle_low) / depth, 0.0)
+        else:
+            c.retrace = (c.handle_high - c.handle_low) / depth
+    return c.retrace > engine.config.max_retrace
+
+
+# The rule cascade, cheapest checks first. Breakout-scoped stages run once per
+# breakout index before any cup is looked at; candidate stages only see the
+# survivors of the stages before them. The parabola fit is the most expensive
+# step, so everything that can reject without it goes first.
+Stage = namedtuple("Stage", ["name", "code", "scope", "cost", "check"])
+
+CASCADE = (
+    Stage("handle_duration", Rejection.HANDLE_DURATION, "breakout", 0, _handle_duration_invalid),
+    Stage("atr_breakout", Rejection.NO_ATR_BREAKOUT, "breakout", 1, _no_atr_breakout),
+    Stage("volume_spike", Rejection.NO_VOLUME_SPIKE, "breakout", 2, _no_volume_spike),
+    Stage("rim_close", Rejection.RIM_CLOSE, "candidate", 10, _rim_close_mismatch),
+    Stage("rim_high", Rejection.RIM_HIGH, "candidate", 11, _rim_high_mismatch),
+    Stage("handle_high", Rejection.HANDLE_HIGH, "candidate", 12, _handle_above_rim),
+    Stage("handle_below_cup", Rejection.HANDLE_BELOW_CUP, "candidate", 13, _handle_below_cup),
+    Stage("volume_trend", Rejection.VOLUME_RISING, "candidate", 20, _cup_volume_rising),
+    Stage("cup_shape", Rejection.LOW_R2, "candidate", 30, _cup_not_u_shaped),
+    Stage("cup_depth", Rejection.SHALLOW, "candidate", 31, _cup_too_shallow),
+    Stage("retrace", Rejection.RETRACE, "candidate", 32, _handle_retrace_too_deep),
+)
+
+
+class StageFunnel:
+    """Per-stage candidates evaluated / rejected and time spent, summed over blocks."""
+
+    def __init__(self, stages):
+        self.stages = [stage.name for stage in stages]
+        self.evaluated = dict.fromkeys(self.stages, 0)
+        self.rejected = dict.fromkeys(self.stages, 0)
+        self.seconds = dict.fromkeys(self.stages, 0.0)
+
+    def record(self, name, evaluated, rejected, seconds):
+        self.evaluated[name] += int(evaluated)
+        self.rejected[name] += int(rejected)
+        self.seconds[name] += seconds
+
+    def add(self, frame):
+        """Fold in the to_frame() of another funnel, e.g. one from a worker process."""
+        for row in frame.itertuples(index=False):
+            if row.stage not in self.evaluated:
+                self.stages.append(row.stage)
+                self.evaluated[row.stage], self.rejected[row.stage], self.seconds[row.stage] = 0, 0, 0.0
+            self.record(row.stage, row.evaluated, row.rejected, row.seconds)
+
+    def to_frame(self):
+        frame = pd.DataFrame({
+            "stage": self.stages,
+            "evaluated": [self.evaluated[s] for s in self.stages],
+            "rejected": [self.rejected[s] for s in self.stages],
+            "seconds": [self.seconds[s] for s in self.stages],
+        })
+        frame["passed"] = frame["evaluated"] - frame["rejected"]
+        return frame[["stage", "evaluated", "passed", "rejected", "seconds"]]
+
+
+class CupHandleEngine:
+    """
+    Evaluates the cup & handle rules as a cost-ordered cascade of NumPy
+    checks over blocks of breakout indices x cup lengths.
+
+    Everything that does not depend on the candidate (ATR, average candle
+    size, rolling fits, range extrema) is prepared once per DataFrame;
+    evaluate() then works on one block at a time so memory stays bounded
+    by chunk_size. Stage counters and timings accumulate in self.funnel.
+    """
+
+    def __init__(self, df, rules=STRICT_RULES, chunk_size=DEFAULT_CHUNK_SIZE, stages=CASCADE,
+                 atr=None, avg_candle_size=None, breakouts=None, config=DEFAULT_CONFIG, max_cup_len=None):
+        # atr / avg_candle_size / breakouts let a shard of a bigger frame reuse
+        # the values of the whole frame and evaluate only its own breakouts;
+        # max_cup_len sizes the shared fits for later with_config() calls
+        self.chunk_size = chunk_size
+        self._frame = df
+        self.closes = df["close"].to_numpy(dtype=np.float64)
+        self.highs = df["high"].to_numpy(dtype=np.float64)
+        self.lows = df["low"].to_numpy(dtype=np.float64)
+        self.volumes = df["volume"].to_numpy(dtype=np.float64)
+        self.size = len(self.closes)
+
+        self._atr_cache = {}  # (ATR method, period) -> ATR
+        if atr is not None:
+            self._atr_cache[rules.atr, config.atr_period] = np.asarray(atr, dtype=np.float64)
+        if avg_candle_size is None:
+            avg_candle_size = average_candle_size(df)
+        self.avg_candle_size = avg_candle_size
+        self._breakouts = breakouts
+
+        max_len = max(int(max_cup_len or 0), config.max_cup_len)
+        self._fitter = RollingParabolaFit(self.closes, max_window=max_len)
+        self.volume_trend = RollingLinearTrend(self.volumes, max_window=max_len)
+        self.extrema = RangeExtremaIndex.for_frame(df, max_window=max(max_len, config.handle_offset))
+        self.shared = None  # SharedMetrics of the block being evaluated, if any
+        self._stages = stages
+        self._use_rules(rules)
+        self._use_config(config)
+
+    def _use_rules(self, rules):
+        self.rules = rules
+        if rules.handle_prices == "close":
+            self._handle_columns = ("close", "close")
+        else:
+            self._handle_columns = ("high", "low")
+        stages = [stage for stage in self._stages if stage.code in rules.reasons]
+        self.breakout_stages = sorted((s for s in stages if s.scope == "breakout"), key=lambda s: s.cost)
+        self.candidate_stages = sorted((s for s in stages if s.scope == "candidate"), key=lambda s: s.cost)
+
+    def _use_config(self, config):
+        if config.max_cup_len > self._fitter.max_window:
+            raise ValueError(f"max_cup_len {config.max_cup_len} exceeds the prepared fits ({self._fitter.max_window})")
+        self.config = config
+        self.cup_lengths = np.arange(config.min_cup_len, config.max_cup_len + 1)
+        key = (self.rules.atr, config.atr_period)
+        if key not in self._atr_cache:
+            self._atr_cache[key] = rules_atr(self._frame, self.rules, config.atr_period)
+        self.atr = self._atr_cache[key]
+        self.funnel = StageFunnel(self.breakout_stages + self.candidate_stages)
+
+    def with_config(self, config):
+        """Engine for another config over the same frame, sharing fits, extrema and ATRs."""
+        engine = copy.copy(self)
+        engine._use_config(config)
+        return engine
+
+    def with_rules(self, rules):
+        """Engine for another rule set over the same frame, sharing fits, extrema and ATRs."""
+        engine = copy.copy(self)
+        engine._use_rules(rules)
+        engine._use_config(self.config)
+        return engine
+
+    def breakout_range(self):
+        if self._breakouts is not None:
+            return self._breakouts
+        return range(FIRST_BREAKOUT, max(self.size - LOOKAHEAD, FIRST_BREAKOUT))
+
+    def iter_blocks(self):
+        # breakouts may be a range or an increasing array of selected indices
+        breakouts = self.breakout_range()
+        for lo in range(0, len(breakouts), self.chunk_size):
+            yield self.evaluate(np.asarray(breakouts[lo:lo + self.chunk_size]))
+
+    def iter_flat_blocks(self, offset=0):
+        for block in self.iter_blocks():
+            yield flatten_block(block, offset)
+
+    def evaluate(self, breakouts, shared=None):
+        """Run the cascade on the given breakouts; shared is a SharedMetrics reused across rule sets."""
+        self.shared = shared
+        try:
+            return self._evaluate(breakouts)
+        finally:
+            self.shared = None
+
+    def _evaluate(self, breakouts):
+        i = np.asarray(breakouts, dtype=np.int64)
+        cup_end = i - self.config.handle_offset
+        cup_start = cup_end[:, None] - self.cup_lengths[None, :]
+        in_range = cup_start >= 0
+        shape = cup_start.shape
+        reason = np.full(shape, Rejection.VALID, dtype=np.int8)
+        metrics = {name: np.full(shape, np.nan) for name in ("r2", "depth", "volume_slope", "retrace")}
+
+        high_column, low_column = self._handle_columns
+        b = _Candidates(
+            row=np.arange(len(i)), i=i, atr=self.atr[i], cups=in_range.sum(axis=1),
+            handle_high=self.extrema.max(high_column, cup_end, i),
+            handle_low=self.extrema.min(low_column, cup_end, i),
+        )
+        handle_high, handle_low, atr = b.handle_high, b.handle_low, b.atr
+        for stage in self.breakout_stages:
+            started = perf_counter()
+            failed = stage.check(self, b)
+            reason[b.row[failed]] = stage.code
+            self.funnel.record(stage.name, b.cups.sum(), b.cups[failed].sum(), perf_counter() - started)
+            b = b.take(~failed)
+
+        rows, cols = np.nonzero(in_range[b.row])
+        rows = b.row[rows]
+        c = _Candidates(
+            row=rows, col=cols, cup_start=cup_start[rows, cols], cup_end=cup_end[rows],
+            cup_len=self.cup_lengths[cols], handle_high=handle_high[rows], handle_low=handle_low[rows],
+        )
+        for stage in self.candidate_stages:
+            started = perf_counter()
+            failed = stage.check(self, c)
+            reason[c.row[failed], c.col[failed]] = stage.code
+            self.funnel.record(stage.name, len(c), failed.sum(), perf_counter() - started)
+            # keep the metrics this stage (or an earlier one) produced for the rejected rows
+            for name in metrics:
+                if name in c.__dict__:
+                    metrics[name][c.row[failed], c.col[failed]] = c.__dict__[name][failed]
+            c = c.take(~failed)
+        for name in metrics:
+            if name in c.__dict__:
+                metrics[name][c.row, c.col] = c.__dict__[name]
+
+        return CandidateBlock(
+            breakouts=i, cup_lengths=self.cup_lengths, cup_starts=cup_start, in_range=in_range,
+            reason=reason, r2=metrics["r2"], depth=metrics["depth"], volume_slope=metrics["volume_slope"],
+            handle_high=np.broadcast_to(handle_high[:, None], shape),
+            handle_low=np.broadcast_to(handle_low[:, None], shape),
+            retrace=metrics["retrace"], atr=np.broadcast_to(atr[:, None], shape),
+        )
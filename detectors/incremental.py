@@ -0,0 +1,174 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .candidate_engine import (
+    CupHandleEngine, StageFunnel, STRICT_RULES, DEFAULT_CONFIG, FIRST_BREAKOUT, LOOKAHEAD, DEFAULT_CHUNK_SIZE
+)
+from .pattern_detector import VALID_FIELDS, _loose_fields, _valid_candidates
+from .pattern_results import PatternResults
+from .sharded import shard_start
+
+_BUFFER_COLUMNS = ("high", "low", "close", "volume", "atr")
+
+
+class IncrementalATR:
+    """
+    ATR fed one batch of candles at a time.
+
+    method="rolling" follows calculate_atr (mean of the last `period` true
+    ranges), method="talib" follows talib.ATR (Wilder smoothing seeded with
+    the mean of the first `period` true ranges after the first candle).
+    """
+
+    def __init__(self, method="rolling", period=14):
+        self.method = method
+        self.period = period
+        self.count = 0
+        self.value = np.nan
+        self._prev_close = np.nan
+        self._ranges = deque(maxlen=period)
+
+    def update_batch(self, highs, lows, closes):
+        highs, lows, closes = (np.asarray(a, dtype=np.float64) for a in (highs, lows, closes))
+        prev_close = np.r_[self._prev_close, closes[:-1]]
+        # like pandas' max(axis=1), the first candle's range ignores the missing previous close
+        true_range = np.fmax(highs - lows, np.fmax(np.abs(highs - prev_close), np.abs(lows - prev_close)))
+        if len(closes):
+            self._prev_close = closes[-1]
+
+        out = np.empty(len(true_range))
+        for k, tr in enumerate(true_range):
+            out[k] = self._step(tr)
+        return out
+
+    def _step(self, tr):
+        position = self.count
+        self.count += 1
+        if self.method != "talib":
+            self._ranges.append(tr)
+            self.value = sum(self._ranges) / self.period if len(self._ranges) == self.period else np.nan
+        elif position == 0:
+            pass  # no previous close yet, talib leaves this range out
+        elif position <= self.period:
+            self._ranges.append(tr)
+            if position == self.period:
+                self.value = sum(self._ranges) / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + tr) / self.period
+        return self.value
+
+
+class IncrementalCupHandleDetector:
+    """
+    Cup & handle detection over a growing stream of candles.
+
+    Keeps the last few hundred candles (enough for the longest cup, the
+    handle and the rolling-sum anchor block) plus running ATR and candle
+    size state, and on every update evaluates only the breakout indices that
+    became evaluable since the previous call: a breakout at i is evaluated
+    once `lookahead` candles after it have arrived (LOOKAHEAD, as in the
+    batch detectors, or 0 to react on the breakout candle itself).
+
+    With the same avg_candle_size the valid patterns equal those of a batch
+    CupHandleEngine run over the same candles. The batch detectors use the
+    mean candle size of the whole frame, which a stream only knows at the
+    end, so by default the running mean up to each update is used; pass
+    avg_candle_size to pin it. There is no max_valid early stop.
+    """
+
+    def __init__(self, rules=STRICT_RULES, avg_candle_size=None, lookahead=LOOKAHEAD,
+                 chunk_size=DEFAULT_CHUNK_SIZE, config=DEFAULT_CONFIG):
+        self.rules = rules
+        self.config = config
+        self.lookahead = lookahead
+        self.chunk_size = chunk_size
+        self.pinned_candle_size = avg_candle_size
+        self.atr = IncrementalATR(rules.atr, config.atr_period)
+        self.results = PatternResults(pd.DatetimeIndex([], name="timestamp"), rules.reasons, summary_only=True)
+        self.funnel = StageFunnel([])
+        self.next_breakout = FIRST_BREAKOUT
+        self._record = VALID_FIELDS.get(rules.name, _loose_fields)
+        self._candle_size_total = 0.0
+        self._base = 0  # stream position of the first buffered candle
+        self._columns = {col: np.empty(0) for col in _BUFFER_COLUMNS}
+        self._times = pd.DatetimeIndex([], name="timestamp")
+
+    @property
+    def size(self):
+        """Number of candles seen so far."""
+        return self._base + len(self._times)
+
+    @property
+    def avg_candle_size(self):
+        if self.pinned_candle_size is not None:
+            return self.pinned_candle_size
+        return self._candle_size_total / self.size if self.size else np.nan
+
+    def frame(self):
+        """Buffered candles as an OHLCV-style DataFrame (covers every pattern of the last update)."""
+        return pd.DataFrame({col: self._columns[col] for col in _BUFFER_COLUMNS[:-1]}, index=self._times)
+
+    def frame_patterns(self, patterns):
+        """
+        Copies of pattern records with cup_start / breakout as row positions of
+        frame(): the records hold stream positions, the buffer starts at _base.
+        """
+        return [{**p, "cup_start": p["cup_start"] - self._base, "breakout": p["breakout"] - self._base}
+                for p in patterns]
+
+    def update(self, candle):
+        """Add one candle (a Series / dict with timestamp, high, low, close, volume) and return new valid patterns."""
+        timestamp = candle["timestamp"] if "timestamp" in candle else candle.name
+        row = pd.DataFrame({col: [candle[col]] for col in _BUFFER_COLUMNS[:-1]},
+                           index=pd.DatetimeIndex([timestamp], name="timestamp"))
+        return self.update_batch(row)
+
+    def update_batch(self, df):
+        """Add candles (indexed by timestamp, in order) and return the valid patterns they completed."""
+        self._trim()
+        highs, lows = df["high"].to_numpy(dtype=np.float64), df["low"].to_numpy(dtype=np.float64)
+        new = {col: df[col].to_numpy(dtype=np.float64) for col in _BUFFER_COLUMNS[:-1]}
+        new["atr"] = self.atr.update_batch(highs, lows, new["close"])
+        for col, values in new.items():
+            self._columns[col] = np.concatenate([self._columns[col], values])
+        self._times = self._times.append(pd.DatetimeIndex(df.index, name="timestamp"))
+        self._candle_size_total += float(np.abs(highs - lows).sum())
+
+        stop = self.size - self.lookahead
+        if stop <= self.next_breakout:
+            return []
+        lo = self._anchor(self.next_breakout)
+        local = slice(lo - self._base, None)
+        frame = pd.DataFrame({col: self._columns[col][local] for col in _BUFFER_COLUMNS[:-1]})
+        engine = CupHandleEngine(frame, self.rules, chunk_size=self.chunk_size, atr=self._columns["atr"][local],
+                                 avg_candle_size=self.avg_candle_size,
+                                 breakouts=range(self.next_breakout - lo, stop - lo), config=self.config)
+
+        found = []
+        volumes = self._columns["volume"]
+        for flat in engine.iter_flat_blocks(offset=lo):
+            self.results.append(flat.cup_start, flat.breakout, flat.cup_len, flat.reason, flat.r2, flat.depth)
+            for candidate in _valid_candidates(flat, flat.valid_at, self._times, volumes, base=self._base):
+                found.append(self._record(candidate))
+        for record in found:
+            self.results.add_valid(record)
+        self.funnel.add(engine.funnel.to_frame())
+        self.next_breakout = stop
+        return found
+
+    def _anchor(self, breakout):
+        # first candle a breakout's lookback needs, rounded down to the rolling-sum block
+        return shard_start(breakout, self.config)
+
+    def _trim(self):
+        # drop candles no pending breakout can reach; done before appending so
+        # frame() still covers the patterns returned by the previous update
+        keep_from = self._anchor(self.next_breakout)
+        drop = keep_from - self._base
+        if drop > 0:
+            for col in _BUFFER_COLUMNS:
+                self._columns[col] = self._columns[col][drop:]
+            self._times = self._times[drop:]
+            self._base = keep_from
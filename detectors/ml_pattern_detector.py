@@ -1,13 +1,27 @@
 import pandas as pd
 from .pattern_detector import detect_cup_handle_patterns
-from ml import extract_features
-import joblib
-import os
-
-from config import MODEL_PATH, CONFIDENCE_THRESHOLD
-
-def detect_patterns_with_ml(df, confidence_threshold=CONFIDENCE_THRESHOLD):
-    patterns = detect_cup_handle_patterns(df)
+from ml import extract_features, model_registry
+from utils import pattern_positions
+
+import config
+
+def apply_ml_scores(patterns, features, probabilities, index, confidence_threshold):
+    """
+    Set ml_confidence / ml_valid on the patterns from their scored feature
+    rows, matched on (cup_start, breakout): a pattern without a feature row
+    (e.g. outside the data) gets None for both, never another one's score.
+    """
+    scores = dict(zip(zip(features["cup_start"].tolist(), features["breakout"].tolist()), probabilities))
+    cup_starts, breakouts = pattern_positions(patterns, index)
+    for pattern, key in zip(patterns, zip(cup_starts.tolist(), breakouts.tolist())):
+        confidence = scores.get(key)
+        pattern["ml_confidence"] = None if confidence is None else round(float(confidence), 4)
+        pattern["ml_valid"] = None if confidence is None else bool(confidence >= confidence_threshold)
+
+def detect_patterns_with_ml(df, confidence_threshold=None):
+    if confidence_threshold is None:
+        confidence_threshold = config.CONFIDENCE_THRESHOLD
+    patterns = detect_cup_handle_patterns(df).valid_patterns
 
     if not patterns:
         return []
@@ -17,30 +31,9 @@ def detect_patterns_with_ml(df, confidence_threshold=CONFIDENCE_THRESHOLD):
     if features_df.empty:
         return []
 
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"Trained model not found at {MODEL_PATH}")
-
-    model_bundle = joblib.load(MODEL_PATH)
-    model = model_bundle["model"]
-    scaler = model_bundle["scaler"]
-
-    feature_cols = [
-        "r2", "cup_depth", "cup_duration", "handle_duration",
-        "handle_retrace_ratio", "breakout_strength_pct",
-        "volume_slope", "breakout_volume"
-    ]
-
-    X = features_df[feature_cols]
-    X_scaled = scaler.transform(X)
-
-    probabilities = model.predict_proba(X_scaled)[:, 1]
+    # loaded once per process, reloaded when the model file is replaced
+    probabilities = model_registry().predict_proba(features_df)
     features_df["confidence"] = probabilities
 
-    filtered_patterns = []
-    for pattern, confidence in zip(patterns, probabilities):
-        pattern["ml_confidence"] = round(float(confidence), 4)
-        pattern["ml_valid"] = bool(confidence >= confidence_threshold)
-        if pattern["ml_valid"]:
-            filtered_patterns.append(pattern)
-
-    return filtered_patterns
\ No newline at end of file
+    apply_ml_scores(patterns, features_df, probabilities, df.index, confidence_threshold)
+    return [pattern for pattern in patterns if pattern["ml_valid"]]
@@ -1,368 +1,169 @@
+import os
 import numpy as np
 import pandas as pd
-from scipy.stats import linregress
-from typing import List
-import talib
-from utils.math_util import fit_parabola
-
-def calculate_atr(df, period=14):
-    high_low = df["high"] - df["low"]
-    high_close = np.abs(df["high"] - df["close"].shift())
-    low_close = np.abs(df["low"] - df["close"].shift())
-    tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-    atr = tr.rolling(window=period).mean()
-    return atr
-
-# Strict pattern detection, here some fields are too much costly to cal 
+from collections import namedtuple
+from .candidate_engine import (
+    CupHandleEngine, StageFunnel, DetectorConfig, DEFAULT_CONFIG, STRICT_RULES, LOOSE_RULES, DEFAULT_CHUNK_SIZE,
+    calculate_atr
+)
+from .pattern_results import PatternResults
+from .pyramid import pyramid_breakouts
+
+# One accepted candidate, as handed to the detectors' record builders
+ValidCandidate = namedtuple("ValidCandidate", [
+    "start_time", "end_time", "cup_start", "breakout", "cup_len", "breakout_volume",
+    "r2", "depth", "retrace", "volume_slope", "handle_high", "handle_low", "atr",
+])
+
+
+def _valid_candidates(flat, valid_at, index, volumes, base=0):
+    """
+    The valid candidates of a flat block at rows valid_at (a prefix of
+    flat.valid_at); index / volumes start at position base. Positions are
+    the key, timestamps are looked up once per block.
+    """
+    cup_starts, breakouts = flat.cup_start[valid_at], flat.breakout[valid_at]
+    start_times, end_times = index[cup_starts - base], index[breakouts - base]
+    breakout_volumes = volumes[breakouts - base]
+    return [
+        ValidCandidate(
+            start_time=start_times[n], end_time=end_times[n], cup_start=int(cup_starts[n]),
+            breakout=int(breakouts[n]), cup_len=int(flat.cup_len[k]), breakout_volume=float(breakout_volumes[n]),
+            **{name: float(values[n]) for name, values in flat.valid.items()},
+        )
+        for n, k in enumerate(valid_at)
+    ]
+
+
+def _collect_patterns(df, flat_blocks, rules, valid_record, summary_only=False):
+    """
+    Appends flattened blocks to a PatternResults log in (breakout index,
+    cup length) order, stopping after rules.max_valid valid patterns.
+    Only valid candidates are turned into dicts.
+    """
+    index = df.index
+    volumes = df["volume"].to_numpy(dtype=np.float64)
+    results = PatternResults(index, rules.reasons, summary_only=summary_only)
+    stopped = False
+
+    for flat in flat_blocks:
+        valid_at = flat.valid_at
+        keep = len(flat.reason)
+        stopped = results.valid_count + len(valid_at) >= rules.max_valid
+        if stopped:
+            valid_at = valid_at[:rules.max_valid - results.valid_count]
+            keep = valid_at[-1] + 1
+
+        results.append(flat.cup_start[:keep], flat.breakout[:keep], flat.cup_len[:keep], flat.reason[:keep],
+                       flat.r2[:keep], flat.depth[:keep])
+        for candidate in _valid_candidates(flat, valid_at, index, volumes):
+            results.add_valid(valid_record(candidate, len(results.valid_patterns), rules))
+        if stopped:
+            break
+    return results, stopped
+
+
+def _base_valid_fields(c):
+    return {
+        "start_time": c.start_time,
+        "end_time": c.end_time,
+        "cup_start": c.cup_start,
+        "breakout": c.breakout,
+        "cup_depth": c.depth,
+        "cup_duration": c.cup_len,
+        "handle_duration": c.breakout - (c.cup_start + c.cup_len),
+        "handle_high": c.handle_high,
+        "handle_low": c.handle_low,
+    }
+
+
+def _strict_fields(c):
+    record = _base_valid_fields(c)
+    record.update({
+        "handle_retrace_ratio": c.retrace,
+        "r2": c.r2,
+        "breakout_time": c.end_time,
+        "breakout_volume": c.breakout_volume,
+        "volume_slope": c.volume_slope,
+        "breakout_valid": True,
+        "atr_value": c.atr,
+        "valid": True,
+        "invalid_reason": ""
+    })
+    return record
+
+
+def _loose_fields(c):
+    record = _base_valid_fields(c)
+    record.update({
+        "r2": c.r2,
+        "handle_retrace_ratio": c.retrace,
+        "breakout_time": c.end_time,
+        "breakout_volume": c.breakout_volume,
+        "volume_slope": c.volume_slope,
+        "valid": True,
+        "invalid_reason": ""
+    })
+    return record
+
+
+# valid pattern dict layout per rule set
+VALID_FIELDS = {STRICT_RULES.name: _strict_fields, LOOSE_RULES.name: _loose_fields}
+
+
+def _strict_record(c, found, rules):
+    record = _strict_fields(c)
+    print(f"Pattern evaluated: {c.start_time} → {c.end_time}")
+    return record
+
+
+def _loose_record(c, found, rules):
+    record = _loose_fields(c)
+    # the last valid pattern returns before it is announced
+    if found + 1 < rules.max_valid:
+        print(f"{found} ✅  Pattern detected from {c.start_time} to {c.end_time}")
+    return record
+
+
+def _detect(df, rules, valid_record, chunk_size, summary_only, workers, config, pyramid):
+    # workers=0 / None means one per core; a pyramid pre-selects the breakouts and runs serially
+    workers = workers or os.cpu_count() or 1
+    if pyramid:
+        breakouts = pyramid_breakouts(df, rules, config, factors=pyramid)
+        engine = CupHandleEngine(df, rules, chunk_size=chunk_size, config=config, breakouts=breakouts)
+        results, stopped = _collect_patterns(df, engine.iter_flat_blocks(), rules, valid_record, summary_only)
+        results.funnel = engine.funnel.to_frame()
+        return results, stopped
+    if workers == 1:
+        engine = CupHandleEngine(df, rules, chunk_size=chunk_size, config=config)
+        results, stopped = _collect_patterns(df, engine.iter_flat_blocks(), rules, valid_record, summary_only)
+        results.funnel = engine.funnel.to_frame()
+        return results, stopped
+
+    from .sharded import iter_sharded_blocks
+    funnel = StageFunnel([])
+    blocks = iter_sharded_blocks(df, rules, workers=workers, chunk_size=chunk_size, funnel=funnel, config=config)
+    try:
+        results, stopped = _collect_patterns(df, blocks, rules, valid_record, summary_only)
+    finally:
+        blocks.close()
+    results.funnel = funnel.to_frame()
+    return results, stopped
+
+
+# Strict pattern detection, here some fields are too much costly to cal
 # and also cause invalid patterns , whihc will make code runn too long
-def detect_cup_handle_patterns(df: pd.DataFrame) -> List[dict]:
-    df = df.copy()
-    df["atr"] = calculate_atr(df)
-
-    results = []
-    closes = df["close"].values
-    highs = df["high"].values
-    lows = df["low"].values
-    volumes = df["volume"].values
-    atr = df["atr"].values
-
-    avg_candle_size = np.mean(np.abs(highs - lows))
-    
-    for i in range(300, len(df) - 60):
-        for cup_len in range(30, 301):
-            cup_start = i - cup_len - 50
-            cup_end = i - 50
-            handle_start = cup_end
-            handle_end = i
-            if cup_start < 0:
-                continue
-
-            try:
-                # Fit parabola to cup
-                cup_closes = closes[cup_start:cup_end]
-                x = np.arange(len(cup_closes))
-                coeffs, r2, y_fit = fit_parabola(x, cup_closes)
-
-                if r2 < 0.85 or coeffs[0] <= 0:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "r2": float(r2),
-                        "valid": False,
-                        "invalid_reason": "V-shape / low R²"
-                    })
-                    continue
-
-                depth = np.max(y_fit) - np.min(y_fit)
-                if depth < 2 * avg_candle_size:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "cup_depth": float(depth),
-                        "valid": False,
-                        "invalid_reason": "Cup too shallow"
-                    })
-                    continue
-
-                # Rim checks
-                left_rim_close = closes[cup_start]
-                right_rim_close = closes[cup_end - 1]
-                left_rim_high = highs[cup_start]
-                right_rim_high = highs[cup_end - 1]
-                avg_rim = (left_rim_close + right_rim_close) / 2
-                rim_price = max(left_rim_close, right_rim_close)
-                max_rim_high = max(left_rim_high, right_rim_high)
-
-                if abs(left_rim_close - right_rim_close) / avg_rim > 0.10:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Rim close mismatch > 10%"
-                    })
-                    continue
-
-                # 🔴 Rim highs mismatch check
-                rim_diff = abs(left_rim_high - right_rim_high) / np.mean([left_rim_high, right_rim_high])
-                if rim_diff > 0.10:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Rim highs mismatch > 10%"
-                    })
-                    continue
-
-                # Volume slope
-                vol_slope, *_ = linregress(np.arange(len(volumes[cup_start:cup_end])), volumes[cup_start:cup_end])
-                if vol_slope > 0:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Cup volume increasing"
-                    })
-                    continue
-
-                # Handle metrics
-                handle_closes = closes[handle_start:handle_end]
-                handle_high = highs[handle_start:handle_end].max()
-                handle_low = lows[handle_start:handle_end].min()
-
-                if handle_high > max_rim_high:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Handle high exceeds rim highs"
-                    })
-                    continue
-
-                if handle_low < np.min(cup_closes):
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Handle breaks below cup"
-                    })
-                    continue
-
-                retrace = (rim_price - handle_low) / depth if depth else 0
-                handle_duration = handle_end - handle_start
-
-                if retrace > 0.4:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Handle retracement > 40%"
-                    })
-                    continue
-
-                if handle_duration < 5 or handle_duration > 50:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Handle duration invalid"
-                    })
-                    continue
-
-                # Breakout validation (ATR + volume)
-                breakout_candle = df.iloc[i]
-                atr_value = atr[i]
-                breakout_strength = (breakout_candle["close"] - handle_high) > 1.5 * atr_value
-
-                if not breakout_strength:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "No strong price breakout (ATR rule failed)"
-                    })
-                    continue
-
-                recent_vol = volumes[i - 14:i]
-                if breakout_candle["volume"] < 1.5 * np.mean(recent_vol):
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "No breakout volume spike"
-                    })
-                    continue
-                
-                # ✅ Final valid pattern
-                results.append({
-                    "start_time": df.index[cup_start],
-                    "end_time": df.index[i],
-                    "cup_depth": float(depth),
-                    "cup_duration": cup_end - cup_start,
-                    "handle_duration": handle_duration,
-                    "handle_high": float(handle_high),
-                    "handle_low": float(handle_low),
-                    "handle_retrace_ratio": float(retrace),
-                    "r2": float(r2),
-                    "breakout_time": df.index[i],
-                    "breakout_volume": float(breakout_candle["volume"]),
-                    "volume_slope": float(vol_slope),
-                    "breakout_valid": breakout_strength,
-                    "atr_value": float(atr_value),
-                    "valid": True,
-                    "invalid_reason": ""
-                })
-                print(f"Pattern evaluated: {df.index[cup_start]} → {df.index[i]}")
-                if sum(p["valid"] for p in results) >= 2:
-                    print("Multiple valid patterns found, stopping further checks.")
-                    return results
-
-            except Exception as e:
-                results.append({
-                    "start_time": df.index[cup_start],
-                    "end_time": df.index[i],
-                    "valid": False,
-                    "invalid_reason": f"Exception: {str(e)}"
-                }) 
+def detect_cup_handle_patterns(df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                               summary_only: bool = False, workers: int = 1,
+                               config: DetectorConfig = DEFAULT_CONFIG, pyramid=None) -> PatternResults:
+    results, stopped = _detect(df, STRICT_RULES, _strict_record, chunk_size, summary_only, workers, config, pyramid)
+    if stopped:
+        print("Multiple valid patterns found, stopping further checks.")
     return results
 
-def detect_cup_handle_patterns_loose(df: pd.DataFrame) -> list:
-    results = []
-    closes = df['close'].values
-    highs = df['high'].values
-    lows = df['low'].values
-    volumes = df['volume'].values
-    avg_candle_size = np.mean(np.abs(highs - lows))
-    atr = talib.ATR(highs, lows, closes, timeperiod=14)
-    counter = 0
-
-    for i in range(300, len(df) - 60):
-        for cup_len in range(30, 301):
-            cup_start = i - cup_len - 50
-            cup_end = i - 50
-            handle_start = cup_end
-            handle_end = i
-            if cup_start < 0:
-                continue
-
-            try:
-                cup_closes = closes[cup_start:cup_end]
-                x = np.arange(len(cup_closes))
-                popt, r2, y_fit = fit_parabola(x, cup_closes)
-                if r2 < 0.85 or popt[0] <= 0:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "r2": float(r2),
-                        "valid": False,
-                        "invalid_reason": "Cup not U-shaped or low R²"
-                    })
-                    continue
-
-                depth = np.max(y_fit) - np.min(y_fit)
-                if depth < 2 * avg_candle_size:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "cup_depth": float(depth),
-                        "valid": False,
-                        "invalid_reason": "Cup too shallow"
-                    })
-                    continue
-
-                left_rim = cup_closes[0]
-                right_rim = cup_closes[-1]
-                avg_rim = (left_rim + right_rim) / 2
-                if abs(left_rim - right_rim) / avg_rim > 0.10:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Rim mismatch > 10%"
-                    })
-                    continue
-
-                # Volume trend check
-                vol_slope, *_ = linregress(np.arange(len(volumes[cup_start:cup_end])), volumes[cup_start:cup_end])
-                if vol_slope > 0:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Cup volume increasing"
-                    })
-                    continue
-
-                handle_closes = closes[handle_start:handle_end]
-                handle_high = np.max(handle_closes)
-                handle_low = np.min(handle_closes)
-
-                if handle_high > max(left_rim, right_rim):
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Handle high above rim"
-                    })
-                    continue
 
-                if handle_low < np.min(cup_closes):
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Handle breaks below cup"
-                    })
-                    continue
-
-                retrace = (handle_high - handle_low) / depth
-                handle_duration = handle_end - handle_start
-                if retrace > 0.4:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Handle retracement > 40%"
-                    })
-                    continue
-
-                if handle_duration < 5 or handle_duration > 50:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "Handle duration invalid"
-                    })
-                    continue
-
-                breakout_candle = df.iloc[i]
-                if breakout_candle['close'] <= handle_high + 1.5 * atr[i]:
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "No strong price breakout"
-                    })
-                    continue
-
-                recent_vol = volumes[i-14:i]
-                if breakout_candle['volume'] < 1.5 * np.mean(recent_vol):
-                    results.append({
-                        "start_time": df.index[cup_start],
-                        "end_time": df.index[i],
-                        "valid": False,
-                        "invalid_reason": "No breakout volume spike"
-                    })
-                    continue
-
-                # If all checks pass: VALID
-                results.append({
-                    "start_time": df.index[cup_start],
-                    "end_time": df.index[i],
-                    "cup_depth": float(depth),
-                    "cup_duration": cup_end - cup_start,
-                    "handle_duration": handle_duration,
-                    "handle_high": float(handle_high),
-                    "handle_low": float(handle_low),
-                    "r2": float(r2),
-                    "handle_retrace_ratio": float(retrace),
-                    "breakout_time": df.index[i],
-                    "breakout_volume": float(breakout_candle['volume']),
-                    "volume_slope": float(vol_slope),
-                    "valid": True,
-                    "invalid_reason": ""
-                })
-
-                if sum(p["valid"] for p in results) >= 30:
-                    return results
-
-            except Exception as e:
-                results.append({
-                    "start_time": df.index[cup_start],
-                    "end_time": df.index[i],
-                    "valid": False,
-                    "invalid_reason": f"Exception: {str(e)}"
-                })
-            print(f"{counter} ✅  Pattern detected from {df.index[cup_start]} to {df.index[i]}")
-            counter += 1
-
-    return results
\ No newline at end of file
+def detect_cup_handle_patterns_loose(df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                     summary_only: bool = False, workers: int = 1,
+                                     config: DetectorConfig = DEFAULT_CONFIG, pyramid=None) -> PatternResults:
+    results, _ = _detect(df, LOOSE_RULES, _loose_record, chunk_size, summary_only, workers, config, pyramid)
+    return results
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+from .candidate_engine import Rejection
+
+VALID_REASON = ""
+
+
+def _optional_bools(values):
+    """
+    An object column of True / False with gaps (None / NaN, e.g. ml_valid of
+    patterns the model did not score) as float64 1.0 / 0.0 / NaN; None for
+    any other column. As strings the gaps would become "nan".
+    """
+    if values.dtype != object:
+        return None
+    present = pd.notna(values)
+    if not present.any() or not all(isinstance(v, (bool, np.bool_)) for v in values[present]):
+        return None
+    floats = np.full(len(values), np.nan)
+    floats[present] = values[present].astype(np.float64)
+    return floats
+
+
+class PatternResults:
+    """
+    Struct-of-arrays log of every evaluated (breakout, cup length) candidate.
+
+    Each row is int32 positions, an int8 Rejection code and float32
+    metrics; only valid patterns are kept as dicts (valid_patterns, keyed
+    by their cup_start / breakout row positions). With summary_only=True
+    rejected candidates are just counted per reason. Timestamps are
+    resolved from the frame index in one step by to_frame().
+    """
+
+    def __init__(self, index, reasons, summary_only=False):
+        self.index = index
+        self.reasons = dict(reasons)
+        self.summary_only = summary_only
+        self.valid_patterns = []
+        self.funnel = None  # per-stage rule cascade counters (DataFrame), set by the detectors
+        self._counts = np.zeros(len(Rejection), dtype=np.int64)
+        self._chunks = []
+        self._columns = None
+
+    # --- building -------------------------------------------------------
+    def append(self, cup_starts, breakouts, cup_lengths, reasons, r2, depth):
+        """Add one block of evaluated candidates (flat arrays, evaluation order)."""
+        reasons = np.asarray(reasons, dtype=np.int8)
+        self._counts += np.bincount(reasons, minlength=len(Rejection))
+        if self.summary_only:
+            return
+        # Only the metric each rejection reported is kept, like the old dict records
+        r2 = np.where(reasons == Rejection.LOW_R2, r2, np.nan)
+        depth = np.where(reasons == Rejection.SHALLOW, depth, np.nan)
+        self._chunks.append((
+            np.asarray(cup_starts, dtype=np.int32), np.asarray(breakouts, dtype=np.int32),
+            np.asarray(cup_lengths, dtype=np.int16), reasons,
+            r2.astype(np.float32), depth.astype(np.float32),
+        ))
+        self._columns = None
+
+    def add_valid(self, record):
+        self.valid_patterns.append(record)
+
+    @property
+    def columns(self):
+        """Concatenated row arrays: cup_start, breakout, cup_len, reason, r2, cup_depth."""
+        if self._columns is None:
+            names = ("cup_start", "breakout", "cup_len", "reason", "r2", "cup_depth")
+            if self._chunks:
+                merged = [np.concatenate(parts) for parts in zip(*self._chunks)]
+            else:
+                merged = [np.empty(0, dtype=t) for t in (np.int32, np.int32, np.int16, np.int8, np.float32, np.float32)]
+            self._chunks = [tuple(merged)] if self._chunks else []
+            self._columns = dict(zip(names, merged))
+        return self._columns
+
+    # --- reading --------------------------------------------------------
+    def __len__(self):
+        return int(self._counts.sum())
+
+    def __iter__(self):
+        """Row dicts in evaluation order (slow for big logs; prefer to_frame/valid_patterns)."""
+        if self.summary_only:
+            return iter(self.valid_patterns)
+        return iter(self.to_frame().to_dict("records"))
+
+    @property
+    def valid_count(self):
+        return int(self._counts[Rejection.VALID])
+
+    def reason_counts(self):
+        """Number of candidates per invalid_reason ("" for valid patterns)."""
+        counts = {VALID_REASON: self.valid_count}
+        for code, reason in self.reasons.items():
+            counts[reason] = counts.get(reason, 0) + int(self._counts[code])
+        return pd.Series(counts, name="count")
+
+    def valid_frame(self):
+        return pd.DataFrame(self.valid_patterns)
+
+    def to_frame(self):
+        """Every row as a DataFrame; only valid patterns in summary_only mode."""
+        if self.summary_only:
+            return self.valid_frame()
+        cols = self.columns
+        reason = cols["reason"]
+        labels = [VALID_REASON] + [self.reasons.get(code, code.name) for code in list(Rejection)[1:]]
+        frame = pd.DataFrame({
+            "start_time": self.index[cols["cup_start"]],
+            "end_time": self.index[cols["breakout"]],
+            "cup_start": cols["cup_start"].astype(np.int64),
+            "breakout": cols["breakout"].astype(np.int64),
+            "r2": cols["r2"].astype(np.float64),
+            "cup_depth": cols["cup_depth"].astype(np.float64),
+            "valid": reason == Rejection.VALID,
+            "invalid_reason": pd.Categorical.from_codes(reason, categories=labels),
+        })
+        valid = self.valid_frame()
+        if not valid.empty:
+            rows = np.flatnonzero(reason == Rejection.VALID)
+            for col in valid.columns:
+                if col in ("start_time", "end_time", "cup_start", "breakout", "valid", "invalid_reason"):
+                    continue
+                placed = pd.Series(valid[col].to_numpy(), index=rows).reindex(frame.index)
+                frame[col] = placed if col not in frame else frame[col].where(placed.isna(), placed)
+        return frame
+
+    # --- persistence ----------------------------------------------------
+    def save(self, path):
+        """Write the log as a compressed .npz that load() (and the dashboard) reads back."""
+        arrays = {f"row__{name}": values for name, values in ({} if self.summary_only else self.columns).items()}
+        arrays["index"] = pd.DatetimeIndex(self.index).as_unit("ns").asi8
+        arrays["counts"] = self._counts
+        arrays["summary_only"] = np.array(self.summary_only)
+        arrays["reason_codes"] = np.array([int(code) for code in self.reasons], dtype=np.int8)
+        arrays["reason_labels"] = np.array(list(self.reasons.values()), dtype=str)
+        bool_columns = []
+        for col, values in self.valid_frame().items():
+            values = values.to_numpy()
+            optional = _optional_bools(values)
+            if optional is not None:
+                values = optional
+                bool_columns.append(col)
+            elif values.dtype.kind not in "biufmM":
+                values = values.astype(str)
+            arrays[f"valid__{col}"] = values
+        arrays["bool_columns"] = np.array(bool_columns, dtype=str)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            index = pd.DatetimeIndex(data["index"].astype("datetime64[ns]"), name="timestamp")
+            reasons = {Rejection(int(code)): str(label) for code, label in zip(data["reason_codes"], data["reason_labels"])}
+            results = cls(index, reasons, summary_only=bool(data["summary_only"]))
+            results._counts = data["counts"].astype(np.int64)
+            row_names = [name for name in data.files if name.startswith("row__")]
+            if row_names:
+                results._chunks = [tuple(data[f"row__{name}"] for name in
+                                         ("cup_start", "breakout", "cup_len", "reason", "r2", "cup_depth"))]
+            valid = pd.DataFrame({name[len("valid__"):]: data[name] for name in data.files if name.startswith("valid__")})
+            bool_columns = data["bool_columns"].tolist() if "bool_columns" in data.files else []
+        for col in bool_columns:
+            # True / False as saved, None where the value was missing
+            valid[col] = pd.Series([None if np.isnan(v) else bool(v) for v in valid[col]], index=valid.index,
+                                   dtype=object)
+        results.valid_patterns = valid.to_dict("records")
+        return results
@@ -0,0 +1,120 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .candidate_engine import (
+    CupHandleEngine, SharedMetrics, Rejection, DEFAULT_CONFIG, STRICT_RULES, LOOSE_RULES, DEFAULT_CHUNK_SIZE
+)
+
+# Rule profiles by name; a custom profile is any RuleSet, usually a variant
+# of a built-in one made with rule_profile()
+RULE_PROFILES = {STRICT_RULES.name: STRICT_RULES, LOOSE_RULES.name: LOOSE_RULES}
+
+
+def rule_profile(profile, **changes):
+    """
+    A RuleSet given by name or as a RuleSet, with fields replaced, e.g.
+    rule_profile("loose", name="loose_hl", handle_prices="high_low").
+    """
+    if isinstance(profile, str):
+        if profile not in RULE_PROFILES:
+            raise ValueError(f"Unknown rule profile {profile!r}, expected one of {sorted(RULE_PROFILES)}")
+        profile = RULE_PROFILES[profile]
+    return profile._replace(**changes) if changes else profile
+
+
+def register_profile(rules):
+    """Make a custom RuleSet available by its name."""
+    RULE_PROFILES[rules.name] = rules
+    return rules
+
+
+# One block evaluated under every profile: blocks[k] is the CandidateBlock of
+# profile k, accepted sets bit k where profile k found the candidate valid.
+ProfileBlock = namedtuple("ProfileBlock", ["blocks", "accepted", "shared"])
+
+# matches   one row per candidate at least one profile accepted, with a
+#           boolean column per profile and accepted_by naming them
+# counts    per profile: candidates evaluated and how many each reason took
+# funnels   per profile: its StageFunnel.to_frame()
+ProfileScan = namedtuple("ProfileScan", ["matches", "counts", "funnels"])
+
+
+class ProfileEngine:
+    """
+    Runs several rule profiles over one DataFrame in a single pass.
+
+    The rolling fits, range extrema, ATRs (one per ATR method) and average
+    candle size are prepared once and shared by every profile, and within
+    a block the parabola fits and cup volume slopes are computed once for
+    whichever profiles reach them. All profiles use the same DetectorConfig.
+    There is no max_valid early stop, every breakout is evaluated.
+    """
+
+    def __init__(self, df, profiles=(STRICT_RULES.name, LOOSE_RULES.name), chunk_size=DEFAULT_CHUNK_SIZE,
+                 config=DEFAULT_CONFIG, breakouts=None):
+        self.profiles = [rule_profile(profile) for profile in profiles]
+        self.names = [rules.name for rules in self.profiles]
+        if not self.names or len(set(self.names)) != len(self.names):
+            raise ValueError(f"Profiles need distinct names, got {self.names}")
+        if len(self.profiles) > 63:
+            raise ValueError("At most 63 profiles can be tagged in one pass")
+        self.df = df
+        self.chunk_size = chunk_size
+        base = CupHandleEngine(df, self.profiles[0], chunk_size=chunk_size, config=config, breakouts=breakouts)
+        self.engines = [base] + [base.with_rules(rules) for rules in self.profiles[1:]]
+
+    def evaluate(self, breakouts):
+        shared = SharedMetrics((len(breakouts), len(self.engines[0].cup_lengths)))
+        blocks = [engine.evaluate(breakouts, shared) for engine in self.engines]
+        accepted = np.zeros(blocks[0].reason.shape, dtype=np.int64)
+        for k, block in enumerate(blocks):
+            accepted |= ((block.reason == Rejection.VALID) & block.in_range).astype(np.int64) << k
+        return ProfileBlock(blocks=blocks, accepted=accepted, shared=shared)
+
+    def iter_blocks(self):
+        breakouts = self.engines[0].breakout_range()
+        for lo in range(0, len(breakouts), self.chunk_size):
+            yield self.evaluate(np.asarray(breakouts[lo:lo + self.chunk_size]))
+
+    def scan(self) -> ProfileScan:
+        index = self.df.index
+        counts = np.zeros((len(self.profiles), len(Rejection)), dtype=np.int64)
+        parts = []
+        for profile_block in self.iter_blocks():
+            first = profile_block.blocks[0]
+            for k, block in enumerate(profile_block.blocks):
+                counts[k] += np.bincount(block.reason[block.in_range], minlength=len(Rejection))
+            rows, cols = np.nonzero(profile_block.accepted)
+            shared = profile_block.shared
+            parts.append(pd.DataFrame({
+                "cup_start": first.cup_starts[rows, cols],
+                "breakout": first.breakouts[rows],
+                "cup_duration": first.cup_lengths[cols],
+                "r2": shared.r2[rows, cols],
+                "cup_depth": shared.depth[rows, cols],
+                "volume_slope": shared.volume_slope[rows, cols],
+                "accepted": profile_block.accepted[rows, cols],
+            }))
+
+        matches = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+            columns=["cup_start", "breakout", "cup_duration", "r2", "cup_depth", "volume_slope", "accepted"])
+        matches.insert(0, "start_time", index[matches["cup_start"].to_numpy(dtype=np.int64)])
+        matches.insert(1, "end_time", index[matches["breakout"].to_numpy(dtype=np.int64)])
+        accepted = matches.pop("accepted").to_numpy(dtype=np.int64)
+        for k, name in enumerate(self.names):
+            matches[name] = (accepted >> k & 1).astype(bool)
+        matches["accepted_by"] = [",".join(n for k, n in enumerate(self.names) if bits >> k & 1) for bits in accepted]
+
+        counts = pd.DataFrame(counts, index=pd.Index(self.names, name="profile"),
+                              columns=[reason.name.lower() for reason in Rejection])
+        counts.insert(0, "candidates", counts.sum(axis=1))
+        funnels = {name: engine.funnel.to_frame() for name, engine in zip(self.names, self.engines)}
+        return ProfileScan(matches=matches, counts=counts, funnels=funnels)
+
+
+def detect_with_profiles(df: pd.DataFrame, profiles=(STRICT_RULES.name, LOOSE_RULES.name),
+                         chunk_size: int = DEFAULT_CHUNK_SIZE, config=DEFAULT_CONFIG) -> ProfileScan:
+    """Cup & handle candidates of df tagged with the rule profiles that accept them, in one pass."""
+    return ProfileEngine(df, profiles, chunk_size=chunk_size, config=config).scan()
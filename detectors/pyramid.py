@@ -0,0 +1,109 @@
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from utils.resample import resample_ohlcv
+from .candidate_engine import (
+    CupHandleEngine, Rejection, CASCADE, DEFAULT_CONFIG, LOOSE_RULES, FIRST_BREAKOUT, LOOKAHEAD, lookback,
+    average_candle_size
+)
+
+DEFAULT_FACTORS = (15, 5)
+# Coarse screening only looks at the cup and handle shape; the breakout
+# checks (ATR, volume spike) need the 1m breakout candle and run at 1m.
+SCREEN_STAGES = tuple(stage for stage in CASCADE if stage.scope == "candidate")
+
+
+def screening_config(config, factor):
+    """config for candles `factor` times longer: windows scaled down, shape thresholds loosened."""
+    return config._replace(
+        min_cup_len=max(config.min_cup_len // factor, 3),
+        max_cup_len=max(-(-config.max_cup_len // factor), 4),
+        handle_offset=max(round(config.handle_offset / factor), 1),
+        min_r2=config.min_r2 - 0.25,
+        rim_tolerance=config.rim_tolerance * 2,
+        max_retrace=config.max_retrace * 2,
+        min_depth_candles=config.min_depth_candles / 2,
+    )
+
+
+def _expand(times, keep, pad, finer_times):
+    """Positions in finer_times covered by the kept bars of `times`, widened by pad bars each side."""
+    kept = np.flatnonzero(keep)
+    edges = np.r_[times.asi8, np.iinfo(np.int64).max]
+    lo = np.searchsorted(finer_times.asi8, edges[np.maximum(kept - pad, 0)], side="left")
+    hi = np.searchsorted(finer_times.asi8, edges[np.minimum(kept + pad + 1, len(times))], side="left")
+    marks = np.zeros(len(finer_times) + 1, dtype=np.int64)
+    np.add.at(marks, lo, 1)
+    np.add.at(marks, hi, -1)
+    return np.cumsum(marks[:-1]) > 0
+
+
+def pyramid_breakouts(df, rules=LOOSE_RULES, config=DEFAULT_CONFIG, factors=DEFAULT_FACTORS, pad=1):
+    """
+    1m breakout indices worth evaluating, found coarse-to-fine.
+
+    The frame is resampled to each factor (minutes, coarsest first). At
+    each level the cup & handle shape rules run with screening_config() on
+    the breakouts the previous level kept; a bar is kept if any cup length
+    passes. The bars kept at the finest level (padded by `pad` bars) give
+    the 1m breakouts for the full rule set.
+    """
+    index = pd.DatetimeIndex(df.index)
+    avg_candle_size = average_candle_size(df)
+    allowed = None  # mask over the current level's bars, None = all
+    times = None
+    for factor in sorted(factors, reverse=True):
+        coarse = resample_ohlcv(df, factor)
+        if allowed is not None:
+            allowed = _expand(times, allowed, pad, pd.DatetimeIndex(coarse.index))
+        screen = screening_config(config, factor)
+        first = lookback(screen)
+        candidates = np.arange(first, len(coarse)) if allowed is None else np.flatnonzero(allowed[first:]) + first
+        # depth is judged in 1m candle sizes so the threshold stays in price terms
+        engine = CupHandleEngine(coarse, rules, stages=SCREEN_STAGES, avg_candle_size=avg_candle_size,
+                                 breakouts=candidates, config=screen)
+        allowed = np.zeros(len(coarse), dtype=bool)
+        for block in engine.iter_blocks():
+            allowed[block.breakouts] = ((block.reason == Rejection.VALID) & block.in_range).any(axis=1)
+        times = pd.DatetimeIndex(coarse.index)
+
+    selected = np.ones(len(df), dtype=bool) if allowed is None else _expand(times, allowed, pad, index)
+    breakouts = np.flatnonzero(selected)
+    return breakouts[(breakouts >= FIRST_BREAKOUT) & (breakouts < len(df) - LOOKAHEAD)]
+
+
+def _valid_keys(engine):
+    keys = []
+    for block in engine.iter_blocks():
+        rows, cols = np.nonzero((block.reason == Rejection.VALID) & block.in_range)
+        keys += zip(block.breakouts[rows].tolist(), block.cup_lengths[cols].tolist())
+    return set(keys)
+
+
+def pyramid_recall(df, rules=LOOSE_RULES, config=DEFAULT_CONFIG, factors=DEFAULT_FACTORS, pad=1) -> pd.Series:
+    """
+    Speed / accuracy of the pyramid against the full 1m scan: breakouts
+    evaluated, valid (breakout, cup length) candidates found by each, the
+    recall of the pyramid and the seconds each took (no max_valid stop).
+    """
+    started = perf_counter()
+    full_engine = CupHandleEngine(df, rules, config=config)
+    full = _valid_keys(full_engine)
+    full_seconds = perf_counter() - started
+
+    started = perf_counter()
+    breakouts = pyramid_breakouts(df, rules, config, factors, pad)
+    pyramid = _valid_keys(CupHandleEngine(df, rules, config=config, breakouts=breakouts))
+    pyramid_seconds = perf_counter() - started
+
+    return pd.Series({
+        "breakouts_full": len(full_engine.breakout_range()),
+        "breakouts_pyramid": len(breakouts),
+        "valid_full": len(full),
+        "valid_pyramid": len(pyramid),
+        "recall": len(full & pyramid) / len(full) if full else np.nan,
+        "seconds_full": full_seconds,
+        "seconds_pyramid": pyramid_seconds,
+    })
@@ -0,0 +1,110 @@
+import os
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from utils.range_extrema import DEFAULT_MAX_WINDOW
+from utils.rolling_fit import anchor_block
+from .candidate_engine import (
+    CupHandleEngine, DEFAULT_CONFIG, FIRST_BREAKOUT, LOOKAHEAD, DEFAULT_CHUNK_SIZE, lookback, rules_atr,
+    average_candle_size
+)
+
+SHARED_COLUMNS = ("high", "low", "close", "volume", "atr")
+
+
+def shard_start(breakout, config=DEFAULT_CONFIG):
+    """
+    First candle a shard starting at `breakout` needs. A breakout looks back
+    over the longest cup plus the handle and never past itself (the LOOKAHEAD
+    candles after a shard are kept so it sees the same neighbourhood as a
+    serial run). The start is rounded down to a block boundary of the rolling
+    sums, so every window sum (and with it every fit and comparison) is
+    bit-for-bit the serial one.
+    """
+    align = max(anchor_block(config.max_cup_len),
+                anchor_block(max(config.max_cup_len, config.handle_offset, DEFAULT_MAX_WINDOW)))
+    return max(breakout - lookback(config), 0) // align * align
+
+
+def shard_ranges(breakouts, shards):
+    """Split a range of breakout indices into at most `shards` contiguous ranges."""
+    edges = np.linspace(breakouts.start, breakouts.stop, min(shards, len(breakouts)) + 1).astype(np.int64)
+    return [range(int(lo), int(hi)) for lo, hi in zip(edges[:-1], edges[1:]) if hi > lo]
+
+
+def _evaluate_shard(task):
+    name, size, rules, config, shard, chunk_size, avg_candle_size = task
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        data = np.ndarray((len(SHARED_COLUMNS), size), dtype=np.float64, buffer=shm.buf)
+        lo = shard_start(shard.start, config)
+        hi = min(shard.stop + LOOKAHEAD, size)
+        frame = pd.DataFrame({col: data[k, lo:hi].copy() for k, col in enumerate(SHARED_COLUMNS[:-1])})
+        atr = data[-1, lo:hi].copy()
+        del data
+    finally:
+        shm.close()
+
+    engine = CupHandleEngine(frame, rules, chunk_size=chunk_size, atr=atr, avg_candle_size=avg_candle_size,
+                             breakouts=range(shard.start - lo, shard.stop - lo), config=config)
+    blocks = list(engine.iter_flat_blocks(offset=lo))
+    return blocks, engine.funnel.to_frame()
+
+
+def _take(future, funnel):
+    blocks, shard_funnel = future.result()
+    if funnel is not None:
+        funnel.add(shard_funnel)
+    return blocks
+
+
+def iter_sharded_blocks(df, rules, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, shards=None, funnel=None,
+                        config=DEFAULT_CONFIG):
+    """
+    Evaluate the breakouts of df in a process pool and yield the flattened
+    blocks in the same order as CupHandleEngine(df, rules).iter_flat_blocks().
+
+    The columns, ATR and average candle size are computed once here (talib's
+    ATR is recursive over the whole history, so a shard cannot warm it up on
+    its own) and shared with the workers through one shared-memory block;
+    each worker only copies out its shard plus the halo. Shards are consumed
+    in order with a bounded number in flight, so closing the generator early
+    (the detectors stop after rules.max_valid patterns) cancels the rest.
+    Worker funnels are folded into `funnel` as their shards are yielded.
+    """
+    workers = workers or os.cpu_count() or 1
+    size = len(df)
+    breakouts = range(FIRST_BREAKOUT, max(size - LOOKAHEAD, FIRST_BREAKOUT))
+    if not len(breakouts):
+        return
+    columns = [df[col].to_numpy(dtype=np.float64) for col in SHARED_COLUMNS[:-1]] + [rules_atr(df, rules, config.atr_period)]
+    avg_candle_size = average_candle_size(df)
+
+    shm = shared_memory.SharedMemory(create=True, size=len(SHARED_COLUMNS) * size * 8)
+    try:
+        data = np.ndarray((len(SHARED_COLUMNS), size), dtype=np.float64, buffer=shm.buf)
+        data[:] = columns
+        del data
+        tasks = [(shm.name, size, rules, config, shard, chunk_size, avg_candle_size)
+                 for shard in shard_ranges(breakouts, shards or 4 * workers)]
+
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=mp.get_context())
+        pending = deque()
+        try:
+            for task in tasks:
+                pending.append(executor.submit(_evaluate_shard, task))
+                if len(pending) >= 2 * workers:
+                    yield from _take(pending.popleft(), funnel)
+            while pending:
+                yield from _take(pending.popleft(), funnel)
+        finally:
+            # queued shards are dropped, running ones finish before the block is unlinked
+            executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        shm.close()
+        shm.unlink()
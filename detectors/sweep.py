@@ -0,0 +1,52 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from .candidate_engine import CupHandleEngine, SharedMetrics, Rejection, DEFAULT_CONFIG, LOOSE_RULES, DEFAULT_CHUNK_SIZE
+
+
+def config_grid(base=DEFAULT_CONFIG, **values):
+    """Every combination of the given DetectorConfig fields, e.g. config_grid(min_r2=[0.8, 0.85])."""
+    names = list(values)
+    return [base._replace(**dict(zip(names, combo))) for combo in itertools.product(*values.values())]
+
+
+def sweep_detector_configs(df: pd.DataFrame, configs, rules=LOOSE_RULES,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Valid-pattern counts for a list of DetectorConfigs in one pass over df.
+
+    The rolling fits, range extrema, ATRs and average candle size are built
+    once and shared by every config; each block of breakouts is then run
+    through every config's cascade before moving on. Within a block the
+    candidate fits (parabola, volume slope) are shared too: configs with the
+    same min_cup_len and handle_offset look at the same cups, so each cup is
+    fitted once and only the rule thresholds differ. Unlike the detectors
+    there is no max_valid early stop, every breakout is evaluated.
+    Returns one row per config: its fields, candidates and valid_patterns.
+    """
+    configs = list(configs)
+    base = CupHandleEngine(df, rules, chunk_size=chunk_size, config=configs[0],
+                           max_cup_len=max(config.max_cup_len for config in configs))
+    engines = [base.with_config(config) for config in configs]
+    counts = np.zeros((len(configs), len(Rejection)), dtype=np.int64)
+    # SharedMetrics columns count cup lengths from min_cup_len: one per (min_cup_len,
+    # handle_offset), wide enough for the longest max_cup_len among its configs
+    cup_windows = [(config.min_cup_len, config.handle_offset) for config in configs]
+    widths = {}
+    for window, config in zip(cup_windows, configs):
+        widths[window] = max(widths.get(window, 0), config.max_cup_len - config.min_cup_len + 1)
+
+    breakouts = base.breakout_range()
+    for lo in range(breakouts.start, breakouts.stop, chunk_size):
+        block_breakouts = np.arange(lo, min(lo + chunk_size, breakouts.stop))
+        shared = {window: SharedMetrics((len(block_breakouts), width)) for window, width in widths.items()}
+        for k, engine in enumerate(engines):
+            block = engine.evaluate(block_breakouts, shared[cup_windows[k]])
+            counts[k] += np.bincount(block.reason[block.in_range], minlength=len(Rejection))
+
+    table = pd.DataFrame(configs)
+    table["candidates"] = counts.sum(axis=1)
+    table["valid_patterns"] = counts[:, Rejection.VALID]
+    return table
@@ -1,109 +1,88 @@
 import os
-import pandas as pd
-import joblib
 import argparse
 
-from detectors import detect_cup_handle_patterns_loose
-from ml import extract_features, train_incremental
-from utils import plot_and_save_pattern
-from config import (
-    RAW_DATA_PATH, OUTPUT_DIR, FEATURE_PATH, RULE_REPORT_PATH,
-    ML_REPORT_PATH, MODEL_PATH, CONFIDENCE_THRESHOLD, MIN_VALID_PATTERNS
+import config as cfg
+from detectors import (
+    detect_cup_handle_patterns_loose, DetectorConfig, sweep_detector_configs, config_grid, pyramid_recall,
+    apply_ml_scores
 )
+from ml import default_feature_store, config_hash, auto_label, model_registry, export_scorer
+from preprocessor import load_frame
+from utils import use_indicator_cache
 
-def auto_label(row, df):
-    try:
-        cup_start = row["start_time"]
-        cup_end = cup_start + pd.Timedelta(minutes=row["cup_duration"])
-        cup_volume = df.loc[cup_start:cup_end]["volume"]
-        avg_cup_vol = cup_volume.mean() or 1
-        return int(
-            row["r2"] >= 0.90 and
-            row["breakout_strength_pct"] > 0.015 and
-            row["handle_retrace_ratio"] < 0.35 and
-            row["volume_slope"] >= 0 and
-            row["breakout_volume"] > 1.25 * avg_cup_vol
-        )
-    except Exception:
-        return 0
-
-def run_detection_pipeline():
-    df = pd.read_csv(RAW_DATA_PATH, parse_dates=["timestamp"])
-    df.set_index("timestamp", inplace=True)
+def load_raw_data():
+    # a range that cannot fit MEMORY_BUDGET_MB is refused before anything is read
+    budget = cfg.MEMORY_BUDGET_MB * 2**20 if cfg.MEMORY_BUDGET_MB else None
+    return load_frame(cfg.RAW_DATA_PATH, cfg.MARKET_SYMBOL, budget_bytes=budget)
+
+def run_detection_pipeline(config=None):
+    # training (scikit-learn) and plotting (plotly, kaleido) are only imported by the runs that use them
+    from ml import train_incremental
+    from utils import plot_and_save_pattern
+
+    config = config or DetectorConfig(**cfg.DETECTOR_SETTINGS)
+    df = load_raw_data()
 
     # Step 1: Rule-Based Pattern Detection
-    patterns = detect_cup_handle_patterns_loose(df)
-    valid_patterns = [p for p in patterns if p["valid"]]
+    results = detect_cup_handle_patterns_loose(df, workers=cfg.DETECTION_WORKERS, config=config, pyramid=cfg.DETECTION_PYRAMID)
+    valid_patterns = results.valid_patterns
     print(f"\n✅ Rule-based: {len(valid_patterns)} valid patterns detected")
 
     pretrained_used = False
 
-    if len(valid_patterns) < MIN_VALID_PATTERNS:
-        print(f"⚠️ Only {len(valid_patterns)} valid patterns found (<{MIN_VALID_PATTERNS})")
-        if os.path.exists(MODEL_PATH):
+    if len(valid_patterns) < cfg.MIN_VALID_PATTERNS:
+        print(f"⚠️ Only {len(valid_patterns)} valid patterns found (<{cfg.MIN_VALID_PATTERNS})")
+        if os.path.exists(cfg.MODEL_PATH):
             print("🤖 Using pretrained model for ML scoring...")
             pretrained_used = True
         else:
             print("🛑 No pretrained model available. Exiting.")
             return
 
-    # Step 2: Feature Extraction
-    features_df = extract_features(patterns, df)
+    # Step 2 + 3: Feature Extraction and Auto-label, only for patterns the feature store has not seen
+    store = default_feature_store()
+    features_df = store.features_for(valid_patterns, df, config_hash(config, rules="loose"),
+                                     label=lambda features: auto_label(features, df))
     if features_df.empty:
         print("❌ Feature extraction returned empty. Exiting.")
         return
-
-    # Step 3: Auto-label
-    features_df["label"] = features_df.apply(lambda row: auto_label(row, df), axis=1)
-    os.makedirs(os.path.dirname(FEATURE_PATH), exist_ok=True)
-    features_df.to_csv(FEATURE_PATH, index=False)
-    print(f"🧠 Features saved to {FEATURE_PATH}")
+    print(f"🧠 Features stored in {store.folder}")
 
     # Step 4: Train model if not exists
-    if not os.path.exists(MODEL_PATH):
+    if not os.path.exists(cfg.MODEL_PATH):
         print("⚙️ No model found. Training initial model...")
         train_incremental()
     else:
         print("📦 Existing model found." + (" (pretrained fallback)" if pretrained_used else ""))
 
-    # Step 5: Load Model and Apply to All Patterns
-    model_bundle = joblib.load(MODEL_PATH)
-    model = model_bundle["model"]
-    scaler = model_bundle["scaler"]
-
-    feature_cols = [
-        "r2", "cup_depth", "cup_duration", "handle_duration",
-        "handle_retrace_ratio", "breakout_strength_pct",
-        "volume_slope", "breakout_volume"
-    ]
-
+    # Step 5: Apply the (cached) Model to All Patterns
     try:
-        X = features_df[feature_cols]
-        X_scaled = scaler.transform(X)
-        y_proba = model.predict_proba(X_scaled)[:, 1]
+        y_proba = model_registry().predict_proba(features_df)
     except Exception as e:
         print(f"❌ Error in ML inference: {e}")
         return
 
-    # Step 6: Add ML Confidence & Validity
-    for pattern, confidence in zip(patterns, y_proba):
-        pattern["ml_confidence"] = round(float(confidence), 4)
-        pattern["ml_valid"] = bool(confidence >= CONFIDENCE_THRESHOLD)
+    # Step 6: Add ML Confidence & Validity (matched by position: patterns outside the data have no features)
+    apply_ml_scores(valid_patterns, features_df, y_proba, df.index, cfg.CONFIDENCE_THRESHOLD)
 
     # Step 7: Save Rule-Based Report
-    os.makedirs(os.path.dirname(RULE_REPORT_PATH), exist_ok=True)
-    pd.DataFrame(patterns).to_csv(RULE_REPORT_PATH, index=False)
-    print(f"📄 Rule-based report saved: {RULE_REPORT_PATH}")
-
-    # Step 8: Save ML-Enhanced Report
-    os.makedirs(os.path.dirname(ML_REPORT_PATH), exist_ok=True)
-    pd.DataFrame(patterns).to_csv(ML_REPORT_PATH, index=False)
-    print(f"📄 ML-enhanced report saved: {ML_REPORT_PATH}")
+    report_df = results.to_frame()
+    os.makedirs(os.path.dirname(cfg.RULE_REPORT_PATH), exist_ok=True)
+    report_df.to_csv(cfg.RULE_REPORT_PATH, index=False)
+    print(f"📄 Rule-based report saved: {cfg.RULE_REPORT_PATH}")
+
+    # Step 8: Save ML-Enhanced Report (+ columnar results for the dashboard)
+    os.makedirs(os.path.dirname(cfg.ML_REPORT_PATH), exist_ok=True)
+    report_df.to_csv(cfg.ML_REPORT_PATH, index=False)
+    results.save(cfg.RESULTS_PATH)
+    print(f"📄 ML-enhanced report saved: {cfg.ML_REPORT_PATH}")
+    print(f"🔢 Rejections by reason:\n{results.reason_counts().to_string()}")
+    print(f"⏱️ Rule cascade funnel:\n{results.funnel.to_string(index=False)}")
 
     # Step 9: Plot ML-Valid and Valid Patterns Only
-    ml_patterns = [p for p in patterns if p.get("ml_valid")]
-    print(f"📈 {len(ml_patterns)} ML-valid patterns found (confidence >= {CONFIDENCE_THRESHOLD})")
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    ml_patterns = [p for p in valid_patterns if p.get("ml_valid")]
+    print(f"📈 {len(ml_patterns)} ML-valid patterns found (confidence >= {cfg.CONFIDENCE_THRESHOLD})")
+    os.makedirs(cfg.OUTPUT_DIR, exist_ok=True)
     for i, pattern in enumerate(ml_patterns):
         required_keys = ["cup_duration", "handle_duration", "start_time", "end_time"]
         if not all(k in pattern for k in required_keys):
@@ -111,12 +90,12 @@ def run_detection_pipeline():
             continue
 
         filename = f"ml_cup_handle_{i+1}.png"
-        save_path = os.path.join(OUTPUT_DIR, filename)
+        save_path = os.path.join(cfg.OUTPUT_DIR, filename)
         plot_and_save_pattern(df, pattern, save_path)
 
     print(f"📸 Saved {len(ml_patterns)} ML-validated pattern plots.")
 
-    for i, pattern in enumerate(patterns):
+    for i, pattern in enumerate(valid_patterns):
         if pattern["valid"]:
             required_keys = ["cup_duration", "handle_duration", "start_time", "end_time"]
             if not all(k in pattern for k in required_keys):
@@ -128,12 +107,12 @@ def run_detection_pipeline():
                   f"Breakout: {pattern['breakout_time']}")
 
             filename = f"cup_handle_{i+1}.png"
-            save_path = os.path.join(OUTPUT_DIR, filename)
+            save_path = os.path.join(cfg.OUTPUT_DIR, filename)
             plot_and_save_pattern(df, pattern, save_path)
         else:
             pass
 
-    print(f"📸 Saved {len(patterns)} Lib-validated pattern plots.")
+    print(f"📸 Saved {len(valid_patterns)} Lib-validated pattern plots.")
 
     # Step 10: Retrain model if not using fallback
     if not pretrained_used:
@@ -146,7 +125,28 @@ def run_detection_pipeline():
     # run_server()
 
 
+def run_parameter_sweep(config=None):
+    base = config or DetectorConfig(**cfg.DETECTOR_SETTINGS)
+    configs = config_grid(base, **cfg.SWEEP_GRID)
+    print(f"🔬 Sweeping {len(configs)} detector configs...")
+    table = sweep_detector_configs(load_raw_data(), configs)
+    os.makedirs(os.path.dirname(cfg.SWEEP_REPORT_PATH), exist_ok=True)
+    table.to_csv(cfg.SWEEP_REPORT_PATH, index=False)
+    varied = list(cfg.SWEEP_GRID) + ["candidates", "valid_patterns"]
+    print(table[varied].to_string(index=False))
+    print(f"📄 Sweep report saved: {cfg.SWEEP_REPORT_PATH}")
+
+
+def run_pyramid_report(config=None):
+    config = config or DetectorConfig(**cfg.DETECTOR_SETTINGS)
+    factors = cfg.DETECTION_PYRAMID or (15, 5)
+    print(f"🔺 Coarse-to-fine {'m → '.join(map(str, factors))}m → 1m vs full 1m scan")
+    print(pyramid_recall(load_raw_data(), config=config, factors=factors).to_string())
+
+
 def run_ml_training():
+    from ml import train_incremental
+
     print("🧠 Manually triggering model training...")
     train_incremental()
     print("✅ Model trained.")
@@ -155,12 +155,28 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run pattern detection or ML training")
     parser.add_argument("--detect-only", action="store_true", help="Run detection pipeline only")
     parser.add_argument("--train-ml", action="store_true", help="Train model only (no detection)")
+    parser.add_argument("--sweep", action="store_true", help="Count valid patterns for every config in cfg.SWEEP_GRID")
+    parser.add_argument("--pyramid-report", action="store_true", help="Recall / speed of the coarse-to-fine scan")
+    parser.add_argument("--export-scorer", action="store_true", help="Export the model as its NumPy-only scorer (.npz)")
+    parser.add_argument("--config", help="Config file to use instead of data/configuration/config.json")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a config.json key (JSON value), e.g. --set CONFIDENCE_THRESHOLD=0.6")
 
     args = parser.parse_args()
+    cfg.override(args.config, **cfg.parse_overrides(args.set))
+    # repeated runs over the same raw data load ATRs / candle sizes instead of recomputing them
+    cache_bytes = cfg.INDICATOR_CACHE_MB * 2**20 if cfg.INDICATOR_CACHE_MB else None
+    use_indicator_cache(cfg.INDICATOR_CACHE_DIR, cache_bytes)
 
     if args.train_ml:
         run_ml_training()
     elif args.detect_only:
         run_detection_pipeline()
+    elif args.sweep:
+        run_parameter_sweep()
+    elif args.pyramid_report:
+        run_pyramid_report()
+    elif args.export_scorer:
+        print(f"💾 Scorer exported to: {export_scorer()}")
     else:
-        print("ℹ️ Please provide a flag: --detect-only or --train-ml")
+        print("ℹ️ Please provide a flag: --detect-only, --train-ml, --sweep, --pyramid-report or --export-scorer")
@@ -1,2 +1,25 @@
-from .ml_feature_extractor import extract_features
-from .train_model import train_incremental
\ No newline at end of file
+import importlib
+
+from .ml_feature_extractor import extract_features, batch_features, FEATURE_COLUMNS
+from .labeling import auto_label, label_patterns, label_rules, unlabeled_counts, LabelRules, Unlabeled, UNLABELED
+from .linear_scorer import LinearScorer, export_scorer, scorer_path
+from .model_registry import ModelRegistry, ModelBundle, model_registry
+from .micro_batcher import MicroBatcher, LatencyStats
+
+# imported on first use: training pulls in scikit-learn, the feature store pyarrow.parquet
+# (scoring needs neither)
+_LAZY = {
+    "train_incremental": ".train_model",
+    "FeatureStore": ".feature_store",
+    "default_feature_store": ".feature_store",
+    "config_hash": ".feature_store",
+    "window_hashes": ".feature_store",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,181 @@
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import config
+from .ml_feature_extractor import POST_BREAKOUT, locate_patterns, located_features
+
+# a stored feature row is identified by these columns (plus the symbol, its folder)
+KEY_COLUMNS = ["cup_start", "breakout", "config_hash", "data_hash"]
+HASH_COLUMNS = ("open", "high", "low", "close", "volume")
+TRAINED_NAME = "_trained.json"
+DEFAULT_CHUNK_ROWS = 65536
+# config_hash of seeded rows, whose patterns are not known
+SEED_HASH = 0
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=True)
+
+
+def config_hash(detector_config, rules=None):
+    """Hash of the detector settings (a DetectorConfig and the rule profile name) that produced the patterns."""
+    settings = {"config": dict(detector_config._asdict()), "rules": rules}
+    return _hash64(json.dumps(settings, sort_keys=True, default=str).encode())
+
+
+def window_hashes(df, cup_starts, breakouts):
+    """
+    Content hash of the candles each pattern's features and label read:
+    from the cup start through the post-breakout window. A pattern whose
+    window later gains candles (it was at the end of the data) gets a new
+    hash, so its features are recomputed.
+    """
+    values = np.ascontiguousarray(df[list(HASH_COLUMNS)].to_numpy(dtype=np.float64))
+    stamps = df.index.as_unit("ns").asi8
+    stops = np.minimum(np.asarray(breakouts) + POST_BREAKOUT, len(df))
+    return np.array([_hash64(stamps[lo:lo + 1].tobytes() + values[lo:hi].tobytes())
+                     for lo, hi in zip(cup_starts, stops)], dtype=np.int64)
+
+
+class FeatureStore:
+    """
+    Extracted (and labeled) pattern features of one symbol, as append-only
+    Parquet parts: <root>/<symbol>/part-000001.parquet, part-000002, ...
+
+    Rows are keyed by (cup_start, breakout, config_hash, data_hash), so a
+    pattern found again by the same detector settings over the same candles
+    is read back instead of extracted again. Parts are never rewritten;
+    iter_chunks() streams them, optionally only those after a given part,
+    which is how training skips rows a model has already seen.
+
+    An empty store can be seeded from a CSV of labeled feature rows (the
+    pattern_features_for_labeling.csv training set): seed() writes it as
+    part 1 under the SEED_HASH key, which no detector config produces, so
+    it is trained on but never read back as a pattern's features.
+    """
+
+    def __init__(self, root, symbol):
+        self.root = root
+        self.symbol = symbol
+        self.folder = os.path.join(root, symbol)
+
+    def parts(self):
+        return sorted(glob.glob(os.path.join(self.folder, "part-*.parquet")))
+
+    @staticmethod
+    def part_number(path):
+        return int(os.path.basename(path)[len("part-"):-len(".parquet")])
+
+    def last_part(self):
+        parts = self.parts()
+        return self.part_number(parts[-1]) if parts else 0
+
+    def append(self, frame):
+        """Write frame as the next part; returns its path (None for an empty frame)."""
+        if frame.empty:
+            return None
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, f"part-{self.last_part() + 1:06d}.parquet")
+        tmp = path + ".tmp"
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), tmp, compression="zstd")
+        os.replace(tmp, path)
+        return path
+
+    def iter_chunks(self, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS, after=0, filters=None):
+        """DataFrames of at most chunk_rows rows over the parts numbered above `after`, oldest first."""
+        for path in self.parts():
+            if self.part_number(path) <= after:
+                continue
+            if filters is not None:
+                table = pq.read_table(path, columns=columns, filters=filters)
+                for lo in range(0, table.num_rows, chunk_rows):
+                    yield table.slice(lo, chunk_rows).to_pandas()
+                continue
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+                yield batch.to_pandas()
+
+    def read(self, columns=None, after=0, filters=None):
+        chunks = list(self.iter_chunks(columns, after=after, filters=filters))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+
+    def seed(self, csv_path):
+        """Import csv_path as the first part if the store is empty; returns the part's path or None."""
+        if not csv_path or not os.path.exists(csv_path) or self.parts():
+            return None
+        frame = pd.read_csv(csv_path, parse_dates=["start_time"])
+        for column in KEY_COLUMNS:
+            frame[column] = np.int64(SEED_HASH if column.endswith("_hash") else -1)
+        path = self.append(frame)
+        print(f"🗃️ Features: seeded {len(frame)} labeled rows from {csv_path}")
+        return path
+
+    def features_for(self, patterns, df, config_hash, label=None):
+        """
+        Features of the valid patterns (as extract_features(patterns, df)
+        returns them, in order, with the key columns and any stored label).
+        Patterns the store already holds are read back; the rest are
+        extracted, labeled with label(features) if given and appended.
+        """
+        patterns, cup_starts, breakouts = locate_patterns(patterns, df)
+        if not patterns:
+            return pd.DataFrame()
+        keys = pd.DataFrame({"cup_start": cup_starts, "breakout": breakouts, "config_hash": config_hash,
+                             "data_hash": window_hashes(df, cup_starts, breakouts)})
+        # keys first: feature columns are read only for the patterns found, not the whole history
+        stored_keys = self.read(columns=KEY_COLUMNS, filters=[("config_hash", "=", config_hash)])
+        found = keys.merge(stored_keys.drop_duplicates().assign(_stored=True), on=KEY_COLUMNS, how="left")
+        known = found["_stored"].eq(True).to_numpy()
+        stored = pd.DataFrame()
+        if known.any():
+            stored = self.read(filters=[("config_hash", "=", config_hash),
+                                        ("data_hash", "in", keys["data_hash"][known].unique().tolist())])
+            stored = stored.drop_duplicates(KEY_COLUMNS, keep="last")
+
+        new = located_features([p for p, seen in zip(patterns, known) if not seen],
+                               cup_starts[~known], breakouts[~known], df)
+        if not new.empty:
+            new["config_hash"] = config_hash
+            new["data_hash"] = keys["data_hash"].to_numpy()[~known]
+            if label is not None:
+                new["label"] = np.asarray(label(new), dtype=np.int64)
+            self.append(new)
+        print(f"🗃️ Features: {int(known.sum())} patterns from the store, {len(new)} extracted")
+        if not known.any():
+            return new
+        combined = pd.concat([stored, new], ignore_index=True) if not new.empty else stored
+        return keys.merge(combined, on=KEY_COLUMNS, how="left")[combined.columns]
+
+    def _trained_path(self):
+        return os.path.join(self.folder, TRAINED_NAME)
+
+    def trained_part(self, model_path):
+        """Last part the model at model_path was trained on (0 if none or the model is gone)."""
+        if not os.path.exists(model_path) or not os.path.exists(self._trained_path()):
+            return 0
+        with open(self._trained_path()) as f:
+            return json.load(f).get(os.path.abspath(model_path), 0)
+
+    def mark_trained(self, model_path, part):
+        trained = {}
+        if os.path.exists(self._trained_path()):
+            with open(self._trained_path()) as f:
+                trained = json.load(f)
+        trained[os.path.abspath(model_path)] = part
+        os.makedirs(self.folder, exist_ok=True)
+        with open(self._trained_path() + ".tmp", "w") as f:
+            json.dump(trained, f, indent=2)
+        os.replace(self._trained_path() + ".tmp", self._trained_path())
+
+
+def default_feature_store():
+    """The store at FEATURE_PATH for MARKET_SYMBOL, seeded from SEED_FEATURE_PATH when empty."""
+    store = FeatureStore(config.FEATURE_PATH, config.MARKET_SYMBOL or "default")
+    store.seed(config.SEED_FEATURE_PATH)
+    return store
@@ -0,0 +1,96 @@
+from collections import namedtuple
+from enum import IntEnum
+
+import numpy as np
+import pandas as pd
+
+import config
+from utils import RangeExtremaIndex
+
+UNLABELED = -1
+
+
+class Unlabeled(IntEnum):
+    LABELED = 0
+    MISSING_FEATURE = 1
+    OUT_OF_RANGE = 2
+    EMPTY_CUP = 3
+
+
+# A pattern is labeled 1 when all of these hold (else 0):
+#   min_r2                 r2 >= min_r2
+#   min_breakout_strength  breakout_strength_pct > min_breakout_strength
+#   max_handle_retrace     handle_retrace_ratio < max_handle_retrace
+#   min_volume_slope       volume_slope >= min_volume_slope
+#   breakout_volume_ratio  breakout_volume > ratio * mean cup volume (cup plus the first handle candle)
+LabelRules = namedtuple("LabelRules", [
+    "min_r2", "min_breakout_strength", "max_handle_retrace", "min_volume_slope", "breakout_volume_ratio",
+], defaults=[0.90, 0.015, 0.35, 0.0, 1.25])
+
+LABEL_FEATURES = ["r2", "breakout_strength_pct", "handle_retrace_ratio", "volume_slope", "breakout_volume",
+                  "cup_start", "cup_duration"]
+
+# labels   0 / 1 per feature row, UNLABELED (-1) where it could not be labeled
+# reasons  Unlabeled code per row (LABELED for labeled rows)
+LabelResult = namedtuple("LabelResult", ["labels", "reasons"])
+
+
+def label_rules():
+    """LabelRules with the AUTO_LABEL overrides of the config."""
+    return LabelRules(**config.AUTO_LABEL_RULES)
+
+
+def unlabeled_counts(result):
+    """Rows per reason they could not be labeled, without the labeled ones."""
+    counts = np.bincount(result.reasons, minlength=len(Unlabeled))
+    return {reason.name.lower(): int(counts[reason]) for reason in Unlabeled if reason and counts[reason]}
+
+
+def label_patterns(features, df, rules=None) -> LabelResult:
+    """
+    Auto labels of all feature rows at once: the mean cup volume comes from
+    the prefix sums of the frame's RangeExtremaIndex. Rows with a missing
+    feature or a cup outside df are not labeled (UNLABELED) rather than
+    counted as negatives.
+    """
+    rules = rules or label_rules()
+    size = len(features)
+    reasons = np.full(size, Unlabeled.LABELED, dtype=np.int64)
+    columns = {}
+    for name in LABEL_FEATURES:
+        values = pd.to_numeric(features[name], errors="coerce") if name in features else pd.Series(np.nan, index=features.index)
+        columns[name] = values.to_numpy(dtype=np.float64)
+        reasons[np.isnan(columns[name]) & (reasons == Unlabeled.LABELED)] = Unlabeled.MISSING_FEATURE
+
+    usable = reasons == Unlabeled.LABELED
+    cup_lo = np.where(usable, columns["cup_start"], 0).astype(np.int64)
+    # the cup plus the first handle candle, like the r2 feature
+    cup_hi = np.minimum(cup_lo + np.where(usable, columns["cup_duration"], 0).astype(np.int64) + 1, len(df))
+    reasons[usable & ((cup_lo < 0) | (cup_lo >= len(df)))] = Unlabeled.OUT_OF_RANGE
+    usable = reasons == Unlabeled.LABELED
+    reasons[usable & (cup_hi <= cup_lo)] = Unlabeled.EMPTY_CUP
+    usable = reasons == Unlabeled.LABELED
+
+    avg_cup_vol = np.ones(size)
+    if usable.any():
+        means = RangeExtremaIndex.for_frame(df).mean("volume", cup_lo[usable], cup_hi[usable])
+        avg_cup_vol[usable] = np.where(means == 0, 1.0, means)
+
+    positive = (
+        (columns["r2"] >= rules.min_r2) &
+        (columns["breakout_strength_pct"] > rules.min_breakout_strength) &
+        (columns["handle_retrace_ratio"] < rules.max_handle_retrace) &
+        (columns["volume_slope"] >= rules.min_volume_slope) &
+        (columns["breakout_volume"] > rules.breakout_volume_ratio * avg_cup_vol)
+    )
+    labels = np.where(usable, positive.astype(np.int64), UNLABELED)
+    return LabelResult(labels=labels, reasons=reasons)
+
+
+def auto_label(features, df, rules=None):
+    """label_patterns(features, df).labels, saying how many rows were left unlabeled and why."""
+    result = label_patterns(features, df, rules)
+    unlabeled = unlabeled_counts(result)
+    if unlabeled:
+        print(f"⚠️ {sum(unlabeled.values())} of {len(features)} patterns could not be labeled: {unlabeled}")
+    return result.labels
@@ -0,0 +1,100 @@
+import hashlib
+import os
+
+import numpy as np
+
+
+def scorer_path(model_path):
+    """The scorer exported for the bundle at model_path: same name, .npz."""
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+def bundle_fingerprint(model_path):
+    """Hash of the bundle file's bytes: the export records it, so it is matched to its bundle, not to mtimes."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(model_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LinearScorer:
+    """
+    The StandardScaler + logistic SGDClassifier of a model bundle as plain
+    arrays, so scoring needs NumPy only: no scikit-learn import and no
+    estimator unpickling. predict_proba() reproduces the bundle's
+    model.predict_proba(scaler.transform(X))[:, 1]: the decision values are
+    identical and the probabilities too, but for a few ulps where NumPy's
+    exp rounds differently from the C library's.
+
+    source is the bundle_fingerprint() of the bundle file it was exported
+    from ("" if unknown).
+    """
+
+    def __init__(self, mean, scale, coef, intercept, feature_cols, version=0, source=""):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.feature_cols = list(feature_cols)
+        self.version = int(version)
+        self.source = str(source)
+
+    @classmethod
+    def from_bundle(cls, bundle, source=""):
+        """The scorer of a ModelBundle (its fitted estimators' attributes; sklearn itself is not imported)."""
+        scaler, model = bundle.scaler, bundle.model
+        if getattr(model, "loss", None) != "log_loss" or model.coef_.shape[0] != 1:
+            raise ValueError("Only a binary SGDClassifier with loss='log_loss' can be exported")
+        size = model.coef_.shape[1]
+        # without_mean / without_std scalers keep mean_ / scale_ as None
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(size)
+        scale = scaler.scale_ if scaler.with_std else np.ones(size)
+        return cls(mean, scale, model.coef_[0], model.intercept_[0], bundle.feature_cols, bundle.version, source)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            # exports written before the fingerprint have no source
+            source = str(data["source"][0]) if "source" in data.files else ""
+            return cls(data["mean"], data["scale"], data["coef"], data["intercept"][0],
+                       data["feature_cols"].tolist(), data["version"][0], source)
+
+    def save(self, path):
+        """Write the arrays to path (.npz) through a temporary file, like the model bundle."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, mean=self.mean, scale=self.scale, coef=self.coef,
+                         intercept=np.array([self.intercept]), feature_cols=np.array(self.feature_cols),
+                         version=np.array([self.version]), source=np.array([self.source]))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return path
+
+    def decision_function(self, features):
+        # features: DataFrame with the feature columns, or an array in feature_cols order
+        if hasattr(features, "columns"):
+            features = features[self.feature_cols]
+        X = (np.asarray(features, dtype=np.float64) - self.mean) / self.scale
+        return X @ self.coef + self.intercept
+
+    def predict_proba(self, features):
+        """Probability of a valid pattern per feature row."""
+        decision = self.decision_function(features)
+        # scipy.special.expit's formula (what sklearn applies); exp(-x) overflowing to inf gives 0
+        with np.errstate(over="ignore"):
+            return 1.0 / (1.0 + np.exp(-decision))
+
+
+def export_scorer(model_path=None):
+    """Export the bundle at model_path (MODEL_PATH by default) as its NumPy scorer; returns the .npz path."""
+    from .model_registry import model_registry
+    registry = model_registry(model_path)
+    scorer = LinearScorer.from_bundle(registry.load(), bundle_fingerprint(registry.path))
+    return scorer.save(scorer_path(registry.path))
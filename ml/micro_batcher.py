@@ -0,0 +1,109 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class LatencyStats:
+    """Requests, rows and batches scored since start, with p50 / p99 latency over the last `window` requests."""
+
+    def __init__(self, window=10000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.requests = self.rows = self.batches = 0
+
+    def record(self, latencies, rows):
+        with self._lock:
+            self._latencies.extend(latencies)
+            self.requests += len(latencies)
+            self.rows += rows
+            self.batches += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1e3
+            requests, rows, batches = self.requests, self.rows, self.batches
+        elapsed = time.perf_counter() - self.started
+        # None until the first request (NaN is not valid JSON)
+        p50, p99 = np.percentile(latencies, [50, 99]).tolist() if len(latencies) else (None, None)
+        return {
+            "requests": requests, "rows": rows, "batches": batches,
+            "rows_per_batch": rows / batches if batches else 0.0,
+            "requests_per_s": requests / elapsed, "rows_per_s": rows / elapsed,
+            "p50_ms": p50, "p99_ms": p99,
+        }
+
+
+class MicroBatcher:
+    """
+    Coalesces the feature rows many producer threads submit into one
+    score(rows) call per micro-batch.
+
+    A batch is scored as soon as it holds max_batch rows or its oldest
+    request has waited max_delay seconds, whichever comes first, so a
+    lone request is delayed by at most max_delay while concurrent ones
+    share a single vectorized call. submit() returns a Future of the
+    request's probabilities, in row order.
+    """
+
+    def __init__(self, score, max_batch=512, max_delay=0.005, stats=None):
+        self.score = score
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.stats = stats or LatencyStats()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        """Queue a 2-D array of feature rows; returns a Future of their probabilities."""
+        rows = np.asarray(rows, dtype=np.float64)
+        future = Future()
+        if not len(rows):
+            future.set_result(np.zeros(0))
+            return future
+        self._queue.put((rows, future, time.perf_counter()))
+        return future
+
+    def close(self):
+        """Score what is queued, then stop the worker."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _next_batch(self, first):
+        batch, size = [first], len(first[0])
+        deadline = first[2] + self.max_delay
+        while size < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                # close() after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch, size
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, size = self._next_batch(first)
+            try:
+                probabilities = np.asarray(self.score(np.concatenate([rows for rows, _, _ in batch])))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            done = time.perf_counter()
+            splits = np.cumsum([len(rows) for rows, _, _ in batch])[:-1]
+            for (_, future, _), result in zip(batch, np.split(probabilities, splits)):
+                future.set_result(result)
+            self.stats.record([done - submitted for _, _, submitted in batch], size)
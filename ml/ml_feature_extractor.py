@@ -1,63 +1,106 @@
 import pandas as pd
 import numpy as np
-from scipy.stats import linregress
-from utils import fit_parabola
+from utils import RangeExtremaIndex, RollingParabolaFit, RollingLinearTrend, pattern_positions
+
+# candles after the breakout the breakout strength looks at (breakout included)
+POST_BREAKOUT = 31
+
+FEATURE_COLUMNS = [
+    "r2", "cup_depth", "cup_duration", "handle_duration",
+    "handle_retrace_ratio", "breakout_strength_pct",
+    "volume_slope", "breakout_volume"
+]
+
+
+def batch_features(df, cup_starts, breakouts, cup_durations, handle_durations, cup_depths, handle_highs,
+                   handle_lows):
+    """
+    The model features of many patterns at once, from their row positions
+    and detector measurements as arrays; one row per pattern, in order.
+
+    r2 and the volume slope are fitted over the cup plus the first handle
+    candle with the rolling parabola fit and linear trend, and the
+    post-breakout high comes from the frame's RangeExtremaIndex, so
+    nothing is sliced or fitted per pattern.
+    """
+    closes = df["close"].to_numpy(dtype=np.float64)
+    volumes = df["volume"].to_numpy(dtype=np.float64)
+    size = len(closes)
+    cup_starts = np.asarray(cup_starts, dtype=np.int64)
+    breakouts = np.asarray(breakouts, dtype=np.int64)
+    cup_durations = np.asarray(cup_durations)
+    cup_depths = np.asarray(cup_depths, dtype=np.float64)
+
+    # the cup plus the first handle candle, as the model was trained on
+    fit_lengths = np.minimum(cup_starts + cup_durations.astype(np.int64) + 1, size) - cup_starts
+    r2 = np.full(len(cup_starts), np.nan)
+    if len(cup_starts):
+        fitter = RollingParabolaFit(closes, max_window=int(fit_lengths.max()))
+        r2 = fitter.fit(cup_starts, fit_lengths).r2
+
+    handle_depths = np.asarray(handle_highs, dtype=np.float64) - np.asarray(handle_lows, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        handle_retrace_ratio = np.where(cup_depths != 0, handle_depths / cup_depths, 0.0)
+
+    breakout_prices = closes[breakouts]
+    post_hi = np.minimum(breakouts + POST_BREAKOUT, size)
+    max_post_breakout = RangeExtremaIndex.for_frame(df).max("high", breakouts, post_hi)
+    breakout_strength_pct = (max_post_breakout - breakout_prices) / breakout_prices
+
+    # over the same window as r2, not the detector's cup-only volume_slope
+    fitted = fit_lengths >= 2
+    volume_slope = np.zeros(len(cup_starts))
+    if fitted.any():
+        trend = RollingLinearTrend(volumes, max_window=int(fit_lengths[fitted].max()))
+        volume_slope[fitted] = trend.slope(cup_starts[fitted], fit_lengths[fitted])
+
+    features = pd.DataFrame({
+        "r2": r2,
+        "cup_depth": cup_depths,
+        "cup_duration": cup_durations,
+        "handle_duration": np.asarray(handle_durations),
+        "handle_retrace_ratio": handle_retrace_ratio,
+        "breakout_strength_pct": breakout_strength_pct,
+        "volume_slope": volume_slope,
+        "breakout_volume": volumes[breakouts],
+        "cup_start": cup_starts,
+        "breakout": breakouts,
+    })
+    features.insert(0, "start_time", df.index[cup_starts])
+    return features
+
+
+def locate_patterns(patterns, df):
+    """The valid patterns with their (cup_start, breakout) row positions, without those outside df."""
+    # PatternResults only needs its valid patterns
+    patterns = getattr(patterns, "valid_patterns", patterns)
+    patterns = [p for p in patterns if p.get("valid")]
+    if not patterns:
+        return [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # rows are addressed by position, timestamps are looked up once at the end
+    cup_starts, breakouts = pattern_positions(patterns, df.index)
+    inside = (cup_starts >= 0) & (breakouts < len(df))
+    if not inside.all():
+        print(f"⚠️ Feature extraction skipped {int((~inside).sum())} patterns outside the data")
+        patterns = [p for p, keep in zip(patterns, inside) if keep]
+        cup_starts, breakouts = cup_starts[inside], breakouts[inside]
+    return patterns, cup_starts, breakouts
+
+
+def located_features(patterns, cup_starts, breakouts, df):
+    """batch_features of pattern records whose positions are already known (see locate_patterns)."""
+    if not patterns:
+        return pd.DataFrame()
+    frame = pd.DataFrame(patterns)
+    return batch_features(
+        df, cup_starts, breakouts,
+        cup_durations=frame["cup_duration"].to_numpy(),
+        handle_durations=frame["handle_duration"].to_numpy(),
+        cup_depths=frame["cup_depth"].to_numpy(),
+        handle_highs=frame["handle_high"].to_numpy(),
+        handle_lows=frame["handle_low"].to_numpy(),
+    )
+
 
 def extract_features(patterns, df):
-    feature_rows = []
-
-    for p in patterns:
-        if not p.get("valid"):
-            continue 
-
-        try:
-            cup_start = pd.to_datetime(p["start_time"])
-            cup_end = cup_start + pd.Timedelta(minutes=p["cup_duration"])
-            handle_start = cup_end
-            handle_end = handle_start + pd.Timedelta(minutes=p["handle_duration"])
-            breakout_time = pd.to_datetime(p["breakout_time"])
-
-            cup_df = df.loc[cup_start:cup_end]
-            handle_df = df.loc[handle_start:handle_end]
-            cup_prices = cup_df["close"]
-            x = np.arange(len(cup_prices))
-            _, r2, _ = fit_parabola(x, cup_prices)
-
-            handle_depth = p["handle_high"] - p["handle_low"]
-            handle_retrace_ratio = handle_depth / p["cup_depth"] if p["cup_depth"] != 0 else 0
-
-            breakout_price = df.loc[breakout_time]["close"]
-            post_breakout_window = df.loc[breakout_time : breakout_time + pd.Timedelta(minutes=30)]
-            if not post_breakout_window.empty:
-                max_post_breakout = post_breakout_window["high"].max()
-                breakout_strength_pct = (max_post_breakout - breakout_price) / breakout_price
-            else:
-                breakout_strength_pct = 0.0
-
-            vol_series = cup_df["volume"]
-            if len(vol_series) >= 2:
-                x = np.arange(len(vol_series))
-                slope, _, _, _, _ = linregress(x, vol_series)
-                volume_slope = slope
-            else:
-                volume_slope = 0.0
-
-            breakout_volume = df.loc[breakout_time]["volume"]
-
-            feature_rows.append({
-                "start_time": cup_start,
-                "r2": r2,
-                "cup_depth": p["cup_depth"],
-                "cup_duration": p["cup_duration"],
-                "handle_duration": p["handle_duration"],
-                "handle_retrace_ratio": handle_retrace_ratio,
-                "breakout_strength_pct": breakout_strength_pct,
-                "volume_slope": volume_slope,
-                "breakout_volume": breakout_volume
-            })
-
-        except Exception as e:
-            print(f"⚠️ Feature extraction failed for pattern starting at {p['start_time']}: {e}")
-            continue
-
-    return pd.DataFrame(feature_rows)
+    return located_features(*locate_patterns(patterns, df), df)
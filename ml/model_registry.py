@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import joblib
+
+import config
+from .ml_feature_extractor import FEATURE_COLUMNS
+from .linear_scorer import LinearScorer, bundle_fingerprint, scorer_path
+
+# model         fitted SGDClassifier
+# scaler        fitted StandardScaler, applied before the model
+# feature_cols  feature columns in the order the model was trained on
+# version       1 for the first saved model, +1 with every save after it
+# metadata      training information: trained_at (UTC, ISO 8601) plus what the trainer passed
+ModelBundle = namedtuple("ModelBundle", ["model", "scaler", "feature_cols", "version", "metadata"],
+                         defaults=[FEATURE_COLUMNS, 0, {}])
+
+
+def _file_stamp(path):
+    # a replaced file has a new inode, an overwritten one a new mtime or size
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class ModelRegistry:
+    """
+    The model bundle at one path, loaded once per process.
+
+    get() unpickles the bundle on first use and again only when the file
+    has been replaced since (another process retrained the model), so
+    scoring calls cost one stat() instead of a joblib.load. save() writes
+    a temporary file next to the bundle and renames it over the old one,
+    so readers see either the previous or the new bundle, never a partial
+    pickle. Bundles are dicts on disk (model, scaler, feature_cols,
+    version, metadata); older {"model", "scaler"} files still load.
+
+    Every save also exports the bundle's LinearScorer next to it (.npz),
+    recording the fingerprint of the bundle file it came from;
+    predict_proba() scores with that, so scoring processes never import
+    scikit-learn unless the export is missing or was made from another
+    bundle. File times are not compared: a checkout writes them in any
+    order.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.scorer_path = scorer_path(path)
+        self._lock = threading.Lock()
+        # key (the path by default) -> (file stamp, loaded value)
+        self._cache = {}
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """A fresh copy of the bundle on disk, e.g. to train further without touching the cached one."""
+        return ModelBundle(**joblib.load(self.path))
+
+    def _cached(self, path, load, key=None):
+        key = key or path
+        stamp = _file_stamp(path)
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != stamp:
+            with self._lock:
+                stamp = _file_stamp(path)
+                cached = self._cache.get(key)
+                if cached is None or cached[0] != stamp:
+                    cached = self._cache[key] = (stamp, load(path))
+        return cached[1]
+
+    def get(self):
+        """The cached bundle, reloaded if the file changed since it was read."""
+        if not self.exists():
+            raise FileNotFoundError(f"Trained model not found at {self.path}")
+        return self._cached(self.path, lambda path: self.load())
+
+    def scorer(self):
+        """The cached LinearScorer exported from the bundle on disk, or None if there is no such export."""
+        if not os.path.exists(self.scorer_path) or not self.exists():
+            return None
+        scorer = self._cached(self.scorer_path, LinearScorer.load)
+        # hashed once per bundle file, like the bundle is loaded once
+        fingerprint = self._cached(self.path, bundle_fingerprint, key=(self.path, "fingerprint"))
+        return scorer if scorer.source == fingerprint else None
+
+    def version(self):
+        """Version of the bundle on disk, 0 if there is none."""
+        return self.get().version if self.exists() else 0
+
+    def save(self, model, scaler, feature_cols=FEATURE_COLUMNS, **metadata):
+        """Write model and scaler as the next version, atomically; returns the saved bundle."""
+        metadata["trained_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        bundle = ModelBundle(model, scaler, list(feature_cols), self.version() + 1, metadata)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                joblib.dump(bundle._asdict(), f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        LinearScorer.from_bundle(bundle, bundle_fingerprint(self.path)).save(self.scorer_path)
+        with self._lock:
+            self._cache[self.path] = (_file_stamp(self.path), bundle)
+        return bundle
+
+    def predict_proba(self, features):
+        """Probability of a valid pattern per feature row, with the current bundle."""
+        if not self.exists():
+            raise FileNotFoundError(f"Trained model not found at {self.path}")
+        scorer = self.scorer()
+        if scorer is not None:
+            return scorer.predict_proba(features)
+        bundle = self.get()
+        X = bundle.scaler.transform(features[bundle.feature_cols])
+        return bundle.model.predict_proba(X)[:, 1]
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def model_registry(path=None):
+    """The process-wide registry of the bundle at path (MODEL_PATH by default)."""
+    path = os.path.abspath(path or config.MODEL_PATH)
+    with _registries_lock:
+        if path not in _registries:
+            _registries[path] = ModelRegistry(path)
+        return _registries[path]
@@ -1,65 +1,85 @@
-import os
 import pandas as pd
 import numpy as np
-import joblib
 
 from sklearn.linear_model import SGDClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, accuracy_score, roc_auc_score
 from sklearn.model_selection import train_test_split
 
-from config import MODEL_PATH, FEATURE_PATH
+import config
+from .feature_store import default_feature_store
+from .model_registry import model_registry
+from .ml_feature_extractor import FEATURE_COLUMNS
 
-def train_incremental():
-    print("📂 Loading labeled feature data...")
-    df = pd.read_csv(FEATURE_PATH, parse_dates=["start_time"])
-    df = df.dropna(subset=["label"])
-    df = df[df["label"].isin([0, 1])]
 
-    if df.empty:
-        print("❌ No labeled data found. Exiting.")
-        return
+def _labeled_splits(store, after):
+    """(X_train, X_test, y_train, y_test) per stored chunk with a 0/1 label, the same split on every pass."""
+    for chunk in store.iter_chunks(columns=FEATURE_COLUMNS + ["label"], after=after):
+        chunk = chunk.dropna(subset=["label"])
+        chunk = chunk[chunk["label"].isin([0, 1])]
+        if len(chunk) < 2:
+            continue
+        y = chunk["label"].astype(np.int64)
+        stratify = y if y.value_counts().min() >= 2 else None
+        yield train_test_split(chunk[FEATURE_COLUMNS], y, test_size=0.25, stratify=stratify, random_state=42)
+
 
-    feature_cols = [
-        "r2", "cup_depth", "cup_duration", "handle_duration",
-        "handle_retrace_ratio", "breakout_strength_pct",
-        "volume_slope", "breakout_volume"
-    ]
-    X = df[feature_cols]
-    y = df["label"]
+def train_incremental(store=None):
+    """
+    Train the model on the labeled features it has not seen yet, streaming
+    the feature store chunk by chunk; the store remembers the last part the
+    model at MODEL_PATH was trained on.
+    """
+    store = store or default_feature_store()
+    model_path = config.MODEL_PATH
+    registry = model_registry(model_path)
+    after = store.trained_part(model_path)
+    last = store.last_part()
+    if last <= after:
+        print("✅ No new labeled features since the last training.")
+        return
+    print(f"📂 Streaming labeled features (parts {after + 1}..{last})...")
 
-    # Train split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.25, stratify=y, random_state=42
-    )
+    train_counts, test_counts = {}, {}
+    for _, _, y_train, y_test in _labeled_splits(store, after):
+        for counts, y in ((train_counts, y_train), (test_counts, y_test)):
+            for label, n in y.value_counts().items():
+                counts[label] = counts.get(label, 0) + int(n)
+    if not train_counts:
+        print("❌ No labeled data found. Exiting.")
+        return
 
     print("🔎 Class balance:")
-    print(f"🧪 Train: {y_train.value_counts().to_dict()}")
-    print(f"🧪 Test : {y_test.value_counts().to_dict()}")
+    print(f"🧪 Train: {train_counts}")
+    print(f"🧪 Test : {test_counts}")
 
     # Load or initialize model and scaler
-    if os.path.exists(MODEL_PATH):
+    if registry.exists():
         print("📦 Loading existing model...")
-        bundle = joblib.load(MODEL_PATH)
-        model = bundle["model"]
-        scaler = bundle["scaler"]
+        bundle = registry.load()
+        model, scaler = bundle.model, bundle.scaler
     else:
         print("🆕 Creating new incremental model...")
         model = SGDClassifier(loss="log_loss", max_iter=1000, tol=1e-3)
         scaler = StandardScaler()
-        scaler.fit(X_train)
-        X_train = scaler.transform(X_train)
-        model.partial_fit(X_train, y_train, classes=np.array([0, 1]))
-        joblib.dump({"model": model, "scaler": scaler}, MODEL_PATH)
-        print(f"✅ Model initialized and saved to {MODEL_PATH}")
+        for X_train, _, _, _ in _labeled_splits(store, after):
+            scaler.partial_fit(X_train)
+        for X_train, _, y_train, _ in _labeled_splits(store, after):
+            model.partial_fit(scaler.transform(X_train), y_train, classes=np.array([0, 1]))
+        saved = registry.save(model, scaler, rows=sum(train_counts.values()), parts=[after + 1, last])
+        store.mark_trained(model_path, last)
+        print(f"✅ Model v{saved.version} initialized and saved to {model_path}")
         return
 
-    # Continue training
-    X_train = scaler.transform(X_train)
-    model.partial_fit(X_train, y_train)
+    # Continue training, holding out each chunk's test split
+    tests = []
+    for X_train, X_test, y_train, y_test in _labeled_splits(store, after):
+        model.partial_fit(scaler.transform(X_train), y_train)
+        tests.append((X_test, y_test))
 
     # Evaluate
-    X_test = scaler.transform(X_test)
+    X_test = scaler.transform(pd.concat([X for X, _ in tests]))
+    y_test = pd.concat([y for _, y in tests])
     y_pred = model.predict(X_test)
     y_proba = model.predict_proba(X_test)[:, 1]
 
@@ -71,9 +91,9 @@ def train_incremental():
     else:
         print("⚠️ ROC-AUC cannot be computed — only one class in y_test.")
 
-    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
-    joblib.dump({"model": model, "scaler": scaler}, MODEL_PATH)
-    print(f"\n💾 Updated incremental model saved to: {MODEL_PATH}")
+    saved = registry.save(model, scaler, rows=sum(train_counts.values()), parts=[after + 1, last])
+    store.mark_trained(model_path, last)
+    print(f"\n💾 Updated incremental model v{saved.version} saved to: {model_path}")
 
 if __name__ == "__main__":
     train_incremental()
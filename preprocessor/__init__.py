@@ -0,0 +1,6 @@
+from .market_store import (
+    load_market_data, write_market_data, append_market_data, market_days, market_symbols, MARKET_SCHEMA, OHLCV
+)
+from .memory_budget import MemoryBudgetExceeded, load_frame, estimate_candles
+from .data_merger import merge_binance_csv, read_kline_csv, find_gaps
+from .market_data_downloader import download_binance_1m_klines
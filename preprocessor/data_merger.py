@@ -1,38 +1,199 @@
 import os
 import glob
+import json
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-def merge_binance_csv(input_folder, output_file):
-    columns = [
-        'timestamp', 'open', 'high', 'low', 'close', 'volume',
-        'close_time', 'quote_volume', 'trades',
-        'taker_buy_volume', 'taker_buy_quote_volume', 'ignore'
-    ]
+from .market_store import MARKET_SCHEMA, append_market_data, is_partitioned, market_table
 
-    all_files = sorted(glob.glob(os.path.join(input_folder, "*.csv")))
-    data_frames = []
+KLINE_COLUMNS = [
+    'timestamp', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_volume', 'trades',
+    'taker_buy_volume', 'taker_buy_quote_volume', 'ignore'
+]
+CANDLE = pd.Timedelta(minutes=1)
 
-    for file in all_files:
-        try:
-            with open(file, 'r') as f:
-                first_line = f.readline()
-            if 'open_time' in first_line.lower():
-                df = pd.read_csv(file)
+
+def _has_header(file):
+    with open(file, 'r') as f:
+        return 'open_time' in f.readline().lower()
+
+
+def read_kline_csv(file, nrows=None):
+    """One downloaded kline CSV (with or without Binance's header row), sorted by timestamp."""
+    df = pd.read_csv(file, header=0 if _has_header(file) else None, nrows=nrows)
+    df.columns = KLINE_COLUMNS
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df.sort_values('timestamp', kind='stable')
+
+
+def first_kline_timestamp(file):
+    """Earliest candle of a kline CSV, from its timestamp column only (the rows need not be sorted)."""
+    stamps = pd.read_csv(file, header=0 if _has_header(file) else None, usecols=[0]).iloc[:, 0]
+    return pd.to_datetime(stamps.min(), unit='ms')
+
+
+def find_gaps(timestamps, previous=None):
+    """Runs of missing minutes in sorted, unique timestamps (after `previous`, the last merged candle)."""
+    times = pd.DatetimeIndex(timestamps)
+    if previous is not None:
+        times = pd.DatetimeIndex([previous]).append(times)
+    steps = times[1:] - times[:-1]
+    at = (steps > CANDLE).nonzero()[0]
+    return pd.DataFrame({
+        "gap_start": times[at] + CANDLE,
+        "gap_end": times[at + 1] - CANDLE,
+        "missing_minutes": (steps[at] // CANDLE - 1).astype("int64"),
+    })
+
+
+class _FileSink:
+    """Streams merged chunks into one .parquet / .arrow / .csv file, renamed into place on close (dropped on abort)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp = path + ".tmp"
+        self.writer = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def write(self, frame):
+        table = market_table(frame)
+        if self.path.endswith(".csv"):
+            table.to_pandas().to_csv(self.tmp, mode="a" if self.writer else "w", header=not self.writer, index=False)
+            self.writer = True
+            return
+        if self.writer is None:
+            if self.path.endswith(".arrow"):
+                self.writer = pa.ipc.new_file(self.tmp, MARKET_SCHEMA)
             else:
-                df = pd.read_csv(file, header=None)
-                df.columns = columns
+                self.writer = pq.ParquetWriter(self.tmp, MARKET_SCHEMA, compression="zstd")
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            return
+        if self.writer is not True:
+            self.writer.close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        # a failed merge must not replace the previous output with a partial file
+        if self.writer not in (None, True):
+            self.writer.close()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
 
-            df.columns = columns
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            data_frames.append(df)
+class _PartitionSink:
+    def __init__(self, root, symbol):
+        self.root, self.symbol = root, symbol
+
+    def write(self, frame):
+        append_market_data(frame, self.root, self.symbol)
+
+    def close(self):
+        pass
+
+    def abort(self):
+        # days written so far were merged into their files; the manifest is not
+        # updated, so the next incremental merge reads the same files again
+        pass
+
+
+def _merge_paths(output_file, symbol):
+    """Manifest and gap report locations: inside the symbol's folder of a store, else next to the file."""
+    if is_partitioned(output_file):
+        base = os.path.join(output_file, symbol)
+        return os.path.join(base, "_manifest.json"), os.path.join(base, "_gaps.csv")
+    return output_file + ".manifest.json", output_file + ".gaps.csv"
+
+
+def _file_stamp(file):
+    stat = os.stat(file)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def merge_binance_csv(input_folder, output_file, symbol=None, incremental=False):
+    """
+    Merge the downloaded daily kline CSVs of input_folder into output_file
+    (a .parquet / .arrow / .csv file, or with symbol a partitioned store).
+
+    Files are read one at a time in order of their earliest candle and merged
+    k-way by timestamp: rows before the next file's first day can no longer
+    be overtaken, so they are deduplicated (later files win) and written
+    out, and only the overlap is held back. Memory stays around one file.
+    Missing minutes are returned as a gap report, which is also written
+    next to the output along with a manifest of the merged files.
+    With incremental=True (partitioned stores only) files the manifest
+    already lists unchanged are skipped and new days are appended.
+    """
+    if incremental and not is_partitioned(output_file):
+        raise ValueError("Incremental merges need a partitioned store (an output path without suffix)")
+    if is_partitioned(output_file) and symbol is None:
+        raise ValueError("A partitioned store needs the symbol")
+    manifest_path, gaps_path = _merge_paths(output_file, symbol)
+    manifest = {"files": {}, "last_timestamp": None}
+    if incremental and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    all_files = sorted(glob.glob(os.path.join(input_folder, "*.csv")))
+    firsts = {}
+    for file in all_files:
+        name = os.path.basename(file)
+        if incremental and manifest["files"].get(name) == _file_stamp(file):
+            continue
+        try:
+            firsts[file] = first_kline_timestamp(file)
         except Exception as e:
             print(f"Error processing {file}: {e}")
-
-    if not data_frames:
+    files = sorted(firsts, key=firsts.get)
+    if not files:
         print("No data found.")
-        return
+        return find_gaps([])
+
+    sink = _PartitionSink(output_file, symbol) if is_partitioned(output_file) else _FileSink(output_file)
+    previous = pd.Timestamp(manifest["last_timestamp"]) if manifest["last_timestamp"] else None
+    gaps, pending, merged = [], None, 0
+    try:
+        for k, file in enumerate(files):
+            try:
+                df = read_kline_csv(file)
+            except Exception as e:
+                print(f"Error processing {file}: {e}")
+                continue
+            merged += 1
+            manifest["files"][os.path.basename(file)] = _file_stamp(file)
+            pending = df if pending is None else pd.concat([pending, df], ignore_index=True)
+            pending = pending.sort_values('timestamp', kind='stable').drop_duplicates('timestamp', keep='last')
+
+            # whole days before the next file's first candle are final
+            frontier = firsts[files[k + 1]].normalize() if k + 1 < len(files) else None
+            ready = pending if frontier is None else pending[pending['timestamp'] < frontier]
+            if ready.empty:
+                continue
+            pending = pending.iloc[len(ready):]
+            # candles older than the last merge land in their day files, gaps are only looked for after it
+            newer = ready['timestamp'] if previous is None else ready.loc[ready['timestamp'] > previous, 'timestamp']
+            gaps.append(find_gaps(newer, previous))
+            if len(newer):
+                previous = newer.iloc[-1]
+            sink.write(ready)
+    except BaseException:
+        sink.abort()
+        raise
+    sink.close()
 
-    merged_df = pd.concat(data_frames, ignore_index=True)
-    merged_df.to_csv(output_file, index=False)
-    print(f"Merged {len(data_frames)} files into {output_file}")
+    gap_report = pd.concat(gaps, ignore_index=True) if gaps else find_gaps([])
+    manifest["last_timestamp"] = None if previous is None else str(previous)
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    gap_report.to_csv(gaps_path, index=False)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
 
+    print(f"Merged {merged} files into {output_file}")
+    if len(gap_report):
+        print(f"⚠️ {len(gap_report)} gaps, {gap_report['missing_minutes'].sum()} missing minutes: {gaps_path}")
+    return gap_report
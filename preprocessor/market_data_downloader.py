@@ -1,30 +1,106 @@
+import io
+import json
 import os
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from zipfile import ZipFile
-import pandas as pd
 
-def download_binance_1m_klines(symbol, start_date, end_date, save_path):
-    base_url = "https://data.binance.vision/data/futures/um/daily/klines"
-    os.makedirs(save_path, exist_ok=True)
-    date = datetime.strptime(start_date, "%Y-%m-%d")
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BASE_URL = "https://data.binance.vision/data/futures/um/daily/klines"
+MANIFEST_NAME = "_downloads.json"
+
+
+def _session(workers, retries, backoff):
+    # one pooled connection per worker; 429 / 5xx and dropped connections are retried with backoff
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
-    while date <= datetime.strptime(end_date, "%Y-%m-%d"):
-        file_name = f"{symbol}-1m-{date.strftime('%Y-%m-%d')}"
-        url = f"{base_url}/{symbol}/1m/{file_name}.zip"
-        local_zip = os.path.join(save_path, file_name + ".zip")
+def _fetch_day(session, url, save_path, timeout):
+    """Files extracted from the day's zip, or None if the day is not published."""
+    r = session.get(url, timeout=timeout)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    with ZipFile(io.BytesIO(r.content)) as zip_ref:
+        zip_ref.extractall(save_path)
+        return zip_ref.namelist()
 
-        print(f"Downloading {url}")
-        r = requests.get(url)
-        if r.status_code == 200:
-            with open(local_zip, "wb") as f:
-                f.write(r.content)
-            with ZipFile(local_zip, 'r') as zip_ref:
-                zip_ref.extractall(save_path)
-            os.remove(local_zip)
-        else:
-            print(f"File not found for {date.strftime('%Y-%m-%d')}")
 
-        date += timedelta(days=1)
+def _load_manifest(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def _save_manifest(manifest, path):
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def download_binance_1m_klines(symbol, start_date, end_date, save_path, base_url=BASE_URL, workers=8,
+                               retries=3, backoff=0.5, timeout=30):
+    """
+    Download the daily 1m kline zips of symbol from start_date to end_date
+    (inclusive, YYYY-MM-DD) and extract them into save_path.
+
+    Days are fetched by `workers` threads over one pooled session, failed
+    requests are retried with exponential backoff and the zips are unpacked
+    from memory. Every finished day is recorded in save_path/_downloads.json,
+    so an interrupted run resumes where it stopped: days already extracted
+    (and still on disk) are skipped, unpublished or failed days are tried
+    again. Returns the number of days per outcome.
+    """
+    os.makedirs(save_path, exist_ok=True)
+    manifest_path = os.path.join(save_path, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+    first = datetime.strptime(start_date, "%Y-%m-%d")
+    last = datetime.strptime(end_date, "%Y-%m-%d")
+    days = [(first + timedelta(days=k)).strftime("%Y-%m-%d") for k in range((last - first).days + 1)]
+
+    def done(day):
+        entry = manifest.get(f"{symbol}/{day}")
+        return bool(entry) and all(os.path.exists(os.path.join(save_path, name)) for name in entry["files"])
 
+    todo = [day for day in days if not done(day)]
+    outcome = {"downloaded": 0, "skipped": len(days) - len(todo), "missing": 0, "failed": 0}
+    if not todo:
+        return outcome
 
+    session = _session(workers, retries, backoff)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for day in todo:
+                url = f"{base_url}/{symbol}/1m/{symbol}-1m-{day}.zip"
+                futures[pool.submit(_fetch_day, session, url, save_path, timeout)] = (day, url)
+            for future in as_completed(futures):
+                day, url = futures[future]
+                try:
+                    files = future.result()
+                except Exception as e:
+                    print(f"Download failed for {url}: {e}")
+                    outcome["failed"] += 1
+                    continue
+                if files is None:
+                    print(f"File not found for {day}")
+                    outcome["missing"] += 1
+                    continue
+                manifest[f"{symbol}/{day}"] = {"files": files}
+                _save_manifest(manifest, manifest_path)
+                outcome["downloaded"] += 1
+    finally:
+        session.close()
+    print(f"{symbol}: {outcome['downloaded']} days downloaded, {outcome['skipped']} already there, "
+          f"{outcome['missing']} not published, {outcome['failed']} failed")
+    return outcome
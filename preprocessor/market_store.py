@@ -0,0 +1,168 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+OHLCV = ["open", "high", "low", "close", "volume"]
+
+# Column types of the merged 1m klines; prices and volumes stay float64 so
+# the detectors see exactly the values the CSV held. Binance's "ignore"
+# column is dropped.
+MARKET_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("ms")),
+    ("open", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("close", pa.float64()),
+    ("volume", pa.float64()),
+    ("close_time", pa.timestamp("ms")),
+    ("quote_volume", pa.float64()),
+    ("trades", pa.int64()),
+    ("taker_buy_volume", pa.float64()),
+    ("taker_buy_quote_volume", pa.float64()),
+])
+
+
+def market_table(df):
+    """Klines (timestamp column or index) as an Arrow table in MARKET_SCHEMA, sorted by time."""
+    if "timestamp" not in df.columns:
+        df = df.reset_index()
+    df = df.sort_values("timestamp", kind="stable")
+    arrays = []
+    for field in MARKET_SCHEMA:
+        values = df[field.name]
+        if pa.types.is_timestamp(field.type) and not pd.api.types.is_datetime64_any_dtype(values):
+            values = pd.to_datetime(values, unit="ms")
+        arrays.append(pa.array(values.to_numpy(), type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=MARKET_SCHEMA)
+
+
+FILE_SUFFIXES = (".parquet", ".arrow", ".csv")
+
+
+def is_partitioned(path):
+    """A path without a file suffix is a partitioned store: <path>/<symbol>/<YYYY-MM-DD>.parquet."""
+    return not path.endswith(FILE_SUFFIXES)
+
+
+def _day_path(root, symbol, day):
+    return os.path.join(root, symbol, f"{day:%Y-%m-%d}.parquet")
+
+
+def _write_table(table, path):
+    tmp = path + ".tmp"
+    if path.endswith(".arrow"):
+        feather.write_feather(table, tmp, compression="uncompressed")
+    else:
+        pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def market_symbols(root):
+    """Symbols of a partitioned store."""
+    return sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+
+
+def _store_symbol(root, symbol):
+    if symbol is not None:
+        return symbol
+    symbols = market_symbols(root)
+    if len(symbols) != 1:
+        raise ValueError(f"{root} holds symbols {symbols}, pass symbol=")
+    return symbols[0]
+
+
+def market_days(path, symbol=None):
+    """Days (midnight Timestamps, sorted) the data at path covers; a partitioned store only lists its files."""
+    if is_partitioned(path):
+        folder = os.path.join(path, _store_symbol(path, symbol))
+        names = [name[:-len(".parquet")] for name in os.listdir(folder) if name.endswith(".parquet")]
+        return [pd.Timestamp(name) for name in sorted(names)]
+    index = load_market_data(path, columns=[]).index
+    return list(pd.DatetimeIndex(index.normalize().unique()).sort_values())
+
+
+def append_market_data(df, root, symbol):
+    """
+    Write klines into the partitioned store root, one Parquet file per day.
+    Only the days df covers are written; a day that already has a file is
+    merged with it (rows of df win on equal timestamps), every other day
+    stays untouched. Returns the days written.
+    """
+    frame = market_table(df).to_pandas()
+    os.makedirs(os.path.join(root, symbol), exist_ok=True)
+    days = []
+    for day, rows in frame.groupby(frame["timestamp"].dt.normalize(), sort=True):
+        path = _day_path(root, symbol, day)
+        if os.path.exists(path):
+            rows = pd.concat([pq.read_table(path).to_pandas(), rows], ignore_index=True)
+            rows = rows.drop_duplicates("timestamp", keep="last")
+        _write_table(market_table(rows), path)
+        days.append(day)
+    return days
+
+
+def write_market_data(df, path, symbol=None):
+    """
+    Write klines to path: .parquet (zstd compressed), .arrow (uncompressed
+    Arrow IPC, can be memory-mapped), .csv (the old layout) or, for a path
+    without suffix, the day partitions of symbol (see append_market_data).
+    """
+    if is_partitioned(path):
+        if symbol is None:
+            raise ValueError("A partitioned store needs the symbol")
+        return append_market_data(df, path, symbol)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith(".csv"):
+        df = df.reset_index() if "timestamp" not in df.columns else df
+        df.sort_values("timestamp", kind="stable").to_csv(path, index=False)
+        return
+    _write_table(market_table(df), path)
+
+
+def load_market_data(path, columns=None, memory_map=False, start=None, end=None, symbol=None):
+    """
+    1m candles indexed by timestamp, e.g. load_market_data(RAW_DATA_PATH, columns=OHLCV).
+
+    columns projects the read onto the given columns (all by default);
+    memory_map reads .arrow / .parquet files through a memory map instead of
+    copying them into memory first. start / end (end exclusive) select a
+    time range: a partitioned store only opens the files of those days and
+    a single Parquet file only reads the row groups that overlap it.
+    symbol picks the symbol of a partitioned store (optional if it holds
+    one). Old .csv files are still read.
+    """
+    start = None if start is None else pd.Timestamp(start)
+    end = None if end is None else pd.Timestamp(end)
+    wanted = None if columns is None else ["timestamp", *columns]
+    if is_partitioned(path):
+        symbol = _store_symbol(path, symbol)
+        days = [day for day in market_days(path, symbol)
+                if (start is None or day + pd.Timedelta(days=1) > start) and (end is None or day < end)]
+        tables = [pq.read_table(_day_path(path, symbol, day), columns=wanted, memory_map=memory_map) for day in days]
+        if tables:
+            table = pa.concat_tables(tables)
+        else:
+            schema = MARKET_SCHEMA if wanted is None else pa.schema([MARKET_SCHEMA.field(name) for name in wanted])
+            table = schema.empty_table()
+        df = table.to_pandas()
+    elif path.endswith(".csv"):
+        df = pd.read_csv(path, parse_dates=["timestamp"], usecols=wanted)
+    elif path.endswith(".arrow"):
+        df = feather.read_table(path, columns=wanted, memory_map=memory_map).to_pandas()
+    else:
+        filters = []
+        if start is not None:
+            filters.append(("timestamp", ">=", start))
+        if end is not None:
+            filters.append(("timestamp", "<", end))
+        df = pq.read_table(path, columns=wanted, memory_map=memory_map, filters=filters or None).to_pandas()
+    df = df.set_index("timestamp")
+    df.index = df.index.as_unit("ns")
+    if start is not None or end is not None:
+        lo = 0 if start is None else df.index.searchsorted(start, side="left")
+        hi = len(df) if end is None else df.index.searchsorted(end, side="left")
+        df = df.iloc[lo:hi]
+    return df
@@ -0,0 +1,52 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .market_store import OHLCV, is_partitioned, load_market_data, market_days, _day_path, _store_symbol
+
+# bytes per candle of the float64 frame a load reads (and the detectors work on)
+FRAME_CANDLE_BYTES = 8 + 8 * len(OHLCV)
+
+
+class MemoryBudgetExceeded(MemoryError):
+    pass
+
+
+def estimate_candles(path, symbol=None, start=None, end=None):
+    """
+    Number of candles a load of path would hold, from Parquet metadata only
+    (whole days for a partitioned store, the whole file otherwise); None if
+    it cannot be told without reading the data.
+    """
+    if is_partitioned(path):
+        symbol = _store_symbol(path, symbol)
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        days = [day for day in market_days(path, symbol)
+                if (start is None or day + pd.Timedelta(days=1) > start) and (end is None or day < end)]
+        return sum(pq.ParquetFile(_day_path(path, symbol, day)).metadata.num_rows for day in days)
+    if path.endswith(".parquet"):
+        return pq.ParquetFile(path).metadata.num_rows
+    return None
+
+
+def _check_budget(budget_bytes, symbol, nbytes):
+    if budget_bytes is not None and nbytes > budget_bytes:
+        raise MemoryBudgetExceeded(
+            f"{symbol}: {nbytes / 2**20:.1f} MiB exceeds the {budget_bytes / 2**20:.1f} MiB budget")
+
+
+def load_frame(path, symbol=None, start=None, end=None, budget_bytes=None):
+    """
+    The float64 OHLCV frame of one symbol and range, as the detectors,
+    features and plots work on it. Refused before reading if its size,
+    known from the Parquet metadata, cannot fit budget_bytes, and checked
+    again once read (CSV sources have no metadata).
+    """
+    if is_partitioned(path):
+        symbol = _store_symbol(path, symbol)
+    rows = estimate_candles(path, symbol, start, end)
+    if rows is not None:
+        _check_budget(budget_bytes, symbol, rows * FRAME_CANDLE_BYTES)
+    df = load_market_data(path, columns=OHLCV, start=start, end=end, symbol=symbol)
+    _check_budget(budget_bytes, symbol, int(df.memory_usage(index=True).sum()))
+    return df
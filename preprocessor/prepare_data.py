@@ -1,5 +1,6 @@
-from market_data_downloader import download_binance_1m_klines
-from data_merger import merge_binance_csv
+# Run from the repository root: python -m preprocessor.prepare_data
+from preprocessor import download_binance_1m_klines, merge_binance_csv
+from config import KLINES_BASE_URL, DOWNLOAD_WORKERS
 
 if __name__ == "__main__":
     # Step 1: Download Binance data
@@ -7,12 +8,15 @@ if __name__ == "__main__":
         symbol="BTCUSDT",
         start_date="2024-01-01",
         end_date="2025-01-01",  
-        save_path="./data/market-data/raw/downloads/BTCUSDT_1m/"
+        save_path="./data/market-data/raw/downloads/BTCUSDT_1m/",
+        base_url=KLINES_BASE_URL,
+        workers=DOWNLOAD_WORKERS  # days already downloaded are skipped
     )
     
-    # Step 2: Merge downloaded CSV files into a single file
+    # Step 2: Merge downloaded CSV files into the columnar store
     merge_binance_csv(
-    input_folder="./data/BTCUSDT_1m",
-    output_file="./data/market-data/raw/binance_1m.csv"
+    input_folder="./data/market-data/raw/downloads/BTCUSDT_1m/",
+    output_file="./data/market-data/raw/klines",
+    symbol="BTCUSDT",
+    incremental=True  # only files not merged before
     )
-
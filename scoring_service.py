@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+import config
+from ml import FEATURE_COLUMNS, MicroBatcher, model_registry
+
+# seconds a request waits for its micro-batch before the service answers 503
+RESULT_TIMEOUT = 30
+
+
+def missing_features(rows):
+    """FEATURE_COLUMNS some row lacks, in column order."""
+    return [column for column in FEATURE_COLUMNS if any(column not in row for row in rows)]
+
+
+def feature_rows(rows):
+    """
+    JSON feature rows as an array. Each row must carry every one of the
+    FEATURE_COLUMNS (as extract_features() returns them): raw detector
+    pattern records lack the fitted features, e.g. breakout_strength_pct,
+    which need the candles to compute.
+    """
+    return np.array([[float(row[column]) for column in FEATURE_COLUMNS] for row in rows],
+                    dtype=np.float64).reshape(len(rows), len(FEATURE_COLUMNS))
+
+
+def create_scoring_app(registry=None, max_batch=None, max_delay_ms=None):
+    """
+    The scoring service: POST /score {"rows": [...]} answers one
+    {"ml_confidence", "ml_valid"} per feature row, in order; rows
+    lacking any of the FEATURE_COLUMNS are rejected with a 400. Requests of all
+    producers are scored together in micro-batches with the registry's
+    cached model; GET /metrics reports throughput and p50 / p99 latency.
+    """
+    from flask import Flask, jsonify, request
+
+    registry = registry or model_registry()
+    batcher = MicroBatcher(
+        lambda X: registry.predict_proba(pd.DataFrame(X, columns=FEATURE_COLUMNS)),
+        max_batch=max_batch or config.SCORING_MAX_BATCH,
+        max_delay=(config.SCORING_MAX_DELAY_MS if max_delay_ms is None else max_delay_ms) / 1e3,
+    )
+
+    app = Flask(__name__)
+    app.extensions["micro_batcher"] = batcher
+
+    @app.post("/score")
+    def score():
+        payload = request.get_json(silent=True)
+        rows = payload.get("rows") if isinstance(payload, dict) else None
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return jsonify(error='expected {"rows": [{feature: value, ...}, ...]}'), 400
+        missing = missing_features(rows)
+        if missing:
+            return jsonify(error=f"rows must be feature rows, missing {', '.join(missing)}",
+                           missing=missing, features=FEATURE_COLUMNS), 400
+        try:
+            X = feature_rows(rows)
+        except (TypeError, ValueError) as e:
+            return jsonify(error=f"invalid feature value: {e}"), 400
+
+        try:
+            probabilities = batcher.submit(X).result(timeout=RESULT_TIMEOUT)
+        except Exception as e:
+            return jsonify(error=f"scoring failed: {e}"), 503
+        threshold = config.CONFIDENCE_THRESHOLD
+        return jsonify(results=[{"ml_confidence": round(float(p), 4), "ml_valid": bool(p >= threshold)}
+                                for p in probabilities])
+
+    @app.get("/metrics")
+    def metrics():
+        return jsonify(batcher.stats.snapshot())
+
+    @app.get("/health")
+    def health():
+        if not registry.exists():
+            return jsonify(status="no model", model_path=registry.path), 503
+        scorer = registry.scorer()
+        version = scorer.version if scorer is not None else registry.get().version
+        return jsonify(status="ok", model_version=version, numpy_scorer=scorer is not None)
+
+    return app
+
+
+def score_remote(features, url=None, session=None):
+    """Score a DataFrame / list of feature rows with the running service; returns its results."""
+    import requests
+
+    url = url or f"http://{config.SCORING_HOST}:{config.SCORING_PORT}"
+    if hasattr(features, "columns"):
+        features = features[FEATURE_COLUMNS].to_dict("records")
+    response = (session or requests).post(f"{url}/score", json={"rows": features}, timeout=RESULT_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["results"]
+
+
+def run_server():
+    # threaded: each request waits on its micro-batch in its own thread
+    create_scoring_app().run(host=config.SCORING_HOST, port=config.SCORING_PORT, threaded=True)
+
+if __name__ == "__main__":
+    run_server()
@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def make_synthetic_ohlcv(n=1500, cup_starts=(400, 900), seed=3):
+    """
+    Random-walk 1m candles with a planted cup & handle (100 candle cup,
+    50 candle handle, breakout candle with a volume spike) at each cup start.
+    """
+    rng = np.random.default_rng(seed)
+    close = 40000 + np.cumsum(rng.normal(0, 3, n))
+    volume = rng.uniform(50, 150, n)
+
+    for start in cup_starts:
+        cup_len, depth = 100, 200.0
+        rim = close[start]
+        x = np.arange(cup_len)
+        mid = (cup_len - 1) / 2
+        close[start:start + cup_len] = rim - depth + depth * ((x - mid) / mid) ** 2 + rng.normal(0, 2, cup_len)
+        volume[start:start + cup_len] = np.linspace(150, 60, cup_len) + rng.uniform(-5, 5, cup_len)
+
+        handle = start + cup_len
+        close[handle:handle + 50] = rim - 30 + 8 * np.sin(np.arange(50) / 8) + rng.normal(0, 1, 50)
+        breakout = handle + 50
+        close[breakout] = rim + 80
+        volume[breakout] = 1000
+        close[breakout + 1:] = close[breakout] + np.cumsum(rng.normal(0, 3, n - breakout - 1))
+
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) + rng.uniform(0, 3, n)
+    low = np.minimum(open_, close) - rng.uniform(0, 3, n)
+    index = pd.date_range("2024-01-01", periods=n, freq="min", name="timestamp")
+    return pd.DataFrame({"open": open_, "high": high, "low": low, "close": close, "volume": volume}, index=index)
+
+
+@pytest.fixture(scope="session")
+def synthetic_df():
+    return make_synthetic_ohlcv()
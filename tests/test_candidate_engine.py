@@ -0,0 +1,146 @@
+import numpy as np
+from scipy.stats import linregress
+
+from detectors.candidate_engine import CupHandleEngine, Rejection, STRICT_RULES, LOOSE_RULES
+from detectors import detect_cup_handle_patterns, detect_cup_handle_patterns_loose
+from utils import fit_parabola
+
+def failed_rules(engine, i, cup_len):
+    """Scalar version of the cup & handle rules, returns every rule the candidate fails."""
+    rules = engine.rules
+    closes, highs, lows, volumes = engine.closes, engine.highs, engine.lows, engine.volumes
+    cup_start, cup_end = i - cup_len - 50, i - 50
+    cup_closes = closes[cup_start:cup_end]
+    coeffs, r2, y_fit = fit_parabola(np.arange(cup_len), cup_closes)
+    depth = y_fit.max() - y_fit.min()
+    left, right = closes[cup_start], closes[cup_end - 1]
+    left_high, right_high = highs[cup_start], highs[cup_end - 1]
+    slope = linregress(np.arange(cup_len), volumes[cup_start:cup_end]).slope
+    if rules.handle_prices == "close":
+        handle_high, handle_low = closes[cup_end:i].max(), closes[cup_end:i].min()
+    else:
+        handle_high, handle_low = highs[cup_end:i].max(), lows[cup_end:i].min()
+    if rules.retrace == "rim":
+        retrace = (max(left, right) - handle_low) / depth
+    else:
+        retrace = (handle_high - handle_low) / depth
+
+    failed = set()
+    if r2 < 0.85 or coeffs[0] <= 0:
+        failed.add(Rejection.LOW_R2)
+    if depth < 2 * engine.avg_candle_size:
+        failed.add(Rejection.SHALLOW)
+    if abs(left - right) / ((left + right) / 2) > 0.10:
+        failed.add(Rejection.RIM_CLOSE)
+    if rules.rim_highs and abs(left_high - right_high) / ((left_high + right_high) / 2) > 0.10:
+        failed.add(Rejection.RIM_HIGH)
+    if slope > 0:
+        failed.add(Rejection.VOLUME_RISING)
+    if handle_high > (max(left_high, right_high) if rules.rim_highs else max(left, right)):
+        failed.add(Rejection.HANDLE_HIGH)
+    if handle_low < cup_closes.min():
+        failed.add(Rejection.HANDLE_BELOW_CUP)
+    if retrace > 0.4:
+        failed.add(Rejection.RETRACE)
+    if not closes[i] - handle_high > 1.5 * engine.atr[i]:
+        failed.add(Rejection.NO_ATR_BREAKOUT)
+    if volumes[i] < 1.5 * volumes[i - 14:i].mean():
+        failed.add(Rejection.NO_VOLUME_SPIKE)
+    return failed
+
+def test_engine_matches_scalar_rules(synthetic_df):
+    rng = np.random.default_rng(0)
+    for rules in (STRICT_RULES, LOOSE_RULES):
+        engine = CupHandleEngine(synthetic_df, rules, chunk_size=128)
+        blocks = list(engine.iter_blocks())
+        checked = 0
+        for block in blocks:
+            rows, cols = np.nonzero(block.in_range)
+            # every valid candidate plus a random sample of rejected ones
+            picks = np.flatnonzero(block.reason[rows, cols] == Rejection.VALID)
+            picks = np.union1d(picks, rng.choice(len(rows), 40, replace=False))
+            for k in picks:
+                row, col = rows[k], cols[k]
+                failed = failed_rules(engine, int(block.breakouts[row]), int(block.cup_lengths[col]))
+                code = Rejection(block.reason[row, col])
+                if code == Rejection.VALID:
+                    assert not failed
+                else:
+                    assert code in failed
+                checked += 1
+        assert checked > 0
+        print(f"✅ {rules.name}: {checked} candidates agree with the scalar rules.")
+
+def test_detectors_find_planted_patterns(synthetic_df):
+    strict = detect_cup_handle_patterns(synthetic_df, chunk_size=64)
+    loose = detect_cup_handle_patterns_loose(synthetic_df)
+    assert sum(p["valid"] for p in strict) == 2
+    assert sum(p["valid"] for p in loose) == 30
+    # results are independent of how breakout indices are chunked
+    assert [p["start_time"] for p in strict] == [p["start_time"] for p in detect_cup_handle_patterns(synthetic_df)]
+
+def test_cascade_funnel_counts(synthetic_df):
+    engine = CupHandleEngine(synthetic_df, STRICT_RULES, chunk_size=256)
+    blocks = list(engine.iter_blocks())
+    funnel = engine.funnel.to_frame()
+    total = sum(int(block.in_range.sum()) for block in blocks)
+    valid = sum(int((block.reason[block.in_range] == Rejection.VALID).sum()) for block in blocks)
+    # each stage only sees what the previous one let through
+    assert funnel["evaluated"].iloc[0] == total
+    assert (funnel["evaluated"].iloc[1:].to_numpy() == funnel["passed"].iloc[:-1].to_numpy()).all()
+    assert funnel["passed"].iloc[-1] == valid
+    assert funnel["rejected"].sum() == total - valid
+    assert "rim_high" not in CupHandleEngine(synthetic_df, LOOSE_RULES).funnel.stages
+
+def test_sweep_counts_match_single_config_runs(synthetic_df):
+    from detectors import DetectorConfig, sweep_detector_configs, config_grid
+
+    configs = config_grid(DetectorConfig(), min_r2=[0.8, 0.95], max_cup_len=[150, 300], atr_period=[14, 20])
+    table = sweep_detector_configs(synthetic_df, configs, rules=STRICT_RULES)
+    for config, counted in zip(configs, table["valid_patterns"]):
+        engine = CupHandleEngine(synthetic_df, STRICT_RULES, config=config)
+        valid = sum(int((block.reason[block.in_range] == Rejection.VALID).sum()) for block in engine.iter_blocks())
+        assert counted == valid
+    assert table["valid_patterns"].nunique() > 1
+
+def test_sweep_fits_each_cup_once_across_configs(synthetic_df, monkeypatch):
+    from detectors import DetectorConfig, sweep_detector_configs, config_grid
+    from utils import RollingParabolaFit
+
+    fitted = []
+    real_fit = RollingParabolaFit.fit
+    monkeypatch.setattr(RollingParabolaFit, "fit", lambda self, starts, lengths: fitted.append(len(starts)) or
+                        real_fit(self, starts, lengths))
+    sweep_detector_configs(synthetic_df, [DetectorConfig(min_r2=0.8)], rules=STRICT_RULES)
+    single = sum(fitted)
+    fitted.clear()
+    # the fit comes before the thresholds that differ, so every config reaches the same cups
+    configs = config_grid(DetectorConfig(), min_r2=[0.8, 0.9, 0.95], max_retrace=[0.3, 0.5])
+    sweep_detector_configs(synthetic_df, configs, rules=STRICT_RULES)
+    assert single > 0 and sum(fitted) == single
+
+def test_pyramid_keeps_planted_patterns(synthetic_df):
+    from detectors import pyramid_breakouts, pyramid_recall
+
+    breakouts = pyramid_breakouts(synthetic_df, STRICT_RULES, factors=(15, 5))
+    assert 0 < len(breakouts) < len(CupHandleEngine(synthetic_df).breakout_range())
+    assert {550, 1050} <= set(breakouts.tolist())  # the planted breakout candles
+    report = pyramid_recall(synthetic_df, STRICT_RULES, factors=(5,))
+    assert report["recall"] == 1.0
+    print(f"✅ Pyramid recall: {report['recall']:.2f} on {report['breakouts_pyramid']:.0f} breakouts.")
+
+def test_profiles_tag_what_each_rule_set_accepts(synthetic_df):
+    from detectors import detect_with_profiles, rule_profile
+
+    custom = rule_profile("loose", name="loose_hl", handle_prices="high_low")
+    scan = detect_with_profiles(synthetic_df, ("strict", "loose", custom), chunk_size=256)
+    for rules in (STRICT_RULES, LOOSE_RULES, custom):
+        engine = CupHandleEngine(synthetic_df, rules)
+        keys = set()
+        for block in engine.iter_blocks():
+            rows, cols = np.nonzero((block.reason == Rejection.VALID) & block.in_range)
+            keys |= set(zip(block.breakouts[rows].tolist(), block.cup_lengths[cols].tolist()))
+        tagged = scan.matches[scan.matches[rules.name]]
+        assert set(zip(tagged["breakout"], tagged["cup_duration"])) == keys
+        assert scan.counts.loc[rules.name, "valid"] == len(keys)
+    assert scan.matches["accepted_by"].str.contains(",").any()
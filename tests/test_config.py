@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import config
+from config import config_loader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def fresh_config(monkeypatch):
+    monkeypatch.setattr(config_loader, "_overrides", {})
+    monkeypatch.setattr(config_loader, "_config_path", None)
+    monkeypatch.setattr(config_loader, "_settings", None)
+
+def test_config_is_resolved_on_use_with_overrides(fresh_config, monkeypatch, tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({**config.load_config(), "CONFIDENCE_THRESHOLD": 0.7, "DETECTION_PYRAMID": [15]}))
+    monkeypatch.setenv("PATTERN_CONFIG", str(path))
+    monkeypatch.setenv("PATTERN_MIN_VALID_PATTERNS", "12")
+    assert config.CONFIDENCE_THRESHOLD == 0.7 and config.MIN_VALID_PATTERNS == 12
+    assert config.DETECTION_PYRAMID == (15,)
+
+    config.override(**config.parse_overrides(["CONFIDENCE_THRESHOLD=0.9", "MARKET_SYMBOL=ETHUSDT"]))
+    assert config.CONFIDENCE_THRESHOLD == 0.9 and config.MARKET_SYMBOL == "ETHUSDT"
+    with pytest.raises(ValueError):
+        config.parse_overrides(["CONFIDENCE_THRESHOLD"])
+    with pytest.raises(AttributeError):
+        config.NOT_A_SETTING
+
+def test_entry_points_import_without_heavy_packages():
+    probe = ("import sys, main, app; "
+             "print(','.join(m for m in ('plotly', 'kaleido', 'dash', 'talib', 'scipy', 'sklearn') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
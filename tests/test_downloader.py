@@ -0,0 +1,63 @@
+import io
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from zipfile import ZipFile
+
+import pytest
+
+from preprocessor import download_binance_1m_klines
+
+def day_zip(name):
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as zf:
+        zf.writestr(name.replace(".zip", ".csv"), "1704067200000,1,2,0.5,1.5,10,1704067259999,15,3,5,7,0\n")
+    return buffer.getvalue()
+
+@pytest.fixture
+def kline_server():
+    """Local stand-in for data.binance.vision: 2024-01-03 is not published, 2024-01-02 fails once."""
+    hits = Counter()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.path.rsplit("/", 1)[-1]
+            hits[name] += 1
+            if "2024-01-03" in name or not self.path.startswith("/klines/BTCUSDT/1m/"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            if "2024-01-02" in name and hits[name] == 1:
+                self.send_response(503)
+                self.end_headers()
+                return
+            body = day_zip(name)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/klines", hits
+    server.shutdown()
+    server.server_close()
+
+def test_downloader_retries_and_resumes(kline_server, tmp_path):
+    base_url, hits = kline_server
+    kwargs = dict(base_url=base_url, workers=3, backoff=0)
+    outcome = download_binance_1m_klines("BTCUSDT", "2024-01-01", "2024-01-04", str(tmp_path), **kwargs)
+    assert outcome == {"downloaded": 3, "skipped": 0, "missing": 1, "failed": 0}
+    assert hits["BTCUSDT-1m-2024-01-02.zip"] == 2  # retried after the 503
+    assert sorted(p.name for p in tmp_path.glob("*.csv")) == [f"BTCUSDT-1m-2024-01-0{d}.csv" for d in (1, 2, 4)]
+
+    # a second run only asks for the day that was missing, and a deleted file again
+    (tmp_path / "BTCUSDT-1m-2024-01-04.csv").unlink()
+    hits.clear()
+    outcome = download_binance_1m_klines("BTCUSDT", "2024-01-01", "2024-01-04", str(tmp_path), **kwargs)
+    assert outcome == {"downloaded": 1, "skipped": 2, "missing": 1, "failed": 0}
+    assert set(hits) == {"BTCUSDT-1m-2024-01-03.zip", "BTCUSDT-1m-2024-01-04.zip"}
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from detectors import detect_cup_handle_patterns_loose
+from ml import extract_features
+from ml.ml_feature_extractor import POST_BREAKOUT
+from scipy.stats import linregress
+from utils import fit_parabola
+
+def test_batch_features_match_per_pattern_computation(synthetic_df):
+    df = synthetic_df
+    patterns = detect_cup_handle_patterns_loose(df).valid_patterns
+    features = extract_features(patterns, df)
+    assert len(features) == len(patterns) > 0
+
+    closes, highs = df["close"].to_numpy(), df["high"].to_numpy()
+    for p, row in zip(patterns, features.itertuples()):
+        lo, breakout = p["cup_start"], p["breakout"]
+        cup_prices = closes[lo:lo + p["cup_duration"] + 1]
+        _, r2, _ = fit_parabola(np.arange(len(cup_prices)), cup_prices)
+        assert row.r2 == pytest.approx(r2, rel=1e-9)
+        strength = (highs[breakout:breakout + POST_BREAKOUT].max() - closes[breakout]) / closes[breakout]
+        assert row.breakout_strength_pct == strength
+        assert row.handle_retrace_ratio == (p["handle_high"] - p["handle_low"]) / p["cup_depth"]
+        # the volume trend spans the same cup + first handle candle window
+        cup_volumes = df["volume"].to_numpy()[lo:lo + p["cup_duration"] + 1]
+        slope = linregress(np.arange(len(cup_volumes)), cup_volumes).slope
+        assert row.volume_slope == pytest.approx(slope, rel=1e-9, abs=1e-9)
+        assert row.start_time == p["start_time"]
+
+    # the detector's cup-only slope is not reused
+    without = [{**p, "volume_slope": None} for p in patterns]
+    np.testing.assert_array_equal(extract_features(without, df)["volume_slope"], features["volume_slope"])
+    assert extract_features([], df).empty
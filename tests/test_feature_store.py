@@ -0,0 +1,67 @@
+import pandas as pd
+
+from config import config_loader
+from detectors import detect_cup_handle_patterns_loose, DetectorConfig
+from ml import FEATURE_COLUMNS, FeatureStore, config_hash, default_feature_store, extract_features
+from ml.feature_store import KEY_COLUMNS
+
+def test_feature_store_extracts_only_new_patterns(synthetic_df, tmp_path):
+    df = synthetic_df
+    patterns = detect_cup_handle_patterns_loose(df).valid_patterns
+    store = FeatureStore(str(tmp_path / "features"), "BTCUSDT")
+    key = config_hash(DetectorConfig(), rules="loose")
+    labeled = []
+
+    def label(features):
+        labeled.append(len(features))
+        return (features["r2"] > 0.95).astype(int)
+
+    first = store.features_for(patterns, df, key, label=label)
+    expected = extract_features(patterns, df)
+    pd.testing.assert_frame_equal(first[expected.columns], expected, check_dtype=False)
+    assert store.last_part() == 1 and labeled == [len(patterns)]
+
+    # seen before: read back, nothing extracted, labeled or written; the
+    # whole history is scanned for keys only, features are read for the hits
+    reads = []
+    real_read = store.read
+    store.read = lambda columns=None, after=0, filters=None: reads.append((columns, filters)) or \
+        real_read(columns, after, filters)
+    again = store.features_for(patterns, df, key, label=label)
+    del store.read
+    assert reads[0][0] == KEY_COLUMNS and reads[1][1][-1][:2] == ("data_hash", "in")
+    pd.testing.assert_frame_equal(again[first.columns], first, check_dtype=False, check_index_type=False)
+    assert store.last_part() == 1 and labeled == [len(patterns)]
+
+    # changed candles under one pattern and other detector settings are new keys
+    earliest = min(p["cup_start"] for p in patterns)
+    changed = df.copy()
+    changed.iloc[earliest, changed.columns.get_loc("volume")] += 1
+    store.features_for(patterns, changed, key, label=label)
+    assert labeled[-1] == sum(p["cup_start"] == earliest for p in patterns) and store.last_part() == 2
+    store.features_for(patterns, df, config_hash(DetectorConfig(min_r2=0.9), rules="loose"))
+    assert store.last_part() == 3
+
+    assert sum(len(chunk) for chunk in store.iter_chunks(chunk_rows=7)) == 2 * len(patterns) + labeled[-1]
+    assert len(store.read(after=2)) == len(patterns)
+    model = tmp_path / "model.pkl"
+    assert store.trained_part(str(model)) == 0
+    model.write_bytes(b"")
+    store.mark_trained(str(model), 2)
+    assert store.trained_part(str(model)) == 2
+
+def test_empty_store_is_seeded_with_the_labeled_csv(synthetic_df, tmp_path, monkeypatch):
+    seed = config_loader._project_path("data/market-data/patterns/doc/pattern_features_for_labeling.csv")
+    monkeypatch.setattr(config_loader, "_overrides", {"FEATURE_PATH": str(tmp_path / "features")})
+    monkeypatch.setattr(config_loader, "_settings", None)
+    store = default_feature_store()
+    rows = pd.read_csv(seed)
+    assert store.last_part() == 1
+    seeded = store.read(columns=FEATURE_COLUMNS + ["label"])
+    pd.testing.assert_frame_equal(seeded, rows[FEATURE_COLUMNS + ["label"]], check_dtype=False)
+
+    # only an empty store is seeded, and seeded rows are never a pattern's features
+    assert default_feature_store().last_part() == 1 and store.seed(seed) is None
+    patterns = detect_cup_handle_patterns_loose(synthetic_df).valid_patterns
+    features = store.features_for(patterns, synthetic_df, config_hash(DetectorConfig(), rules="loose"))
+    assert len(features) == len(patterns) and store.last_part() == 2
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from conftest import make_synthetic_ohlcv
+from detectors import IncrementalCupHandleDetector
+from detectors.candidate_engine import CupHandleEngine, STRICT_RULES, LOOSE_RULES, rules_atr
+from detectors.incremental import IncrementalATR
+from detectors.pattern_detector import VALID_FIELDS, _valid_candidates
+
+
+def test_incremental_atr_matches_batch(synthetic_df):
+    highs, lows, closes = (synthetic_df[col].to_numpy() for col in ("high", "low", "close"))
+    for rules in (STRICT_RULES, LOOSE_RULES):
+        atr = IncrementalATR(rules.atr)
+        streamed = np.concatenate([atr.update_batch(highs[:1], lows[:1], closes[:1]),
+                                   atr.update_batch(highs[1:700], lows[1:700], closes[1:700]),
+                                   atr.update_batch(highs[700:], lows[700:], closes[700:])])
+        np.testing.assert_allclose(streamed, rules_atr(synthetic_df, rules), rtol=1e-12)
+
+
+def test_incremental_detector_matches_batch_engine():
+    df = make_synthetic_ohlcv(n=3000, cup_starts=(400, 900, 2000))
+    avg_candle_size = np.mean(np.abs(df["high"] - df["low"]))
+    volumes = df["volume"].to_numpy()
+    for rules in (STRICT_RULES, LOOSE_RULES):
+        batch = []
+        for flat in CupHandleEngine(df, rules).iter_flat_blocks():
+            batch += [VALID_FIELDS[rules.name](c) for c in _valid_candidates(flat, flat.valid_at, df.index, volumes)]
+
+        detector = IncrementalCupHandleDetector(rules, avg_candle_size=avg_candle_size)
+        streamed, pos = [], 0
+        for step in (450, 1, 1, 37, 512, 1, 900, 1, 1, 3000):
+            if step == 1:
+                streamed += detector.update(df.iloc[pos])
+            else:
+                streamed += detector.update_batch(df.iloc[pos:pos + step])
+            pos += step
+
+        assert len(batch) > 0
+        pd.testing.assert_frame_equal(pd.DataFrame(batch), pd.DataFrame(streamed), rtol=1e-9)
+        assert detector.results.valid_count == len(batch)
+        print(f"✅ {rules.name}: {len(streamed)} streamed patterns match the batch run.")
+
+
+def test_live_training_reads_features_at_stream_positions(tmp_path, monkeypatch):
+    import importlib
+    import config
+    from config import config_loader
+    from ml import extract_features
+
+    live = importlib.import_module("ml.live_model_trainer")
+    monkeypatch.setattr(config_loader, "_overrides", {"MODEL_PATH": str(tmp_path / "model.pkl")})
+    monkeypatch.setattr(config_loader, "_settings", None)
+    extracted = []
+    monkeypatch.setattr(live, "extract_features",
+                        lambda patterns, df: extracted.append(extract_features(patterns, df)) or extracted[-1].copy())
+
+    df = make_synthetic_ohlcv(n=3000, cup_starts=(400, 900, 2000))
+    detector = IncrementalCupHandleDetector(LOOSE_RULES, avg_candle_size=np.mean(np.abs(df["high"] - df["low"])))
+    pos, bases = 0, []
+    for step in (1200, 800, 1000):
+        live.update_model_live(df.iloc[pos:pos + step], detector=detector)
+        bases.append(detector._base)
+        pos += step
+
+    assert max(bases) > 0 and extracted
+    streamed = pd.concat(extracted, ignore_index=True)
+    expected = extract_features(detector.results.valid_patterns, df)
+    columns = [c for c in streamed.columns if c not in ("cup_start", "breakout")]
+    pd.testing.assert_frame_equal(streamed[columns], expected[columns], rtol=1e-9)
+    assert config.MODEL_PATH == str(tmp_path / "model.pkl")
@@ -0,0 +1,44 @@
+import numpy as np
+
+from detectors.candidate_engine import CupHandleEngine, STRICT_RULES, LOOSE_RULES, rules_atr
+from utils import use_indicator_cache
+from utils.indicator_cache import frame_key
+
+def test_indicators_are_cached_per_content(synthetic_df, tmp_path):
+    fresh = {rules.name: rules_atr(synthetic_df, rules) for rules in (STRICT_RULES, LOOSE_RULES)}
+    use_indicator_cache(str(tmp_path))
+    try:
+        for rules in (STRICT_RULES, LOOSE_RULES):
+            rules_atr(synthetic_df, rules)
+            cached = rules_atr(synthetic_df, rules)
+            assert isinstance(cached, np.memmap)
+            np.testing.assert_array_equal(cached, fresh[rules.name])
+        engine = CupHandleEngine(synthetic_df.copy(), STRICT_RULES)  # same content, other frame
+        assert isinstance(engine.atr, np.memmap)
+        assert engine.avg_candle_size == np.mean(np.abs(synthetic_df["high"] - synthetic_df["low"]))
+
+        changed = synthetic_df.copy()
+        changed.iloc[-1, changed.columns.get_loc("high")] += 1
+        files = len(list(tmp_path.iterdir()))
+        rules_atr(changed, STRICT_RULES)
+        assert len(list(tmp_path.iterdir())) == files + 1
+    finally:
+        use_indicator_cache(None)
+
+def test_least_recently_used_files_are_pruned(synthetic_df, tmp_path):
+    one_file = len(synthetic_df) * 8 + 128  # one float64 ATR array and its .npy header
+    use_indicator_cache(str(tmp_path), max_bytes=2 * one_file)
+    try:
+        frames = [synthetic_df.copy() for _ in range(3)]
+        for k, frame in enumerate(frames):
+            frame.iloc[-1, frame.columns.get_loc("high")] += k + 1
+        rules_atr(frames[0], STRICT_RULES)
+        rules_atr(frames[1], STRICT_RULES)
+        rules_atr(frames[0], STRICT_RULES)  # a hit makes frames[0] the most recently used
+        rules_atr(frames[2], STRICT_RULES)
+        kept = [path.name for path in tmp_path.iterdir()]
+        assert len(kept) == 2
+        for frame, cached in zip(frames, (True, False, True)):
+            assert any(frame_key(frame) in name for name in kept) == cached
+    finally:
+        use_indicator_cache(None)
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from config import config_loader
+from ml import label_patterns, label_rules, unlabeled_counts, LabelRules, Unlabeled, UNLABELED
+
+def _row_label(row, df, rules):
+    cup = df["volume"].iloc[int(row.cup_start):int(row.cup_start) + int(row.cup_duration) + 1]
+    avg_cup_vol = cup.mean() or 1
+    return int(row.r2 >= rules.min_r2 and row.breakout_strength_pct > rules.min_breakout_strength
+               and row.handle_retrace_ratio < rules.max_handle_retrace and row.volume_slope >= rules.min_volume_slope
+               and row.breakout_volume > rules.breakout_volume_ratio * avg_cup_vol)
+
+def _features(df, n=2000, seed=5):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "r2": rng.uniform(0.8, 1.0, n), "breakout_strength_pct": rng.uniform(0, 0.03, n),
+        "handle_retrace_ratio": rng.uniform(0, 0.5, n), "volume_slope": rng.normal(0, 1, n),
+        "breakout_volume": rng.uniform(0, 300, n), "cup_start": rng.integers(0, len(df) - 1, n),
+        "cup_duration": rng.integers(30, 300, n),
+    })
+
+def test_labels_match_row_wise_rules(synthetic_df):
+    df = synthetic_df
+    features = _features(df)
+    rules = LabelRules()
+    result = label_patterns(features, df, rules)
+    expected = [_row_label(row, df, rules) for row in features.itertuples()]
+    assert result.labels.tolist() == expected
+    assert 0 < result.labels.sum() < len(features) and unlabeled_counts(result) == {}
+
+    loose = LabelRules(min_r2=0.0, min_breakout_strength=-1.0, max_handle_retrace=1.0,
+                       min_volume_slope=-np.inf, breakout_volume_ratio=0.0)
+    assert label_patterns(features, df, loose).labels.sum() == (features["breakout_volume"] > 0).sum()
+
+def test_unlabeled_rows_are_reported(synthetic_df):
+    df = synthetic_df
+    features = _features(df, n=5)
+    features.loc[0, "r2"] = np.nan
+    features.loc[1, "cup_start"] = len(df) + 10
+    features.loc[2, "cup_start"] = -3
+    features.loc[3, "cup_duration"] = -5
+    result = label_patterns(features, df)
+    assert result.labels[:4].tolist() == [UNLABELED] * 4 and result.labels[4] in (0, 1)
+    assert result.reasons.tolist() == [Unlabeled.MISSING_FEATURE, Unlabeled.OUT_OF_RANGE, Unlabeled.OUT_OF_RANGE,
+                                       Unlabeled.EMPTY_CUP, Unlabeled.LABELED]
+    assert unlabeled_counts(result) == {"missing_feature": 1, "out_of_range": 2, "empty_cup": 1}
+
+    missing = label_patterns(features.drop(columns="breakout_volume"), df)
+    assert (missing.labels == UNLABELED).all()
+
+def test_thresholds_come_from_config(monkeypatch):
+    monkeypatch.setattr(config_loader, "_overrides", {})
+    monkeypatch.setattr(config_loader, "_settings", None)
+    monkeypatch.setenv("PATTERN_AUTO_LABEL", '{"min_r2": 0.5, "breakout_volume_ratio": 2.0}')
+    assert label_rules() == LabelRules(min_r2=0.5, breakout_volume_ratio=2.0)
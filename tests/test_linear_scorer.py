@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+from ml import LinearScorer, ModelRegistry, FEATURE_COLUMNS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _features(n, seed=0):
+    rng = np.random.default_rng(seed)
+    scale = [0.1, 500, 100, 20, 0.3, 0.02, 5, 300]
+    return pd.DataFrame(rng.normal(size=(n, len(FEATURE_COLUMNS))) * scale, columns=FEATURE_COLUMNS)
+
+def _registry(path, seed=0):
+    X = _features(300, seed)
+    y = (X["r2"] + X["volume_slope"] / 50 > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = SGDClassifier(loss="log_loss", random_state=seed).fit(scaler.transform(X), y)
+    registry = ModelRegistry(str(path))
+    registry.save(model, scaler)
+    return registry
+
+def test_scorer_reproduces_the_sklearn_bundle(tmp_path):
+    registry = _registry(tmp_path / "model.pkl")
+    bundle = registry.get()
+    scorer = LinearScorer.load(registry.scorer_path)
+    assert scorer.version == bundle.version == 1 and scorer.feature_cols == FEATURE_COLUMNS
+
+    X = _features(5000, seed=1)
+    X_scaled = bundle.scaler.transform(X)
+    np.testing.assert_array_equal(scorer.decision_function(X), bundle.model.decision_function(X_scaled))
+    np.testing.assert_allclose(scorer.predict_proba(X), bundle.model.predict_proba(X_scaled)[:, 1], rtol=1e-14)
+    # columns are picked by name; arrays are taken in feature_cols order
+    np.testing.assert_array_equal(scorer.predict_proba(X[FEATURE_COLUMNS[::-1]]), scorer.predict_proba(X.to_numpy()))
+
+    unit = LinearScorer(np.zeros(2), np.ones(2), np.ones(2), 0.0, ["a", "b"])
+    with np.errstate(over="raise", invalid="raise"):
+        assert unit.predict_proba(np.array([[-500.0, -500.0], [0.0, 0.0], [500.0, 500.0]])).tolist() == [0.0, 0.5, 1.0]
+
+def test_registry_scores_without_sklearn_and_skips_stale_exports(tmp_path):
+    registry = _registry(tmp_path / "model.pkl")
+    X = _features(20, seed=2)
+    expected = registry.predict_proba(X)
+    # a checkout can write the export before the bundle: it is still the bundle's
+    os.utime(registry.scorer_path, ns=(0, 0))
+    assert ModelRegistry(registry.path).scorer().source == LinearScorer.load(registry.scorer_path).source != ""
+    X.to_csv(tmp_path / "features.csv", index=False)
+    script = (
+        "import sys, pandas as pd; from ml import ModelRegistry;"
+        f"p = ModelRegistry({str(tmp_path / 'model.pkl')!r}).predict_proba(pd.read_csv({str(tmp_path / 'features.csv')!r}));"
+        "print(','.join(map(repr, p.tolist()))); print(any(m in sys.modules for m in ('sklearn', 'pyarrow.parquet')))"
+    )
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    scores, imported = out.split()
+    np.testing.assert_allclose([float(v) for v in scores.split(",")], expected, rtol=1e-12)
+    assert imported == "False"
+
+    # a bundle written without re-exporting (older code) makes the export stale: sklearn scores instead
+    bundle = registry.load()
+    joblib.dump({"model": bundle.model, "scaler": bundle.scaler}, registry.path)
+    assert registry.scorer() is None
+    np.testing.assert_allclose(registry.predict_proba(X), expected, rtol=1e-14)
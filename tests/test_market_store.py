@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessor import load_market_data, write_market_data, market_days, OHLCV
+
+def binance_frame(synthetic_df):
+    df = synthetic_df.reset_index()
+    df["close_time"] = df["timestamp"] + pd.Timedelta(seconds=59.999)
+    df["quote_volume"] = df["volume"] * df["close"]
+    df["trades"] = np.arange(len(df))
+    df["taker_buy_volume"] = df["volume"] / 2
+    df["taker_buy_quote_volume"] = df["quote_volume"] / 2
+    return df
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow", ".csv"])
+def test_store_round_trip(synthetic_df, tmp_path, suffix):
+    path = str(tmp_path / f"klines{suffix}")
+    write_market_data(binance_frame(synthetic_df).iloc[::-1], path)  # written sorted
+
+    df = load_market_data(path, columns=OHLCV, memory_map=True)
+    expected = synthetic_df[OHLCV].set_axis(synthetic_df.index.as_unit("ns"))
+    pd.testing.assert_frame_equal(df, expected, check_freq=False)
+    full = load_market_data(path)
+    assert full["trades"].dtype == np.int64 and full.index.dtype == "datetime64[ns]"
+
+def test_partitioned_store_reads_only_the_requested_days(tmp_path):
+    from conftest import make_synthetic_ohlcv
+
+    df = binance_frame(make_synthetic_ohlcv(n=4 * 1440, cup_starts=()))
+    root = str(tmp_path / "klines")
+    assert len(write_market_data(df.iloc[:2 * 1440 + 10], root, symbol="BTCUSDT")) == 3
+    # appending touches the partial third day and the new fourth one only
+    first = tmp_path / "klines" / "BTCUSDT" / "2024-01-01.parquet"
+    mtime = first.stat().st_mtime_ns
+    assert len(write_market_data(df.iloc[2 * 1440:], root, symbol="BTCUSDT")) == 2
+    assert first.stat().st_mtime_ns == mtime
+
+    days = market_days(root)
+    assert [str(day.date()) for day in days] == ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]
+    everything = load_market_data(root, columns=OHLCV)
+    assert len(everything) == len(df) and everything.index.is_unique
+
+    start, end = pd.Timestamp("2024-01-02 12:00"), pd.Timestamp("2024-01-03 06:00")
+    window = load_market_data(root, columns=["close"], start=start, end=end)
+    pd.testing.assert_frame_equal(window, everything.loc[start:end - pd.Timedelta(minutes=1), ["close"]])
+    # a single Parquet file pushes the same range down to the reader
+    single = str(tmp_path / "klines.parquet")
+    write_market_data(df, single)
+    pd.testing.assert_frame_equal(load_market_data(single, columns=["close"], start=start, end=end), window)
+
+def test_merger_dedupes_reports_gaps_and_resumes(tmp_path):
+    from conftest import make_synthetic_ohlcv
+    from preprocessor import merge_binance_csv
+
+    df = binance_frame(make_synthetic_ohlcv(n=4 * 1440, cup_starts=()))
+    for col in ("timestamp", "close_time"):
+        df[col] = df[col].astype("datetime64[ms]").astype("int64")  # Binance files hold epoch ms
+    df["ignore"] = 0
+    df.columns = ["open_time", "open", "high", "low", "close", "volume", "close_time", "quote_volume", "count",
+                  "taker_buy_volume", "taker_buy_quote_volume", "ignore"]  # Binance's header
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    days = [df.iloc[day * 1440:(day + 1) * 1440] for day in range(4)]
+    days[1] = days[1].drop(days[1].index[100:103])  # three missing minutes
+    days[2] = pd.concat([days[1].tail(30), days[2]])  # overlaps the day before
+    for day, rows in enumerate(days[:3]):
+        rows.to_csv(downloads / f"BTCUSDT-1m-2024-01-0{day + 1}.csv", index=False, header=day != 0)
+
+    root = str(tmp_path / "klines")
+    gaps = merge_binance_csv(str(downloads), root, symbol="BTCUSDT", incremental=True)
+    assert gaps["missing_minutes"].tolist() == [3]
+    assert len(load_market_data(root)) == 3 * 1440 - 3
+
+    # only the new day is read on the next run
+    days[3].to_csv(downloads / "BTCUSDT-1m-2024-01-04.csv", index=False)
+    (downloads / "BTCUSDT-1m-2024-01-01.csv").write_text("not a kline file")  # changed, so re-read and skipped
+    gaps = merge_binance_csv(str(downloads), root, symbol="BTCUSDT", incremental=True)
+    merged = load_market_data(root)
+    assert gaps.empty and len(merged) == 4 * 1440 - 3 and merged.index.is_monotonic_increasing
+
+def test_failed_merge_keeps_the_previous_output(tmp_path, monkeypatch):
+    from conftest import make_synthetic_ohlcv
+    from preprocessor import merge_binance_csv, data_merger
+
+    df = binance_frame(make_synthetic_ohlcv(n=3 * 1440, cup_starts=()))
+    for col in ("timestamp", "close_time"):
+        df[col] = df[col].astype("datetime64[ms]").astype("int64")
+    df["ignore"] = 0
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    days = [df.iloc[day * 1440:(day + 1) * 1440] for day in range(3)]
+    # the first day's file is not sorted: its first row is a candle of the last day
+    days[0] = pd.concat([days[2].head(1), days[0]])
+    for day, rows in enumerate(days):
+        rows.to_csv(downloads / f"BTCUSDT-1m-2024-01-0{day + 1}.csv", index=False, header=False)
+
+    output = str(tmp_path / "klines.csv")
+    assert merge_binance_csv(str(downloads), output).empty
+    merged = load_market_data(output)
+    assert len(merged) == 3 * 1440 and merged.index.is_monotonic_increasing
+    good = open(output).read()
+
+    real_read = data_merger.read_kline_csv
+    def read_then_fail(file, nrows=None):
+        if file.endswith("03.csv"):
+            raise KeyboardInterrupt
+        return real_read(file, nrows)
+    monkeypatch.setattr(data_merger, "read_kline_csv", read_then_fail)
+    with pytest.raises(KeyboardInterrupt):
+        merge_binance_csv(str(downloads), output)
+    assert open(output).read() == good and not (tmp_path / "klines.csv.tmp").exists()
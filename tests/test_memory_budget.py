@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+
+from preprocessor import MemoryBudgetExceeded, estimate_candles, load_frame, load_market_data, write_market_data, OHLCV
+from test_market_store import binance_frame
+
+def test_load_frame_keeps_to_its_budget(tmp_path):
+    from conftest import make_synthetic_ohlcv
+
+    root = str(tmp_path / "klines")
+    df = binance_frame(make_synthetic_ohlcv(n=2 * 1440, cup_starts=()))
+    write_market_data(df, root, symbol="BTCUSDT")
+    assert estimate_candles(root, "BTCUSDT") == len(df)
+    assert estimate_candles(root, "BTCUSDT", start="2024-01-02", end="2024-01-03") == 1440
+
+    # the pipeline's frame is checked at its float64 size, before and after reading
+    frame = len(df) * (8 + 8 * len(OHLCV))
+    loaded = load_frame(root, "BTCUSDT", budget_bytes=frame)
+    pd.testing.assert_frame_equal(loaded, load_market_data(root, columns=OHLCV, symbol="BTCUSDT"))
+    with pytest.raises(MemoryBudgetExceeded):
+        load_frame(root, "BTCUSDT", budget_bytes=frame - 1)
+    # a day fits in half of it
+    assert len(load_frame(root, "BTCUSDT", start="2024-01-02", end="2024-01-03", budget_bytes=frame // 2)) == 1440
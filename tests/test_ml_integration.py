@@ -3,21 +3,19 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from detectors import detect_cup_handle_patterns_loose
+from preprocessor import load_market_data, market_days, OHLCV
 
 import pandas as pd
 from ml import extract_features
 import joblib
 
-from config import RAW_DATA_PATH, MODEL_PATH
+from config import RAW_DATA_PATH, MODEL_PATH, MARKET_SYMBOL
 
 def test_model_predictions_on_first_5_days():
-    df = pd.read_csv(RAW_DATA_PATH, parse_dates=["timestamp"])
-    df.set_index("timestamp", inplace=True)
-
     # Limit to first 5 days of data
-    start_time = df.index.min()
+    start_time = market_days(RAW_DATA_PATH, MARKET_SYMBOL)[0]
     end_time = start_time + pd.Timedelta(days=5)
-    df = df[(df.index >= start_time) & (df.index < end_time)]
+    df = load_market_data(RAW_DATA_PATH, columns=OHLCV, start=start_time, end=end_time, symbol=MARKET_SYMBOL)
     print(f"📅 Using data from {start_time} to {end_time} — {len(df)} rows")
 
     patterns = detect_cup_handle_patterns_loose(df)
@@ -0,0 +1,53 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+from ml import ModelRegistry, FEATURE_COLUMNS
+
+def _fitted(seed):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(200, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    y = (X["r2"] + rng.normal(scale=0.5, size=200) > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = SGDClassifier(loss="log_loss", random_state=seed).fit(scaler.transform(X), y)
+    return model, scaler, X
+
+def test_bundle_is_cached_and_swapped_when_the_file_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "model" / "model.pkl")
+    model, scaler, X = _fitted(0)
+    ModelRegistry(path).save(model, scaler, rows=len(X))
+    assert sorted(os.listdir(tmp_path / "model")) == ["model.npz", "model.pkl"]
+
+    loads = []
+    real_load = joblib.load
+    monkeypatch.setattr(joblib, "load", lambda *a, **k: loads.append(a) or real_load(*a, **k))
+    registry = ModelRegistry(path)
+    bundle = registry.get()
+    assert registry.get() is bundle and len(loads) == 1
+    assert bundle.version == 1 and bundle.metadata["rows"] == len(X) and "trained_at" in bundle.metadata
+    np.testing.assert_allclose(registry.predict_proba(X),
+                               model.predict_proba(scaler.transform(X[FEATURE_COLUMNS]))[:, 1])
+
+    # another process retrains: the next get() picks the new bundle up
+    other_model, other_scaler, _ = _fitted(1)
+    ModelRegistry(path).save(other_model, other_scaler)
+    loads.clear()
+    swapped = registry.get()
+    assert swapped.version == 2 and len(loads) == 1 and registry.get() is swapped
+    np.testing.assert_allclose(swapped.model.coef_, other_model.coef_)
+    assert registry.load() is not swapped
+
+def test_old_bundles_load_with_defaults(tmp_path):
+    path = str(tmp_path / "model.pkl")
+    model, scaler, _ = _fitted(2)
+    joblib.dump({"model": model, "scaler": scaler}, path)
+    registry = ModelRegistry(path)
+    bundle = registry.get()
+    assert bundle.feature_cols == FEATURE_COLUMNS and bundle.version == 0 and bundle.metadata == {}
+    assert registry.save(model, scaler).version == 1
+    assert set(joblib.load(path)) == {"model", "scaler", "feature_cols", "version", "metadata"}
+    assert not ModelRegistry(str(tmp_path / "missing.pkl")).exists()
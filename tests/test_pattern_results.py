@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from detectors import detect_cup_handle_patterns_loose, PatternResults
+
+def test_results_are_columnar(synthetic_df):
+    results = detect_cup_handle_patterns_loose(synthetic_df)
+    cols = results.columns
+    assert cols["cup_start"].dtype == np.int32 and cols["reason"].dtype == np.int8
+    assert cols["r2"].dtype == np.float32
+
+    frame = results.to_frame()
+    assert len(frame) == len(results)
+    assert frame["valid"].sum() == len(results.valid_patterns) == 30
+    assert (frame.loc[frame["valid"], "start_time"].tolist() ==
+            [p["start_time"] for p in results.valid_patterns])
+    print(f"✅ {len(results)} candidates logged, {results.valid_count} valid.")
+
+def test_summary_only_keeps_counts(synthetic_df):
+    full = detect_cup_handle_patterns_loose(synthetic_df)
+    summary = detect_cup_handle_patterns_loose(synthetic_df, summary_only=True)
+    assert summary.reason_counts().equals(full.reason_counts())
+    assert len(summary.to_frame()) == summary.valid_count
+    assert full.reason_counts().sum() == len(full)
+
+def test_save_and_load_round_trip(synthetic_df, tmp_path):
+    results = detect_cup_handle_patterns_loose(synthetic_df)
+    results.valid_patterns[0]["ml_confidence"] = 0.75
+    path = tmp_path / "results.npz"
+    results.save(path)
+
+    loaded = PatternResults.load(path)
+    pd.testing.assert_frame_equal(loaded.to_frame(), results.to_frame(), check_dtype=False)
+    assert loaded.valid_frame()["ml_confidence"].iloc[0] == 0.75
+
+def test_patterns_are_keyed_by_row_position(synthetic_df):
+    from ml import extract_features
+
+    # a few missing candles inside the first planted cup
+    gappy = synthetic_df.drop(synthetic_df.index[420:425])
+    results = detect_cup_handle_patterns_loose(gappy)
+    for p in results.valid_patterns:
+        assert gappy.index[p["cup_start"]] == p["start_time"] and gappy.index[p["breakout"]] == p["end_time"]
+    frame = results.to_frame()
+    assert frame.loc[frame["valid"], "cup_start"].tolist() == [p["cup_start"] for p in results.valid_patterns]
+
+    features = extract_features(results, gappy)
+    assert (features["breakout"] - features["cup_start"] == features["cup_duration"] + features["handle_duration"]).all()
+    # records read back without positions are located by timestamp
+    stripped = [{k: v for k, v in p.items() if k not in ("cup_start", "breakout")} for p in results.valid_patterns]
+    pd.testing.assert_frame_equal(extract_features(stripped, gappy), features)
+
+def test_ml_scores_follow_pattern_positions(synthetic_df, tmp_path):
+    from detectors import apply_ml_scores
+    from ml import extract_features
+
+    results = detect_cup_handle_patterns_loose(synthetic_df)
+    patterns = results.valid_patterns
+    # two patterns placed outside the data get no feature row
+    for p in patterns[:2]:
+        p["cup_start"] = -1
+    features = extract_features(patterns, synthetic_df)
+    assert len(features) == len(patterns) - 2
+    probabilities = np.linspace(0, 1, len(features))
+    apply_ml_scores(patterns, features, probabilities, synthetic_df.index, 0.5)
+
+    scored = {(row.cup_start, row.breakout): p for row, p in zip(features.itertuples(), probabilities)}
+    for p in patterns:
+        expected = scored.get((p["cup_start"], p["breakout"]))
+        assert p["ml_confidence"] == (None if expected is None else round(float(expected), 4))
+        assert p["ml_valid"] == (None if expected is None else bool(expected >= 0.5))
+
+    # unscored patterns keep a missing ml_valid, which the dashboard's == True filter does not match
+    path = tmp_path / "results.npz"
+    results.save(path)
+    loaded = PatternResults.load(path).valid_frame()
+    assert loaded["ml_valid"].tolist() == [p["ml_valid"] for p in patterns]
+    assert (loaded["ml_valid"] == True).sum() == sum(p["ml_valid"] is True for p in patterns)  # noqa: E712
@@ -7,15 +7,14 @@ import pandas as pd
 import joblib
 from ml import extract_features
 from detectors import detect_cup_handle_patterns_loose
-from config import RAW_DATA_PATH, MODEL_PATH
+from preprocessor import load_market_data, market_days, OHLCV
+from config import RAW_DATA_PATH, MODEL_PATH, MARKET_SYMBOL
 
 def load_df_first_n_days(n=5):
-    df = pd.read_csv(RAW_DATA_PATH, parse_dates=["timestamp"])
-    df.set_index("timestamp", inplace=True)
-    df = df.sort_index()
-    start_time = df.index.min()
+    # only the first n day partitions are read
+    start_time = market_days(RAW_DATA_PATH, MARKET_SYMBOL)[0]
     end_time = start_time + pd.Timedelta(days=n)
-    df = df[(df.index >= start_time) & (df.index < end_time)]
+    df = load_market_data(RAW_DATA_PATH, columns=OHLCV, start=start_time, end=end_time, symbol=MARKET_SYMBOL)
     print(f"📅 Loaded data from {start_time} to {end_time} — {len(df)} rows")
     return df
 
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from utils import RangeExtremaIndex, label_slice_positions
+
+def test_range_queries_match_slices(synthetic_df):
+    index = RangeExtremaIndex.for_frame(synthetic_df)
+    rng = np.random.default_rng(2)
+    starts = rng.integers(0, len(synthetic_df) - 400, 300)
+    stops = starts + rng.integers(1, 400, 300)
+
+    highs, lows, volumes = (synthetic_df[c].to_numpy() for c in ("high", "low", "volume"))
+    assert np.array_equal(index.max("high", starts, stops), [highs[a:b].max() for a, b in zip(starts, stops)])
+    assert np.array_equal(index.min("low", starts, stops), [lows[a:b].min() for a, b in zip(starts, stops)])
+    assert index.mean("volume", starts, stops) == pytest.approx([volumes[a:b].mean() for a, b in zip(starts, stops)])
+
+def test_index_is_shared_per_frame(synthetic_df):
+    assert RangeExtremaIndex.for_frame(synthetic_df) is RangeExtremaIndex.for_frame(synthetic_df)
+    assert RangeExtremaIndex.for_frame(synthetic_df.copy()) is not RangeExtremaIndex.for_frame(synthetic_df)
+
+def test_label_slice_positions_match_loc(synthetic_df):
+    start = synthetic_df.index[100]
+    end = start + np.timedelta64(30, "m")
+    lo, hi = label_slice_positions(synthetic_df.index, start, end)
+    assert hi - lo == len(synthetic_df.loc[start:end])
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from utils import fit_parabola, RollingParabolaFit
+
+def random_walk_closes(n=20000, seed=7):
+    rng = np.random.default_rng(seed)
+    return 42000 + np.cumsum(rng.normal(0, 15, n))
+
+def test_rolling_fit_matches_fit_parabola():
+    closes = random_walk_closes()
+    fitter = RollingParabolaFit(closes, max_window=300)
+
+    rng = np.random.default_rng(1)
+    starts = rng.integers(0, len(closes) - 300, 500)
+    lengths = rng.integers(30, 301, 500)
+    fits = fitter.fit(starts, lengths)
+
+    for k, (start, length) in enumerate(zip(starts, lengths)):
+        coeffs, r2, y_fit = fit_parabola(np.arange(length), closes[start:start + length])
+        assert fits.r2[k] == pytest.approx(r2, abs=1e-6)
+        assert fits.coeffs[k] == pytest.approx(coeffs, rel=1e-5, abs=1e-8)
+        assert fits.depth[k] == pytest.approx(y_fit.max() - y_fit.min(), rel=1e-6, abs=1e-6)
+    print(f"✅ {len(starts)} rolling fits match np.polyfit.")
+
+def test_rolling_fit_windows_across_block_boundary():
+    closes = random_walk_closes(2000)
+    fitter = RollingParabolaFit(closes, max_window=256)
+    start = fitter.max_window - 10
+    fits = fitter.fit(start, 200)
+    _, r2, _ = fit_parabola(np.arange(200), closes[start:start + 200])
+    assert fits.r2 == pytest.approx(r2, abs=1e-6)
+
+def test_rolling_fit_rejects_windows_longer_than_max_window():
+    fitter = RollingParabolaFit(random_walk_closes(2000), max_window=64)
+    with pytest.raises(ValueError):
+        fitter.fit(0, 65)
+
+def test_linear_trend_matches_linregress():
+    from scipy.stats import linregress
+    from utils import RollingLinearTrend
+
+    volumes = np.random.default_rng(3).uniform(10, 500, 5000)
+    trend = RollingLinearTrend(volumes, max_window=300)
+    starts = np.arange(0, 4000, 97)
+    lengths = np.resize(np.arange(30, 301, 13), len(starts))
+    slopes = trend.slope(starts, lengths)
+    for k, (start, length) in enumerate(zip(starts, lengths)):
+        expected = linregress(np.arange(length), volumes[start:start + length]).slope
+        assert slopes[k] == pytest.approx(expected, rel=1e-7, abs=1e-9)
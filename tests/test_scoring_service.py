@@ -0,0 +1,88 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+import config
+from ml import FEATURE_COLUMNS, MicroBatcher, ModelRegistry
+from scoring_service import create_scoring_app
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    batches = []
+
+    def score(rows):
+        batches.append(len(rows))
+        time.sleep(0.002)
+        return rows.sum(axis=1)
+
+    batcher = MicroBatcher(score, max_batch=64, max_delay=0.02)
+    rng = np.random.default_rng(0)
+    requests = [rng.normal(size=(int(rng.integers(1, 6)), 3)) for _ in range(200)]
+    results = [None] * len(requests)
+
+    def produce(i):
+        results[i] = batcher.submit(requests[i]).result(timeout=10)
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for rows, result in zip(requests, results):
+        np.testing.assert_array_equal(result, rows.sum(axis=1))
+
+    rows = sum(len(r) for r in requests)
+    assert sum(batches) == rows and len(batches) < len(requests)
+    assert max(batches) <= 64 + 5
+    stats = batcher.stats.snapshot()
+    assert stats["requests"] == len(requests) and stats["rows"] == rows and stats["batches"] == len(batches)
+    assert 0 < stats["p50_ms"] <= stats["p99_ms"]
+
+    # a lone request waits at most max_delay; empty requests are answered at once
+    start = time.perf_counter()
+    batcher.submit(np.ones((1, 3))).result(timeout=10)
+    assert time.perf_counter() - start < 1
+    assert len(batcher.submit(np.zeros((0, 3))).result()) == 0
+    batcher.close()
+
+def test_scoring_errors_reach_every_request_of_the_batch():
+    def fail(rows):
+        raise RuntimeError("no model")
+
+    batcher = MicroBatcher(fail, max_delay=0.01)
+    futures = [batcher.submit(np.ones((2, 3))) for _ in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="no model"):
+            future.result(timeout=10)
+    batcher.close()
+
+def test_service_scores_rows_with_the_cached_model(tmp_path):
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(200, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    scaler = StandardScaler().fit(X)
+    model = SGDClassifier(loss="log_loss", random_state=0).fit(scaler.transform(X), (X["r2"] > 0).astype(int))
+    registry = ModelRegistry(str(tmp_path / "model.pkl"))
+    registry.save(model, scaler)
+
+    client = create_scoring_app(registry, max_delay_ms=1).test_client()
+    assert client.get("/health").get_json() == {"status": "ok", "model_version": 1, "numpy_scorer": True}
+
+    rows = X.head(5).assign(pattern_id=range(5)).to_dict("records")
+    results = client.post("/score", json={"rows": rows}).get_json()["results"]
+    expected = registry.predict_proba(X.head(5))
+    assert [r["ml_confidence"] for r in results] == [round(float(p), 4) for p in expected]
+    assert [r["ml_valid"] for r in results] == [bool(p >= config.CONFIDENCE_THRESHOLD) for p in expected]
+
+    # a raw pattern record lacks the features computed from the candles
+    record = {k: v for k, v in rows[0].items() if k != "breakout_strength_pct"}
+    response = client.post("/score", json={"rows": [rows[1], record]})
+    assert response.status_code == 400 and response.get_json()["missing"] == ["breakout_strength_pct"]
+    assert client.post("/score", json={"rows": [{"r2": 1.0}]}).status_code == 400
+    assert client.post("/score", json={"features": []}).status_code == 400
+    assert client.post("/score", json={"rows": []}).get_json() == {"results": []}
+    metrics = client.get("/metrics").get_json()
+    assert metrics["requests"] == 1 and metrics["rows"] == 5
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from conftest import make_synthetic_ohlcv
+from detectors import detect_cup_handle_patterns, detect_cup_handle_patterns_loose
+from detectors.candidate_engine import CupHandleEngine, LOOSE_RULES
+from detectors.sharded import iter_sharded_blocks
+
+
+def test_sharded_detection_matches_serial(synthetic_df):
+    for detect in (detect_cup_handle_patterns, detect_cup_handle_patterns_loose):
+        serial = detect(synthetic_df)
+        sharded = detect(synthetic_df, workers=2)
+        pd.testing.assert_frame_equal(serial.to_frame(), sharded.to_frame())
+        assert serial.valid_patterns == sharded.valid_patterns
+    print("✅ Sharded detection matches the serial run.")
+
+
+def test_sharded_blocks_cover_every_breakout():
+    # no planted cups, so nothing stops early and every shard is consumed
+    df = make_synthetic_ohlcv(n=3000, cup_starts=())
+    engine = CupHandleEngine(df, LOOSE_RULES, chunk_size=256)
+    serial = list(engine.iter_flat_blocks())
+    sharded = list(iter_sharded_blocks(df, LOOSE_RULES, workers=2, chunk_size=256, shards=7))
+    for field in ("cup_start", "breakout", "cup_len", "reason"):
+        left = pd.Series([v for block in serial for v in getattr(block, field)])
+        right = pd.Series([v for block in sharded for v in getattr(block, field)])
+        pd.testing.assert_series_equal(left, right)
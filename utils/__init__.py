@@ -1,2 +1,18 @@
+import importlib
+
 from .math_util import fit_parabola, fit_parabola_curvfit
-from .plot_utils import plot_and_save_pattern
\ No newline at end of file
+from .rolling_fit import RollingParabolaFit, RollingLinearTrend
+from .range_extrema import RangeExtremaIndex, label_slice_positions, pattern_positions
+from .resample import resample_ohlcv
+from .indicator_cache import IndicatorCache, use_indicator_cache, cached_indicator
+
+# imported on first use: plotting pulls in plotly and scipy
+_LAZY = {"plot_and_save_pattern": ".plot_utils"}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
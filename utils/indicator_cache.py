@@ -0,0 +1,112 @@
+import glob
+import hashlib
+import os
+import tempfile
+import weakref
+import numpy as np
+
+OHLCV_COLUMNS = ("high", "low", "close", "volume")
+DEFAULT_MAX_BYTES = 1024 * 2**20
+_FRAME_KEYS = {}
+_active = None
+
+
+def frame_key(df):
+    """Content hash of the OHLCV columns of df, computed once per DataFrame."""
+    key = id(df)
+    cached = _FRAME_KEYS.get(key)
+    if cached is not None and cached[0]() is df:
+        return cached[1]
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.int64(len(df)).tobytes())
+    for column in OHLCV_COLUMNS:
+        digest.update(column.encode())
+        digest.update(memoryview(np.ascontiguousarray(df[column].to_numpy(dtype=np.float64))))
+    _FRAME_KEYS[key] = (weakref.ref(df, lambda _ref, key=key: _FRAME_KEYS.pop(key, None)), digest.hexdigest())
+    return _FRAME_KEYS[key][1]
+
+
+class IndicatorCache:
+    """
+    Indicator arrays on disk as .npy files, named after the indicator, its
+    parameters and the content hash of the frame they were computed from.
+
+    A hit is loaded memory-mapped (read-only), so a cached ATR over years of
+    1m candles comes back in milliseconds; a miss is computed and written
+    atomically, so concurrent runs never see a partial file.
+
+    Every new frame content (a day of appended data, a live tail, a
+    resampled pyramid level) adds files, so after each write the least
+    recently used files are removed until the cache fits max_bytes (None =
+    no limit); a hit refreshes its file's modification time.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, df, name, **params):
+        parts = [name] + [f"{k}={params[k]}" for k in sorted(params)] + [frame_key(df)]
+        return os.path.join(self.directory, "-".join(parts) + ".npy")
+
+    def get(self, df, name, compute, **params):
+        path = self.path(df, name, **params)
+        if os.path.exists(path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass  # pruned by another process in between
+            else:
+                return np.load(path, mmap_mode="r")
+        values = np.asarray(compute(df, **params), dtype=np.float64)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, values)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.prune(keep=path)
+        return values
+
+    def prune(self, keep=None):
+        """Remove the least recently used files until the cache fits max_bytes; returns the bytes freed."""
+        if self.max_bytes is None:
+            return 0
+        files = []
+        for path in glob.glob(os.path.join(self.directory, "*.npy")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        freed = 0
+        for _, size, path in sorted(files):
+            if total - freed <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                # memory-mapped readers keep their data, the file is only unlinked
+                os.remove(path)
+            except OSError:
+                continue
+            freed += size
+        return freed
+
+
+def use_indicator_cache(directory, max_bytes=DEFAULT_MAX_BYTES):
+    """Cache indicators under directory, at most max_bytes of them, from now on (None turns caching off)."""
+    global _active
+    _active = IndicatorCache(directory, max_bytes) if directory else None
+    return _active
+
+
+def cached_indicator(df, name, compute, **params):
+    """compute(df, **params) as a float64 array, through the active IndicatorCache if there is one."""
+    if _active is None:
+        return np.asarray(compute(df, **params), dtype=np.float64)
+    return _active.get(df, name, compute, **params)
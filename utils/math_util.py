@@ -1,5 +1,4 @@
 import numpy as np
-from scipy.optimize import curve_fit
 
 def fit_parabola(x, y):
     coeffs = np.polyfit(x, y, 2)
@@ -12,6 +11,8 @@ def fit_parabola(x, y):
     return coeffs, r2, y_fit
 
 def fit_parabola_curvfit(x: np.ndarray, y: np.ndarray):
+    from scipy.optimize import curve_fit  # scipy only loads when this fit is used
+
     def parabola(x, a, b, c):
         return a * x**2 + b * x + c
     popt, _ = curve_fit(parabola, x, y)
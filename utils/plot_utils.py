@@ -5,13 +5,16 @@ import plotly.graph_objects as go
 import numpy as np
 from scipy.optimize import curve_fit
 
+from .range_extrema import pattern_positions
+
 def plot_and_save_pattern(df, pattern, save_path):
     """
     Plots the Cup and Handle pattern using Plotly and saves as PNG using Kaleido.
     """
-    start = pattern["start_time"]
-    end = pattern["end_time"]
-    df_pattern = df.loc[start:end].copy()
+    cup_starts, breakouts = pattern_positions([pattern], df.index)
+    cup_start, breakout = int(cup_starts[0]), int(breakouts[0])
+    start, end = df.index[cup_start], df.index[breakout]
+    df_pattern = df.iloc[cup_start:breakout + 1].copy()
     df_pattern.reset_index(inplace=True)
 
     fig = go.Figure()
@@ -55,8 +58,8 @@ def plot_and_save_pattern(df, pattern, save_path):
         line=dict(color='blue', width=2)
     ))
 
-    breakout_time = pattern["breakout_time"]
-    breakout_price = df.loc[breakout_time]['close']
+    breakout_time = end
+    breakout_price = df['close'].iloc[breakout]
 
     fig.add_trace(go.Scatter(
         x=[breakout_time],
@@ -0,0 +1,133 @@
+import weakref
+import numpy as np
+import pandas as pd
+
+from .rolling_fit import anchor_block
+
+_FRAME_CACHE = {}
+DEFAULT_MAX_WINDOW = 512
+
+
+def label_slice_positions(index, start_times, end_times):
+    """Row range [start, stop) covered by the inclusive label slice df.loc[start_time:end_time]."""
+    starts = index.searchsorted(start_times, side="left")
+    stops = index.searchsorted(end_times, side="right")
+    return np.asarray(starts, dtype=np.int64), np.asarray(stops, dtype=np.int64)
+
+
+def pattern_positions(patterns, index):
+    """
+    (cup_start, breakout) row positions of pattern records (dicts or a
+    DataFrame). Detector records carry them; records read back from a report
+    with timestamps only are located in index with one searchsorted per column.
+    """
+    frame = patterns if isinstance(patterns, pd.DataFrame) else pd.DataFrame(list(patterns))
+    positions = []
+    for position, time in (("cup_start", "start_time"), ("breakout", "breakout_time")):
+        values = frame[position].to_numpy(dtype=np.float64) if position in frame else np.full(len(frame), np.nan)
+        missing = np.isnan(values)
+        if missing.any():
+            times = frame[time] if time in frame else frame["end_time"]
+            values[missing] = index.searchsorted(pd.DatetimeIndex(pd.to_datetime(times[missing])), side="left")
+        positions.append(values.astype(np.int64))
+    return positions[0], positions[1]
+
+
+class _SparseTable:
+    """O(1) range min or max over windows up to 2**levels - 1 long."""
+
+    def __init__(self, values, reduce, max_window):
+        self.reduce = reduce
+        values = np.asarray(values, dtype=np.float64)
+        levels = max(int(np.floor(np.log2(max(min(max_window, len(values)), 1)))) + 1, 1)
+        table = np.empty((levels, len(values)))
+        table[0] = values
+        for level in range(1, levels):
+            step = 1 << (level - 1)
+            table[level] = table[level - 1]
+            reduce(table[level - 1][:-step], table[level - 1][step:], out=table[level][:-step])
+        self.table = table
+        self.max_window = (1 << levels) - 1
+
+    def query(self, starts, stops):
+        lengths = stops - starts
+        if lengths.size and (lengths.min() < 1 or lengths.max() > self.max_window):
+            raise ValueError(f"Window empty or longer than max_window ({self.max_window})")
+        level = np.log2(lengths).astype(np.int64)
+        width = np.left_shift(1, level)
+        return self.reduce(self.table[level, starts], self.table[level, stops - width])
+
+
+class RangeExtremaIndex:
+    """
+    Range min / max (and mean) queries over the OHLCV columns of one frame.
+
+    Sparse tables are built lazily per (column, min/max) and answer any
+    window [start, stop) in constant time; means come from block-anchored
+    prefix sums, like the rolling fits.
+    Use RangeExtremaIndex.for_frame(df) so the detectors, the feature
+    extractor and the auto-labeler share a single index per DataFrame.
+    """
+
+    def __init__(self, df, max_window=DEFAULT_MAX_WINDOW):
+        self.max_window = max_window
+        self._columns = {col: df[col].to_numpy(dtype=np.float64) for col in ("high", "low", "close", "volume")}
+        self._tables = {}
+        self._prefix = {}
+
+    @classmethod
+    def for_frame(cls, df, max_window=None):
+        key = id(df)
+        cached = _FRAME_CACHE.get(key)
+        if cached is not None and cached[0]() is df and (max_window is None or cached[1].max_window >= max_window):
+            return cached[1]
+        index = cls(df, max_window=max(max_window or DEFAULT_MAX_WINDOW, DEFAULT_MAX_WINDOW))
+        _FRAME_CACHE[key] = (weakref.ref(df, lambda _ref, key=key: _FRAME_CACHE.pop(key, None)), index)
+        return index
+
+    def _table(self, column, reduce):
+        key = (column, reduce.__name__)
+        if key not in self._tables:
+            self._tables[key] = _SparseTable(self._columns[column], reduce, self.max_window)
+        return self._tables[key]
+
+    @staticmethod
+    def _bounds(starts, stops):
+        starts, stops = np.broadcast_arrays(np.asarray(starts, dtype=np.int64), np.asarray(stops, dtype=np.int64))
+        return starts, stops
+
+    def max(self, column, starts, stops):
+        return self._table(column, np.maximum).query(*self._bounds(starts, stops))
+
+    def min(self, column, starts, stops):
+        return self._table(column, np.minimum).query(*self._bounds(starts, stops))
+
+    def _sums(self, column):
+        if column not in self._prefix:
+            values = self._columns[column]
+            block = anchor_block(self.max_window)
+            n_blocks = len(values) // block + 1  # room for stop == len(values)
+            rows = np.zeros(n_blocks * block)
+            rows[:len(values)] = values
+            rows = rows.reshape(n_blocks, block)
+            inclusive = np.cumsum(rows, axis=1)
+            within = np.zeros_like(rows)
+            within[:, 1:] = inclusive[:, :-1]
+            totals = inclusive[:, -1]
+            self._prefix[column] = (block, within.reshape(-1), totals, np.concatenate([[0.0], np.cumsum(totals)]))
+        return self._prefix[column]
+
+    def sum(self, column, starts, stops):
+        """Sum over [start, stop); windows within two blocks only touch sums local to those blocks."""
+        block, within, totals, before = self._sums(column)
+        starts, stops = self._bounds(starts, stops)
+        first, last = starts // block, stops // block
+        spanning = (totals[first] - within[starts]) + (before[last] - before[np.minimum(first + 1, last)]) + within[stops]
+        return np.where(first == last, within[stops] - within[starts], spanning)
+
+    def mean(self, column, starts, stops):
+        """Mean over [start, stop); NaN for empty windows like pandas."""
+        starts, stops = self._bounds(starts, stops)
+        counts = stops - starts
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(counts > 0, self.sum(column, starts, stops) / counts, np.nan)
@@ -0,0 +1,6 @@
+OHLCV_AGG = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+
+
+def resample_ohlcv(df, minutes):
+    """Aggregate 1m candles into `minutes`-minute candles, dropping empty bins."""
+    return df.resample(f"{minutes}min").agg(OHLCV_AGG).dropna()
@@ -0,0 +1,185 @@
+import numpy as np
+from collections import namedtuple
+
+# coeffs are ordered like np.polyfit: (a, b, c) for a*x**2 + b*x + c with x = 0..n-1
+ParabolaWindowFit = namedtuple("ParabolaWindowFit", ["coeffs", "r2", "depth", "fit_min", "fit_max"])
+
+
+def _power_sum(m, p):
+    """Sum of x**p for x = 0..m-1 (m may be an array)."""
+    if p == 0:
+        return m
+    if p == 1:
+        return m * (m - 1) / 2.0
+    return (m - 1) * m * (2 * m - 1) / 6.0
+
+
+def anchor_block(max_window):
+    """Block length the running sums restart at; a copy of the series that starts on a block boundary gets identical sums."""
+    return 1 << int(np.ceil(np.log2(max(max_window, 2))))
+
+
+class _WindowMoments:
+    """
+    Block-anchored prefix sums of x**p * y (p <= degree) and y**2.
+
+    Positions are counted from the start of a fixed-size block and values
+    from the block's first sample, so the running sums stay small however
+    long the series is. A window no longer than the block touches at most
+    two blocks, which keeps every query constant time.
+    """
+
+    def __init__(self, y, degree, max_window):
+        y = np.asarray(y, dtype=np.float64)
+        self.size = len(y)
+        self.degree = degree
+        self.block = anchor_block(max_window)
+
+        n_blocks = max(-(-self.size // self.block), 1)
+        padded = n_blocks * self.block
+        y_pad = np.zeros(padded)
+        y_pad[:self.size] = y
+        y_pad = y_pad.reshape(n_blocks, self.block)
+
+        self.ref = y_pad[:, 0].copy()
+        yc = y_pad - self.ref[:, None]
+        yc.reshape(-1)[self.size:] = 0.0
+        u = np.arange(self.block, dtype=np.float64)
+
+        self._yc = yc.reshape(-1)
+        self._prefix = [np.cumsum(yc * u ** p, axis=1).reshape(-1) for p in range(degree + 1)]
+        self._prefix.append(np.cumsum(yc * yc, axis=1).reshape(-1))
+
+    def _terms(self, idx):
+        # single-sample terms, to turn the inclusive prefix at idx into an exclusive one
+        yc = self._yc[idx]
+        u = (idx % self.block).astype(np.float64)
+        return [yc * u ** p for p in range(self.degree + 1)] + [yc * yc]
+
+    @staticmethod
+    def _shift(sums, d):
+        # sum((u - d)**p * w) from sums of u**k * w
+        out = [sums[0]]
+        if len(sums) > 1:
+            out.append(sums[1] - d * sums[0])
+        if len(sums) > 2:
+            out.append(sums[2] - 2 * d * sums[1] + d * d * sums[0])
+        return out
+
+    def query(self, starts, lengths):
+        """
+        Return (moments, yy, ref) for windows y[start:start + length] where
+        moments[p] = sum(x**p * (y - ref)) with x = 0..length-1 and
+        yy = sum((y - ref)**2).
+        """
+        s, n = np.broadcast_arrays(np.asarray(starts, dtype=np.int64), np.asarray(lengths, dtype=np.int64))
+        e = s + n
+        if s.size and (s.min() < 0 or e.max() > self.size or n.min() < 1):
+            raise ValueError("Window out of range of the fitted series")
+        if n.size and n.max() > self.block:
+            raise ValueError(f"Window longer than max_window ({self.block})")
+
+        block = self.block
+        b1 = s // block
+        split = np.minimum(e, (b1 + 1) * block)
+        has_second = e > split
+        last2 = np.where(has_second, e - 1, 0)
+        b2 = np.minimum(b1 + 1, len(self.ref) - 1)
+
+        seg1 = [prefix[split - 1] - prefix[s] + term for prefix, term in zip(self._prefix, self._terms(s))]
+        seg2 = [np.where(has_second, prefix[last2], 0.0) for prefix in self._prefix]
+
+        d1 = (s - b1 * block).astype(np.float64)
+        d2 = (s - split).astype(np.float64)
+        delta = np.where(has_second, self.ref[b2] - self.ref[b1], 0.0)
+        lo = (split - s).astype(np.float64)
+        hi = n.astype(np.float64)
+
+        m1 = self._shift(seg1[:-1], d1)
+        m2 = self._shift(seg2[:-1], d2)
+        moments = [
+            a + b + delta * (_power_sum(hi, p) - _power_sum(lo, p))
+            for p, (a, b) in enumerate(zip(m1, m2))
+        ]
+        yy = seg1[-1] + seg2[-1] + 2 * delta * seg2[0] + delta * delta * (hi - lo)
+        return moments, yy, self.ref[b1]
+
+
+class RollingParabolaFit:
+    """
+    Least-squares parabola fits for arbitrary windows of one series.
+
+    Equivalent to fit_parabola(np.arange(length), y[start:start + length])
+    but every window costs O(1) after an O(N) precomputation, and starts /
+    lengths can be arrays to fit many windows in one call.
+    """
+
+    def __init__(self, y, max_window=512):
+        self._moments = _WindowMoments(y, degree=2, max_window=max_window)
+
+    @property
+    def max_window(self):
+        return self._moments.block
+
+    def fit(self, starts, lengths):
+        (s0, s1, s2), yy, ref = self._moments.query(starts, lengths)
+        n = np.broadcast_to(np.asarray(lengths, dtype=np.float64), s0.shape)
+
+        # Project onto the discrete orthogonal polynomials 1, (x - m), (x - m)**2 - k
+        m = (n - 1) / 2.0
+        k = (n * n - 1) / 12.0
+        t1 = s1 - m * s0
+        t2 = s2 - 2 * m * s1 + (m * m - k) * s0
+        norm1 = n * (n * n - 1) / 12.0
+        norm2 = n * (n * n - 1) * (n * n - 4) / 180.0
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            c0 = s0 / n
+            c1 = t1 / norm1
+            c2 = t2 / norm2
+
+            ss_tot = yy - s0 * c0
+            ss_res = np.maximum(ss_tot - c1 * t1 - c2 * t2, 0.0)
+            r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.nan)
+
+            # Fitted extremes over the integer grid: rims or the points around the vertex
+            vertex = np.where(c2 != 0, m - c1 / (2 * c2), 0.0)
+            vertex = np.nan_to_num(vertex, nan=0.0, posinf=0.0, neginf=0.0)
+        last = n - 1
+        candidates = np.stack([
+            np.zeros_like(n), last,
+            np.clip(np.floor(vertex), 0, last), np.clip(np.ceil(vertex), 0, last),
+        ])
+        dx = candidates - m
+        values = c0 + c1 * dx + c2 * (dx * dx - k)
+        fit_min = values.min(axis=0)
+        fit_max = values.max(axis=0)
+
+        a = c2
+        b = c1 - 2 * m * c2
+        c = c0 - c1 * m + c2 * (m * m - k) + ref
+        coeffs = np.stack([a, b, c], axis=-1)
+        return ParabolaWindowFit(coeffs, r2, fit_max - fit_min, fit_min + ref, fit_max + ref)
+
+
+class RollingLinearTrend:
+    """
+    OLS slope of a series against x = 0..n-1 for arbitrary windows.
+
+    Built on block-anchored cumulative sums of v and x*v, so every window
+    costs O(1); gives the same slope as scipy.stats.linregress on
+    v[start:start + length].
+    """
+
+    def __init__(self, y, max_window=512):
+        self._moments = _WindowMoments(y, degree=1, max_window=max_window)
+
+    @property
+    def max_window(self):
+        return self._moments.block
+
+    def slope(self, starts, lengths):
+        (s0, s1), _, _ = self._moments.query(starts, lengths)
+        n = np.broadcast_to(np.asarray(lengths, dtype=np.float64), s0.shape)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (s1 - (n - 1) / 2.0 * s0) / (n * (n * n - 1) / 12.0)
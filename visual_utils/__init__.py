@@ -1,2 +1,12 @@
-from .plot_static_report import plot_cup_handle_pattern
-from .dashboard_generator import generate_dashboard
\ No newline at end of file
+import importlib
+
+# imported on first use: both pull in plotly
+_LAZY = {"plot_cup_handle_pattern": ".plot_static_report", "generate_pattern_dashboard": ".dashboard_generator"}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -1,17 +1,13 @@
 import pandas as pd
 import plotly.graph_objects as go
 
+from utils.resample import resample_ohlcv
+from preprocessor import load_market_data, OHLCV
+
 def generate_pattern_dashboard(data_path, patterns_path, output_path):
-    df = pd.read_csv(data_path, parse_dates=["timestamp"])
-    df.set_index("timestamp", inplace=True)
-
-    df_resampled = df.resample("5T").agg({
-        "open": "first",
-        "high": "max",
-        "low": "min",
-        "close": "last",
-        "volume": "sum"
-    }).dropna()
+    df = load_market_data(data_path, columns=OHLCV)
+
+    df_resampled = resample_ohlcv(df, 5)
 
     patterns = pd.read_csv(patterns_path, parse_dates=["start_time", "end_time"])
 
@@ -1,36 +1,43 @@
 import os
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.io as pio
 from detectors.pattern_detector import detect_cup_handle_patterns
+from utils import pattern_positions
+from preprocessor import load_market_data, OHLCV
 
-def load_binance_data(path="data/market-data/raw/binance_1m.csv") -> pd.DataFrame:
+def load_binance_data(path="data/market-data/raw/klines") -> pd.DataFrame:
     """
     Loads Binance 1-minute OHLCV data and sets 'timestamp' as index.
     """
-    df = pd.read_csv(path, parse_dates=["timestamp"])
-    df.set_index("timestamp", inplace=True)
-    return df
+    return load_market_data(path, columns=OHLCV)
 
 
-pio.kaleido.scope.default_format = "png"
-pio.kaleido.scope.default_width = 1000
-pio.kaleido.scope.default_height = 600
+_kaleido_ready = False
+
+def _configure_kaleido():
+    # touching pio.kaleido.scope starts kaleido, so it waits for the first export
+    global _kaleido_ready
+    if not _kaleido_ready:
+        pio.kaleido.scope.default_format = "png"
+        pio.kaleido.scope.default_width = 1000
+        pio.kaleido.scope.default_height = 600
+        _kaleido_ready = True
 
 def plot_cup_handle_pattern(df, pattern, output_path):
-    start = pattern["start_time"]
-    end = pattern["end_time"]
+    cup_starts, breakouts = pattern_positions([pattern], df.index)
+    cup_start, breakout = int(cup_starts[0]), int(breakouts[0])
+    cup_end = min(cup_start + int(pattern["cup_duration"]), breakout)
 
-    pattern_df = df.loc[start:end]
+    pattern_df = df.iloc[cup_start:breakout + 1]
 
     fig = go.Figure()
     fig.add_trace(go.Scatter(x=pattern_df.index, y=pattern_df['close'], mode='lines', name='Close'))
 
     # Add cup arc if available
     if "r2" in pattern and pattern["r2"] > 0.85:
-        cup_start = start
-        cup_end = cup_start + pd.Timedelta(minutes=pattern["cup_duration"])
-        cup_df = df.loc[cup_start:cup_end]
+        cup_df = df.iloc[cup_start:cup_end + 1]
         x = list(range(len(cup_df)))
         y = cup_df["close"].values
         coeffs = np.polyfit(x, y, 2)
@@ -38,23 +45,22 @@ def plot_cup_handle_pattern(df, pattern, output_path):
         fig.add_trace(go.Scatter(x=cup_df.index, y=y_fit, mode='lines', name='Fitted Cup Arc', line=dict(color='orange', dash='dot')))
 
     # Mark handle and breakout
-    handle_start = cup_end
-    handle_end = handle_start + pd.Timedelta(minutes=pattern["handle_duration"])
-    fig.add_vrect(x0=handle_start, x1=handle_end, line_width=0, fillcolor="red", opacity=0.2, annotation_text="Handle")
-    fig.add_vline(x=pattern["breakout_time"], line=dict(color="green", dash="dash"), annotation_text="Breakout")
+    handle_end = min(cup_end + int(pattern["handle_duration"]), len(df) - 1)
+    fig.add_vrect(x0=df.index[cup_end], x1=df.index[handle_end], line_width=0, fillcolor="red", opacity=0.2,
+                  annotation_text="Handle")
+    fig.add_vline(x=df.index[breakout], line=dict(color="green", dash="dash"), annotation_text="Breakout")
 
     fig.update_layout(title=f"Cup and Handle Pattern | R²: {pattern['r2']:.2f}", xaxis_title="Time", yaxis_title="Price", template="plotly_white")
+    _configure_kaleido()
     fig.write_image(output_path)
 
 def main():
-    data_path = "data/market-data/raw/binance_1m.csv"
-    df = pd.read_csv(data_path, parse_dates=["timestamp"])
-    df.set_index("timestamp", inplace=True)
+    df = load_binance_data()
 
     print("🔍 Detecting patterns...")
-    patterns = detect_cup_handle_patterns(df)
+    results = detect_cup_handle_patterns(df)
 
-    valid_patterns = [p for p in patterns if p["valid"]]
+    valid_patterns = results.valid_patterns
     print(f"✅ Detected {len(valid_patterns)} valid Cup & Handle patterns.")
 
     output_dir = "data/market-data/processed/media"
@@ -67,7 +73,7 @@ def main():
         print(f"📈 Saved: {output_path}")
 
     # Save report
-    pd.DataFrame(patterns).to_csv("data/market-data/processed/doc/report_rule.csv", index=False)
+    results.to_frame().to_csv("data/market-data/processed/doc/report_rule.csv", index=False)
     print("📄 Detection report saved.")
 
 if __name__ == "__main__":